@@ -0,0 +1,533 @@
+# Oynatma yolu benchmark'ı: MusicPlayer'ı Discord'a ve YouTube'a bağlanmadan uçtan uca çalıştırır.
+# Sahte ses istemcisi ses kaynağını gerçek oynatıcı gibi 20 ms'de bir okur, sahte YoutubeDL hazır bilgi döndürür,
+# ses dosyaları yerel bir HTTP sunucusundan gerçek ffmpeg ile çekilir.
+# Çalıştırma: python benchmarks/playback_benchmark.py [--guilds 1,50,500] [--output rapor.json] [--compare eski.json]
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# music_bot içe aktarılmadan önce: diske yazan önbellekleri kapat, günlükleri sustur
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('RESOLUTION_CACHE_PATH', '')
+os.environ.setdefault('AUDIO_CACHE_MAX_MB', '0')
+os.environ.setdefault('QUEUE_JOURNAL_PATH', '')
+os.environ.setdefault('RESOLVE_RACE', '0')  # Sahte istemciler arasında yarıştırmanın anlamı yok
+os.environ.setdefault('EXTRACTION_QUEUE_LIMIT', '100000')  # Yük altında istekleri reddetme, gecikmeyi ölç
+
+from aiohttp import web
+
+import music_bot
+
+FRAME_SECONDS = 0.02  # Discord ses çerçevesi
+QUEUED_TRACKS_PER_GUILD = 200  # Bellek ölçümünde sunucu başına sıraya eklenen şarkı
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+    return {'p50': round(pick(0.50), 2), 'p95': round(pick(0.95), 2), 'p99': round(pick(0.99), 2),
+            'max': round(values[-1] * 1000, 2), 'count': len(values)}
+
+
+# Tek bir test ses dosyası üret (Opus/WebM, YouTube'un 251 formatı gibi)
+def generate_media(directory, seconds):
+    path = os.path.join(directory, 'sine.webm')
+    subprocess.run([
+        music_bot.FFMPEG_PATH, '-nostdin', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={seconds}',
+        '-c:a', 'libopus', '-b:a', '128k', '-f', 'webm', path
+    ], check=True)
+    return path
+
+
+# Ses dosyasını ayrı bir thread ve event loop'ta sunan yerel HTTP sunucusu (bot'un loop'unu etkilemesin)
+class MediaServer:
+    def __init__(self, path):
+        self.path = path
+        self.port = None
+        self.loop = None
+        self.runner = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='media-server', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.ready.wait()
+        return f'http://127.0.0.1:{self.port}'
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._start())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _start(self):
+        async def handle_audio(request):
+            return web.FileResponse(self.path)  # Range isteklerini destekler
+
+        app = web.Application()
+        app.router.add_get('/audio/{name}', handle_audio)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        self.port = self.runner.addresses[0][1]
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def video_id_for(guild_id, index):
+    return f'{guild_id:05d}{index:06d}'
+
+
+# yt-dlp yerine geçen, ağ isteği yapmadan hazır bilgi döndüren sınıf
+class StubYoutubeDL:
+    media_base = None
+    track_seconds = 5
+    delay = 0.05  # Ekstraksiyonun işlemci/ağ maliyetini taklit eder (ekstraksiyon thread'inde)
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def get_info_extractor(self, name):
+        return None
+
+    def close(self):
+        pass
+
+    @classmethod
+    def video_info(cls, video_id):
+        expire = int(time.time()) + 6 * 3600
+        return {
+            'id': video_id,
+            'title': f'Benchmark Şarkısı {video_id}',
+            'uploader': 'Benchmark',
+            'duration': cls.track_seconds,
+            'thumbnail': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+            'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+            'url': f'{cls.media_base}/audio/{video_id}.webm?expire={expire}&itag=251&mime=audio%2Fwebm',
+        }
+
+    def extract_info(self, url, download=False, process=True):
+        time.sleep(self.delay)
+        if url.startswith('ytsearch'):
+            prefix, query = url.split(':', 1)
+            count = int(prefix[len('ytsearch'):] or 1)
+            guild_id = int(query.rsplit(' ', 1)[-1])
+            return {
+                '_type': 'playlist',
+                'title': query,
+                'entries': [{
+                    '_type': 'url',
+                    'ie_key': 'Youtube',
+                    'id': video_id_for(guild_id, index),
+                    'url': f'https://www.youtube.com/watch?v={video_id_for(guild_id, index)}',
+                    'title': f'Benchmark Şarkısı {video_id_for(guild_id, index)}',
+                    'duration': self.track_seconds,
+                } for index in range(count)]
+            }
+        return self.video_info(music_bot.youtube_video_id(url))
+
+
+# discord.py'nin AudioPlayer thread'i gibi: kaynağı çerçeve hızında okur, bitince after'ı çağırır
+class StubAudioPlayer(threading.Thread):
+    def __init__(self, source, after):
+        super().__init__(daemon=True)
+        self.source = source
+        self.after = after
+        self.end = threading.Event()
+        self.resumed = threading.Event()
+        self.resumed.set()
+
+    def run(self):
+        error = None
+        try:
+            start = time.perf_counter()
+            frames = 0
+            while not self.end.is_set():
+                if not self.resumed.is_set():
+                    self.resumed.wait()
+                    start = time.perf_counter()
+                    frames = 0
+                    continue
+                data = self.source.read()
+                if not data:
+                    break
+                frames += 1
+                delay = start + frames * FRAME_SECONDS - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        except Exception as e:
+            error = e
+        finally:
+            self.end.set()
+            self.source.cleanup()
+            if self.after:
+                self.after(error)
+
+    def is_playing(self):
+        return self.resumed.is_set() and not self.end.is_set()
+
+
+class StubVoiceClient:
+    def __init__(self, guild):
+        self.guild = guild
+        self.connected = True
+        self.player = None
+
+    def is_connected(self):
+        return self.connected
+
+    def is_playing(self):
+        return self.player is not None and self.player.is_playing()
+
+    def is_paused(self):
+        return self.player is not None and not self.player.end.is_set() and not self.player.resumed.is_set()
+
+    def play(self, source, *, after=None):
+        self.player = StubAudioPlayer(source, after)
+        self.player.start()
+
+    def stop(self):
+        if self.player:
+            self.player.end.set()
+            self.player.resumed.set()
+
+    def pause(self):
+        if self.player:
+            self.player.resumed.clear()
+
+    def resume(self):
+        if self.player:
+            self.player.resumed.set()
+
+    async def disconnect(self, force=False):
+        self.stop()
+        self.connected = False
+        self.guild.voice_client = None
+
+
+class StubMessage:
+    async def edit(self, **kwargs):
+        return self
+
+    async def delete(self):
+        pass
+
+
+class StubVoiceChannel:
+    name = 'benchmark'
+
+    def __init__(self, guild):
+        self.guild = guild
+
+    async def connect(self, **kwargs):
+        self.guild.voice_client = StubVoiceClient(self.guild)
+        return self.guild.voice_client
+
+
+class StubGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f'benchmark-{guild_id}'
+        self.voice_client = None
+
+
+class StubMember:
+    def __init__(self, guild):
+        self.voice = type('VoiceState', (), {'channel': StubVoiceChannel(guild)})()
+
+
+# Komut bağlamı ve metin kanalı rolünü birlikte üstlenir
+class StubContext:
+    def __init__(self, guild):
+        self.guild = guild
+        self.channel = self
+        self.author = StubMember(guild)
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, content=None, **kwargs):
+        return StubMessage()
+
+
+class StubBot:
+    latency = 0.0
+    shard_count = None
+
+    def __init__(self, loop, guilds):
+        self.loop = loop
+        self.guild_map = {guild.id: guild for guild in guilds}
+
+    def get_guild(self, guild_id):
+        return self.guild_map.get(guild_id)
+
+    @property
+    def guilds(self):
+        return list(self.guild_map.values())
+
+    @property
+    def voice_clients(self):
+        return [guild.voice_client for guild in self.guild_map.values() if guild.voice_client]
+
+
+# Histogram yerine değerleri toplayan kayıt
+class Recorder:
+    def __init__(self):
+        self.values = []
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        with self.lock:
+            self.values.append(value)
+
+
+# Event loop gecikmesi: 100 ms'lik uykunun ne kadar geç uyandığı
+async def sample_loop_lag(samples, interval=0.1):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+# Sunucu başına sıraya eklenen düz şarkıların tuttuğu bellek
+def measure_queue_memory(player, guild_ids):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for guild_id in guild_ids:
+        queue = player.get_queue(guild_id)
+        queue.extend([music_bot.Track.from_info(StubYoutubeDL.video_info(video_id_for(guild_id, 1000 + index)))
+                      for index in range(QUEUED_TRACKS_PER_GUILD)])
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    for guild_id in guild_ids:
+        player.queue[guild_id].clear()
+    return retained / (len(guild_ids) * QUEUED_TRACKS_PER_GUILD)
+
+
+async def run_scenario(guild_count, tracks):
+    loop = asyncio.get_running_loop()
+    guilds = [StubGuild(guild_id) for guild_id in range(1, guild_count + 1)]
+    bot = StubBot(loop, guilds)
+    player = music_bot.MusicPlayer(bot)
+    player.inactivity_timeout = 3600
+
+    # Modül genelindeki histogramları bu senaryo için topla
+    transition_gaps = music_bot.transition_gap_seconds = Recorder()
+    first_audio = music_bot.first_audio_seconds = Recorder()
+
+    first_frames = {guild.id: [] for guild in guilds}
+    first_frame_events = {guild.id: asyncio.Event() for guild in guilds}
+
+    def on_first_frame(guild_id, elapsed):
+        first_frames[guild_id].append(time.perf_counter())
+        loop.call_soon_threadsafe(first_frame_events[guild_id].set)
+
+    player.engine.first_frame_listeners.append(on_first_frame)
+
+    lag_samples = []
+    lag_task = asyncio.create_task(sample_loop_lag(lag_samples))
+
+    search_to_play = []
+    failures = []
+    failed_guilds = set()
+
+    # Arama sorgusu -> ilk sonucu URL ile çal -> kalan şarkıları sıraya ekle
+    async def drive_guild(guild):
+        ctx = StubContext(guild)
+        start = time.perf_counter()
+        try:
+            query = f'benchmark {guild.id}'
+            results = await player.search_cache.get_or_fetch(query, lambda: player.search_youtube(guild.id, query))
+            await player.show_search_results(ctx, results[0]['url'])
+            for index in range(1, tracks):
+                player.enqueue(guild.id, music_bot.Track.from_info(StubYoutubeDL.video_info(video_id_for(guild.id, index))))
+            await asyncio.wait_for(first_frame_events[guild.id].wait(), timeout=60)
+            search_to_play.append(first_frames[guild.id][0] - start)
+        except Exception as e:
+            failed_guilds.add(guild.id)
+            failures.append(f'{guild.id}: {type(e).__name__}: {e}')
+
+    cpu_start = cpu_seconds()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(drive_guild(guild) for guild in guilds))
+
+    # Tüm sunucularda son şarkı da çalıp bitene kadar bekle (geçiş sırasında sıra boş görünebilir)
+    deadline = time.perf_counter() + tracks * (StubYoutubeDL.track_seconds + 5) + 60
+    while time.perf_counter() < deadline:
+        busy = any(guild.id not in failed_guilds and (
+                       len(first_frames[guild.id]) < tracks
+                       or (guild.voice_client and guild.voice_client.is_playing()))
+                   for guild in guilds)
+        if not busy:
+            break
+        await asyncio.sleep(0.25)
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+
+    lag_task.cancel()
+    memory_per_track = measure_queue_memory(player, [guild.id for guild in guilds])
+
+    # Temizlik: ses istemcileri, görevler ve ekstraksiyon havuzu
+    for guild in guilds:
+        if guild.voice_client:
+            await guild.voice_client.disconnect()
+    for task in list(player.leave_tasks.values()) + list(player.playback_drivers.values()) + player.extractor.workers:
+        task.cancel()
+    player.extractor.pool.shutdown(wait=False)
+    await asyncio.sleep(0.1)
+
+    played = sum(len(frames) for frames in first_frames.values())
+    return {
+        'guilds': guild_count,
+        'tracks_expected': guild_count * tracks,
+        'tracks_played': played,
+        'failures': failures[:10],
+        'failure_count': len(failures),
+        'wall_seconds': round(wall, 2),
+        'search_to_play_ms': percentiles(search_to_play),
+        'first_audio_ms': percentiles(first_audio.values),
+        'transition_gap_ms': percentiles(transition_gaps.values),
+        'loop_lag_ms': percentiles(lag_samples),
+        # Ses thread'leri ve ffmpeg alt süreçleri dahil, bir çekirdeğin yüzdesi olarak
+        'cpu_percent_per_stream': round(cpu / wall / guild_count * 100, 3) if wall else None,
+        'memory_per_queued_track_bytes': round(memory_per_track),
+    }
+
+
+def ffmpeg_version():
+    try:
+        output = subprocess.run([music_bot.FFMPEG_PATH, '-version'], stdout=subprocess.PIPE, text=True).stdout
+        return output.split('\n', 1)[0]
+    except Exception:
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# İki raporu sunucu sayısına göre eşleştirip farkları yazdır
+def compare(report, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {scenario['guilds']: scenario for scenario in json.load(f)['scenarios']}
+    rows = [('search_to_play_ms', 'p95'), ('first_audio_ms', 'p95'), ('transition_gap_ms', 'p95'),
+            ('loop_lag_ms', 'p99'), ('cpu_percent_per_stream', None), ('memory_per_queued_track_bytes', None)]
+    for scenario in report['scenarios']:
+        old = baseline.get(scenario['guilds'])
+        if old is None:
+            continue
+        print(f"\n{scenario['guilds']} sunucu (önceki -> şimdiki):")
+        for name, key in rows:
+            before, after = old.get(name), scenario.get(name)
+            if key:
+                before, after = before and before.get(key), after and after.get(key)
+            if before is None or after is None:
+                continue
+            change = f" ({(after - before) / before * 100:+.1f}%)" if before else ''
+            print(f"  {name}{'.' + key if key else ''}: {before} -> {after}{change}")
+
+
+async def main_async(args):
+    scenarios = []
+    for guild_count in args.guilds:
+        print(f"{guild_count} sunucu çalıştırılıyor...")
+        result = await run_scenario(guild_count, args.tracks)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        scenarios.append(result)
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MusicPlayer oynatma yolu benchmark\'ı')
+    parser.add_argument('--guilds', default='1,50,500', help='Virgülle ayrılmış sunucu sayıları')
+    parser.add_argument('--tracks', type=int, default=3, help='Sunucu başına çalınacak şarkı')
+    parser.add_argument('--track-seconds', type=int, default=5, help='Test ses dosyasının uzunluğu')
+    parser.add_argument('--extract-delay', type=float, default=0.05, help='Sahte ekstraksiyon süresi (saniye)')
+    parser.add_argument('--output', default=None, help='JSON rapor yolu (varsayılan: benchmarks/results/<zaman>.json)')
+    parser.add_argument('--compare', default=None, help='Karşılaştırılacak önceki rapor')
+    args = parser.parse_args()
+    args.guilds = [int(value) for value in args.guilds.split(',') if value.strip()]
+
+    # YouTube'a hiç gitme; hız sınırı gerçek sunucuyu korumak içindir, burada ölçümü bozmasın
+    music_bot.yt_dlp.YoutubeDL = StubYoutubeDL
+    music_bot.resolver_client = None
+    StubYoutubeDL.track_seconds = args.track_seconds
+    StubYoutubeDL.delay = args.extract_delay
+    if 'EXTRACTION_RATE' not in os.environ:
+        os.environ['EXTRACTION_RATE'] = '100000'
+        os.environ['EXTRACTION_BURST'] = '100000'
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = MediaServer(generate_media(directory, args.track_seconds))
+        StubYoutubeDL.media_base = server.start()
+        try:
+            scenarios = asyncio.run(main_async(args))
+        finally:
+            server.stop()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ffmpeg': ffmpeg_version(),
+        },
+        'settings': {
+            'tracks_per_guild': args.tracks,
+            'track_seconds': args.track_seconds,
+            'extract_delay': args.extract_delay,
+            'audio_mode': music_bot.AUDIO_MODE,
+            'audio_volume': music_bot.AUDIO_VOLUME,
+            'audio_bitrate': music_bot.AUDIO_BITRATE,
+            'extraction_workers': int(os.getenv('EXTRACTION_WORKERS', '4')),
+            'prefetch_depth': int(os.getenv('PREFETCH_DEPTH', '2')),
+        },
+        'scenarios': scenarios,
+    }
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Rapor yazıldı: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# GuildQueue mikro benchmark'ı: sıra boyutu büyüdükçe baştan çıkarma süresi sabit kalmalı.
+# Çalıştırma: python benchmarks/queue_benchmark.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_bot import GuildQueue, Track
+
+SIZES = [1_000, 10_000, 100_000]
+POPS = 1_000  # Her boyutta ölçülen çıkarma sayısı
+
+
+def make_song(i):
+    return Track(f'Şarkı {i}', video_id=f'{i:011d}', uploader='Benchmark', duration=180)
+
+
+# Eski yöntem: düz liste ve pop(0)
+def bench_list(songs):
+    queue = list(songs)
+    start = time.perf_counter()
+    for _ in range(POPS):
+        queue.pop(0)
+    return (time.perf_counter() - start) / POPS
+
+
+def bench_guild_queue(songs):
+    queue = GuildQueue()
+    queue.extend(songs)
+    start = time.perf_counter()
+    for _ in range(POPS):
+        queue.popleft()
+    return (time.perf_counter() - start) / POPS
+
+
+def bench_append(songs):
+    queue = GuildQueue()
+    queue.extend(songs)
+    extra = [make_song(len(songs) + i) for i in range(POPS)]
+    start = time.perf_counter()
+    for song in extra:
+        queue.append(song)
+    return (time.perf_counter() - start) / POPS
+
+
+def main():
+    print(f"{'Boyut':>10} | {'list.pop(0)':>14} | {'GuildQueue.popleft':>19} | {'GuildQueue.append':>18}")
+    print('-' * 72)
+    for size in SIZES:
+        songs = [make_song(i) for i in range(size)]
+        list_ns = bench_list(songs) * 1e9
+        queue_ns = bench_guild_queue(songs) * 1e9
+        append_ns = bench_append(songs) * 1e9
+        print(f"{size:>10} | {list_ns:>11.0f} ns | {queue_ns:>16.0f} ns | {append_ns:>15.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
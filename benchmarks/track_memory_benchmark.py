@@ -0,0 +1,68 @@
+# Sıradaki şarkı başına bellek kullanımı: eski dict kaydı ile Track kaydının karşılaştırması.
+# Çalıştırma: python benchmarks/track_memory_benchmark.py
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_bot import Track
+
+COUNT = 10_000
+UPLOADERS = 50  # Playlist'lerde yükleyiciler sık tekrarlanır
+
+
+# yt-dlp'den gelen her bilgi yeni string nesneleri içerir, bunu taklit et
+def fake_info(i):
+    video_id = f'{i:011d}'
+    return {
+        'id': video_id,
+        'title': f'Benchmark Şarkısı {i} (Official Audio)',
+        'uploader': ''.join(['Yükleyici ', str(i % UPLOADERS)]),
+        'duration': 180 + i % 120,
+        'thumbnail': f'https://i.ytimg.com/vi_webp/{video_id}/maxresdefault.webp',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+        # İmzalı googlevideo URL'leri ~1 KB civarındadır
+        'url': f'https://rr1---sn-benchmark.googlevideo.com/videoplayback?expire=1700000000&id={video_id}&' + 'x' * 1000,
+    }
+
+
+# Eski temsil: her şarkı için altı anahtarlı dict ve akış URL'si
+def build_dicts(infos):
+    return [{
+        'title': info['title'],
+        'url': info['url'],
+        'thumbnail': info['thumbnail'],
+        'duration': info['duration'],
+        'webpage_url': info['webpage_url'],
+        'uploader': info['uploader']
+    } for info in infos]
+
+
+# Yeni temsil: pencere dışındaki şarkılar akış URL'si tutmaz
+def build_tracks(infos):
+    return [Track.from_info(info) for info in infos]
+
+
+def measure(builder):
+    tracemalloc.start()
+    infos = [fake_info(i) for i in range(COUNT)]
+    records = builder(infos)
+    # Kaynak bilgiler serbest kalsın; kayıtların hâlâ tuttuğu stringler dahil ölçülür
+    del infos
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return records, retained / COUNT
+
+
+def main():
+    _, dict_bytes = measure(build_dicts)
+    _, track_bytes = measure(build_tracks)
+    print(f"{COUNT} şarkı için şarkı başına bellek:")
+    print(f"  dict  : {dict_bytes:>8.0f} bayt")
+    print(f"  Track : {track_bytes:>8.0f} bayt")
+    print(f"  Kazanç: %{(1 - track_bytes / dict_bytes) * 100:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,16 +4,251 @@ import asyncio
 from discord.ext import commands
 import yt_dlp
 import os
+import argparse
+import signal
+import socket
+import json
+import logging
+import logging.handlers
+import contextvars
+import atexit
+import subprocess
+import traceback
 from dotenv import load_dotenv
+from aiohttp import web
 import re
-from urllib.parse import urlparse
+import sys
+import time
+import random
+import sqlite3
+import threading
+import queue as queue_module
+import functools
+import hmac
+import ipaddress
+import unicodedata
+from collections import deque, OrderedDict
+from itertools import islice, count
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+# .env dosyasını yükle (yerel geliştirme için)
+load_dotenv()
+
+# Günlük kayıtlarına eklenecek bağlam (sunucu, parça, istek); her görev kendi kopyasını taşır
+log_context = contextvars.ContextVar('log_context', default={})
+
+# Bağlama alan ekle (yalnızca mevcut görev ve ondan başlatılan görevler etkilenir)
+def bind_log_context(**fields):
+    context = dict(log_context.get())
+    context.update({key: value for key, value in fields.items() if value is not None})
+    log_context.set(context)
+
+# İmzalı akış URL'lerini günlüğe yazmadan önce sorgu kısmını at
+def redact_url(url):
+    return url.split('?', 1)[0] if url else url
+
+# Kaydı oluşturan thread'de bağlamı yakala ve mesajı biçimlendir; yazma işi dinleyici thread'ine kalır
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.context = log_context.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# Parça başına tekrarlanan gürültülü mesajları örnekle: anahtar ve sunucu başına aralıkta en fazla N kayıt,
+# böylece yoğun bir sunucu diğerlerinin kayıtlarını bastırmaz.
+# Atlanan kayıt sayısı bir sonraki aralığın ilk kaydına eklenir.
+class SamplingFilter(logging.Filter):
+    def __init__(self, limit=20, interval=60):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.windows = {}  # (anahtar, sunucu) -> [aralık başlangıcı, geçen kayıt, atlanan kayıt]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        sample = getattr(record, 'sample', None)
+        if sample is None:
+            return True
+        # Filtre kaydı oluşturan thread'de çalışır; bağlamı olmayan thread'ler sunucuyu extra ile verir
+        key = (sample, getattr(record, 'guild', None) or log_context.get().get('guild'))
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window and window[2]:
+                    record.suppressed = window[2]
+                if window is None and len(self.windows) >= 1024:
+                    # Ayrılan sunucuların süresi dolmuş pencerelerini at
+                    self.windows = {k: w for k, w in self.windows.items() if now - w[0] < self.interval}
+                window = self.windows[key] = [now, 0, 0]
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+# Her kaydı tek satırlık JSON olarak yaz
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.msg,
+        }
+        entry.update(getattr(record, 'context', {}))
+        if getattr(record, 'suppressed', None):
+            entry['suppressed'] = record.suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+# Geliştirme için okunabilir biçim: bağlam alanları mesajın sonuna eklenir
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.msg}"
+        context = getattr(record, 'context', {})
+        if context:
+            line += ' [' + ' '.join(f'{key}={value}' for key, value in context.items()) + ']'
+        if getattr(record, 'suppressed', None):
+            line += f' (+{record.suppressed} atlandı)'
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+# Kayıtlar kuyruğa atılır, stdout'a ayrı bir thread yazar; event loop hiçbir zaman çıktı için beklemez
+def setup_logging():
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter() if os.getenv('LOG_FORMAT', 'json').lower() == 'text' else JsonFormatter())
+    
+    log_queue = queue_module.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        limit=int(os.getenv('LOG_SAMPLE_LIMIT', '20')),
+        interval=int(os.getenv('LOG_SAMPLE_INTERVAL', '60'))
+    ))
+    
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)  # Çıkışta kuyrukta kalan kayıtları yaz
+
+setup_logging()
+log = logging.getLogger('musicbot')
+
+# Kimsenin beklemediği arka plan görevleri. Referans tutulur ki çöp toplayıcı yarıda kesmesin;
+# beklenmeyen hata sessizce kaybolmak yerine günlüğe yazılır.
+background_tasks = set()
+
+def start_background_task(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    task.add_done_callback(log_task_error)
+    return task
+
+def log_task_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        log.error('Arka plan görevi hatası (%s): %s', task.get_name(), task.exception(), exc_info=task.exception())
 
 # Bot ayarları
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
 intents.voice_states = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+# "0,1,4-7" biçimindeki shard listesini çöz
+def parse_shard_ids(value):
+    if not value:
+        return None
+    shard_ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        elif part:
+            shard_ids.append(int(part))
+    return shard_ids
+
+# Shard ayarları: komut satırı (--shard-count, --shard-ids, --processes) ortam değişkenlerini ezer.
+# shard_count 'auto' ise Discord'un önerdiği sayı kullanılır.
+def shard_settings(argv):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--shard-count', default=os.getenv('SHARD_COUNT'))
+    parser.add_argument('--shard-ids', default=os.getenv('SHARD_IDS'))
+    parser.add_argument('--processes', type=int, default=int(os.getenv('SHARD_PROCESSES', '1')))
+    args, _ = parser.parse_known_args(argv)
+    
+    shard_count = args.shard_count
+    if shard_count and shard_count != 'auto':
+        shard_count = int(shard_count)
+    return shard_count or None, parse_shard_ids(args.shard_ids), args.processes
+
+# Ayarlar geçersizse hata mesajı, değilse None
+def shard_settings_error(shard_count, shard_ids, processes):
+    if (shard_ids or processes > 1) and not isinstance(shard_count, int):
+        return "SHARD_IDS ve çok süreçli çalışma için --shard-count (veya SHARD_COUNT) bir sayı olmalıdır."
+    if shard_ids and not all(0 <= shard_id < shard_count for shard_id in shard_ids):
+        return f"SHARD_IDS içindeki shard numaraları 0 ile {shard_count - 1} arasında olmalıdır."
+    return None
+
+SHARD_COUNT, SHARD_IDS, SHARD_PROCESSES = shard_settings(sys.argv[1:] if __name__ == '__main__' else [])
+shard_error = shard_settings_error(SHARD_COUNT, SHARD_IDS, SHARD_PROCESSES)
+if shard_error:
+    sys.exit(shard_error)
+
+# Shard'ları --processes kadar alt sürece böl ve hepsini bekle
+def run_shard_processes(shard_count, processes):
+    shard_ids = SHARD_IDS or list(range(shard_count))
+    processes = min(processes, len(shard_ids))
+    
+    # YouTube hız sınırı IP başınadır; açıkça ayarlanmadıysa süreçler arasında paylaştır
+    extraction_rate = os.getenv('EXTRACTION_RATE')
+    if extraction_rate is None:
+        extraction_rate = str(5 / processes)
+    
+    children = []
+    for index in range(processes):
+        # Ardışık shard'ları aynı sürece ver
+        assigned = shard_ids[index * len(shard_ids) // processes:(index + 1) * len(shard_ids) // processes]
+        env = dict(os.environ,
+                   SHARD_COUNT=str(shard_count),
+                   SHARD_IDS=','.join(map(str, assigned)),
+                   SHARD_PROCESSES='1',
+                   EXTRACTION_RATE=extraction_rate)
+        # Her süreç kendi metrik portunu dinler
+        if os.getenv('METRICS_PORT'):
+            env['METRICS_PORT'] = str(int(os.getenv('METRICS_PORT')) + index)
+        log.info('Shard süreci başlatılıyor: %s', assigned)
+        children.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+    
+    # Durdurma sinyalini alt süreçlere ilet
+    def forward(signum, frame):
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signum)
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    
+    return max(child.wait() for child in children)
+
+# Sunucunun bağlı olduğu shard (Discord'un standart formülü)
+def shard_for_guild(guild_id, shard_count):
+    return (guild_id >> 22) % shard_count
+
+# Kalıcı önbellek dosyalarının tutulacağı dizin
+CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
 
 # YT-DLP ayarları
 ydl_opts = {
@@ -31,7 +266,7 @@ ydl_opts = {
     'retries': 5,
     'fragment_retries': 5,
     'skip_unavailable_fragments': True,
-    'cachedir': False,
+    'cachedir': os.path.join(CACHE_DIR, 'yt-dlp'),  # İmza çözümleme önbelleği
     'extractor_args': {
         'youtube': {
             'player_client': ['mweb', 'android', 'web'],  # mweb client öncelikli
@@ -54,10 +289,10 @@ def check_ffmpeg():
     try:
         # FFmpeg'i çalıştırmayı dene
         subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        print("FFmpeg PATH'de bulundu!")
+        log.info("FFmpeg PATH'de bulundu!")
         return 'ffmpeg'
     except (subprocess.SubprocessError, FileNotFoundError):
-        print("FFmpeg PATH'de bulunamadı, alternatif yolları deniyorum...")
+        log.warning("FFmpeg PATH'de bulunamadı, alternatif yolları deniyorum...")
         
         # Olası FFmpeg yolları
         possible_paths = [
@@ -70,31 +305,2182 @@ def check_ffmpeg():
         
         for path in possible_paths:
             if os.path.exists(path):
-                print(f"FFmpeg bulundu: {path}")
+                log.info('FFmpeg bulundu: %s', path)
                 return path
         
-        print("FFmpeg bulunamadı! Lütfen FFmpeg'i yükleyin ve PATH'e ekleyin.")
+        log.error("FFmpeg bulunamadı! Lütfen FFmpeg'i yükleyin ve PATH'e ekleyin.")
         return 'ffmpeg'  # Yine de varsayılan değeri döndür
 
 # FFmpeg yolunu belirle
 FFMPEG_PATH = check_ffmpeg()
 
-ffmpeg_options = {
-    'options': '-vn',
-    'executable': FFMPEG_PATH
+# Prometheus metin biçiminde dışa aktarılan basit metrik kayıt defteri.
+# Sayaç ve histogramlar farklı thread'lerden (ses, ekstraksiyon) güncellenebilir.
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f'{self.name}{format_labels(self.labels, key)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = sorted(buckets)
+        self.labels = labels
+        self.values = {}  # etiketler -> [kova sayıları, toplam, adet]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, (counts, total, observations) in self.values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{format_labels(self.labels + ("le",), key + (bound,))} {bucket_count}')
+                lines.append(f'{self.name}_bucket{format_labels(self.labels + ("le",), key + ("+Inf",))} {observations}')
+                lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {total}')
+                lines.append(f'{self.name}_count{format_labels(self.labels, key)} {observations}')
+        return lines
+
+# Değeri okunduğu anda hesaplanan ölçü; callback tek bir sayı ya da {etiketler: değer} döndürür
+class Gauge:
+    def __init__(self, name, help_text, callback, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.labels = labels
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.callback()
+        except Exception as e:
+            log.warning('Metrik okunamadı: %s - %s', self.name, e)
+            return lines
+        if isinstance(value, dict):
+            for key, item in value.items():
+                lines.append(f'{self.name}{format_labels(self.labels, key)} {item}')
+        else:
+            lines.append(f'{self.name} {value}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self, prefix='musicbot_'):
+        self.prefix = prefix
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self.prefix + name, help_text, labels))
+
+    def histogram(self, name, help_text, buckets, labels=()):
+        return self._register(Histogram(self.prefix + name, help_text, buckets, labels))
+
+    def gauge(self, name, help_text, callback, labels=()):
+        return self._register(Gauge(self.prefix + name, help_text, callback, labels))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+search_seconds = metrics.histogram('search_seconds', 'Arama sorgusunun sonuç dönene kadar geçen süresi', LATENCY_BUCKETS)
+resolve_seconds = metrics.histogram('resolve_seconds', 'YouTube istemcisi başına akış URL\'si çözümleme süresi', LATENCY_BUCKETS, labels=('client',))
+first_audio_seconds = metrics.histogram('first_audio_seconds', 'ffmpeg başlatıldıktan sonra ilk ses çerçevesine kadar geçen süre', LATENCY_BUCKETS)
+transition_gap_seconds = metrics.histogram('transition_gap_seconds', 'Parça bitişiyle sıradaki parçanın ilk sesi arasındaki sessizlik', LATENCY_BUCKETS)
+resolve_failures = metrics.counter('resolve_failures_total', 'Başarısız akış URL\'si çözümlemeleri', labels=('client', 'reason'))
+loop_lag_seconds = metrics.histogram('loop_lag_seconds', 'Event loop zamanlama gecikmesi', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+tracks_started = metrics.counter('tracks_started_total', 'Çalmaya başlayan parçalar', labels=('source',))
+panel_updates = metrics.counter('panel_updates_total', 'Kontrol paneli güncelleme istekleri ve sonuçları', labels=('result',))
+
+# Hata sınıfı: kısıtlama ayrı tutulur, diğerleri istisna türüne göre
+def error_reason(error):
+    if is_throttle_error(error):
+        return 'throttle'
+    return type(error).__name__
+
+# /metrics uç noktasını sunan yerel HTTP sunucusu
+async def start_metrics_server(host, port):
+    async def handle_metrics(request):
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+    
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info('Metrikler yayında: http://%s:%s/metrics', host, port)
+    return runner
+
+# Ses kaynağı modu: 'auto' (Opus ise doğrudan aktar, değilse ffmpeg'de Opus'a kodla),
+# 'opus' (her zaman ffmpeg'de Opus'a kodla) veya 'pcm' (eski PCM + Python ses seviyesi yolu)
+AUDIO_MODE = os.getenv('AUDIO_MODE', 'auto').lower()
+# Ses seviyesi. Varsayılan 1.0'da Opus akışlar kodlanmadan aktarılır; başka bir değer her parçanın
+# ffmpeg'de yeniden kodlanmasını (parça başına ek CPU) gerektirir
+AUDIO_VOLUME = float(os.getenv('AUDIO_VOLUME', '1.0'))
+AUDIO_BITRATE = int(os.getenv('AUDIO_BITRATE', '128'))  # kbps, yalnızca yeniden kodlamada
+
+# YouTube'un Opus/WebM ses formatları
+OPUS_ITAGS = {'249', '250', '251'}
+
+# Akış URL'sinden ses codec'ini tahmin et (googlevideo mime/itag parametreleri, ağ isteği yok)
+def guess_stream_codec(url):
+    try:
+        query = parse_qs(urlparse(url).query)
+    except ValueError:
+        return None
+    if not query and url.endswith('.opus'):
+        return 'opus'  # Yerel ses önbelleği dosyası
+    mime = query.get('mime', [''])[0]
+    itag = query.get('itag', [''])[0]
+    if itag in OPUS_ITAGS or mime == 'audio/webm':
+        return 'opus'
+    if mime == 'audio/mp4':
+        return 'aac'
+    return None
+
+# Discord'a gönderilen her ses çerçevesinin süresi (saniye)
+FRAME_SECONDS = 0.02
+
+# "90", "1:30" veya "1:02:03" biçimindeki konumu saniyeye çevir; geçersizse None
+def parse_timestamp(value):
+    parts = value.strip().split(':')
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+# Saniyeyi "1:30" / "1:02:03" biçiminde yaz
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+# Oynatılan kaynağı sarar, ilk ses çerçevesinin ne zaman üretildiğini ölçer ve gönderilen
+# çerçeveleri sayar; parçadaki konum başlangıç ofsetiyle çerçeve sayısından hesaplanır
+class TimedAudioSource(discord.AudioSource):
+    def __init__(self, source, on_first_frame, offset=0):
+        self.source = source
+        self.on_first_frame = on_first_frame
+        self.offset = offset  # ffmpeg'in başladığı konum (saniye)
+        self.frames = 0
+        self.created_at = time.perf_counter()  # ffmpeg süreci kaynakla birlikte başlar
+        self.first_frame_at = None
+        self.exhausted = False  # ffmpeg çıktısı bitti mi (durdurulan kaynakta False kalır)
+
+    def read(self):
+        data = self.source.read()
+        if data:
+            self.frames += 1
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+                self.on_first_frame(self.first_frame_at - self.created_at)
+        else:
+            self.exhausted = True
+        return data
+
+    @property
+    def position(self):
+        return self.offset + self.frames * FRAME_SECONDS
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+# ffmpeg argümanlarını ve ses kaynağı oluşturmayı tek noktada toplayan oynatma motoru
+class PlaybackEngine:
+    def __init__(self, executable, mode='auto', volume=1.0, bitrate=128,
+                 probesize='64k', analyzeduration='500000'):
+        self.executable = executable
+        self.mode = mode
+        self.volume = volume
+        self.bitrate = bitrate
+        self.probesize = probesize  # Hızlı başlangıç için küçük tutulur
+        self.analyzeduration = analyzeduration  # mikrosaniye
+        self.first_frame_times = {}  # Sunucu başına son parçanın ilk ses çerçevesi süresi (saniye)
+        self.first_frame_listeners = []  # (guild_id, süre) ile ses thread'inden çağrılır
+        self.sources = {}  # Sunucu başına çalmaya başlayan kaynak (konum takibi için)
+
+    # Girdi tarafı ffmpeg seçenekleri. Ofset girdi tarafında (-ss, -i'den önce) verilir; ffmpeg
+    # baştan çözmek yerine doğrudan o konuma atlar
+    def before_options(self, url, offset=0):
+        options = ['-nostdin', '-probesize', self.probesize, '-analyzeduration', self.analyzeduration]
+        if offset > 0:
+            options += ['-ss', f'{offset:.2f}']
+        # Ağ kesintilerinde akışa yeniden bağlan (yerel dosyalarda gerekmez)
+        if url.startswith(('http://', 'https://')):
+            options += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+        return ' '.join(options)
+
+    # Ses kaynağını oluştur: mümkünse Opus paketlerini yeniden kodlamadan aktar
+    def create_source(self, guild_id, url, offset=0):
+        before_options = self.before_options(url, offset)
+        
+        if self.mode == 'pcm':
+            audio_source = discord.FFmpegPCMAudio(url, before_options=before_options, options='-vn', executable=self.executable)
+            audio_source = discord.PCMVolumeTransformer(audio_source, volume=self.volume)
+        elif self.mode == 'auto' and self.volume == 1.0 and guess_stream_codec(url) == 'opus':
+            # Ses seviyesi değişmeyecekse Opus akışı olduğu gibi kopyalanabilir
+            audio_source = discord.FFmpegOpusAudio(
+                url,
+                codec='copy',
+                before_options=before_options,
+                options='-vn',
+                executable=self.executable
+            )
+        else:
+            # Aksi halde ses seviyesi ffmpeg filtresiyle ayarlanır ve Opus'a ffmpeg içinde kodlanır
+            audio_source = discord.FFmpegOpusAudio(
+                url,
+                bitrate=self.bitrate,
+                before_options=before_options,
+                options=f'-vn -filter:a volume={self.volume}',
+                executable=self.executable
+            )
+        
+        return TimedAudioSource(audio_source, functools.partial(self._record_first_frame, guild_id), offset)
+
+    # Kaynağı ses istemcisinde başlat ve sunucunun konum kaynağı yap. Oluşturulup kullanılmadan
+    # kapatılan kaynaklar hiç kaydedilmez; konum, sıra günlüğü ve sarma çalan kaynağı okumaya devam eder.
+    def play(self, guild_id, voice_client, source, after):
+        voice_client.play(source, after=after)
+        self.sources[guild_id] = source
+
+    # Sunucuda çalan parçanın konumu (saniye)
+    def position(self, guild_id):
+        source = self.sources.get(guild_id)
+        return source.position if source else 0
+
+    # Ses thread'inden çağrılır
+    def _record_first_frame(self, guild_id, elapsed):
+        self.first_frame_times[guild_id] = elapsed
+        first_audio_seconds.observe(elapsed)
+        for listener in self.first_frame_listeners:
+            listener(guild_id, elapsed)
+        log.info('İlk ses çerçevesi: %s - %.0f ms', guild_id, elapsed * 1000, extra={'sample': 'first_frame', 'guild': guild_id})
+
+# Arama ve playlist için optimize edilmiş YT-DLP ayarları
+ydl_opts_search = {
+    'format': 'bestaudio/best',
+    'noplaylist': False,
+    'nocheckcertificate': True,
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'auto',
+    'extract_flat': 'in_playlist',
+    'socket_timeout': 5,
+    'skip_download': True,
+    'cachedir': os.path.join(CACHE_DIR, 'yt-dlp'),  # İmza çözümleme önbelleği
+}
+
+# Akış URL'si almak için optimize edilmiş YT-DLP ayarları
+ydl_opts_url = {
+    'format': 'bestaudio/best',
+    'noplaylist': True,
+    'nocheckcertificate': True,
+    'quiet': True,
+    'no_warnings': True,
+    'socket_timeout': 10,
+    'skip_download': True,
+    'cachedir': os.path.join(CACHE_DIR, 'yt-dlp'),  # İmza çözümleme önbelleği
+    'geo_bypass': True,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['mweb', 'android', 'web'],  # mweb client öncelikli
+            'player_skip': 'configs',  # Bazı yapılandırmaları atla
+        },
+        'youtubetab': {
+            'skip': 'webpage',  # Webpage isteklerini atla
+        }
+    },
+}
+
+# Akış URL'si için denenecek YouTube istemcileri (varsayılan tercih sırası)
+DEFAULT_PLAYER_CLIENTS = ['mweb', 'android', 'web', 'tv_embedded']
+PLAYER_CLIENTS = [client.strip() for client in os.getenv('YTDL_PLAYER_CLIENTS', ','.join(DEFAULT_PLAYER_CLIENTS)).split(',') if client.strip()]
+if not PLAYER_CLIENTS:
+    log.warning('YTDL_PLAYER_CLIENTS boş, varsayılan istemciler kullanılacak: %s', ','.join(DEFAULT_PLAYER_CLIENTS))
+    PLAYER_CLIENTS = DEFAULT_PLAYER_CLIENTS
+
+# Tek bir istemciyle akış URL'si alan ayarlar
+def client_profile(client):
+    opts = dict(ydl_opts_url)
+    opts['extractor_args'] = {
+        'youtube': {
+            'player_client': [client],
+            'player_skip': 'configs',
+        },
+        'youtubetab': {
+            'skip': 'webpage',
+        }
+    }
+    return opts
+
+# Çözümleme profili adı
+def client_profile_name(client):
+    return f'resolve:{client}'
+
+# Tüm istemciler başarısız olursa son çare: daha düşük kalite, birden çok istemci
+ydl_opts_alt = dict(ydl_opts_url)
+ydl_opts_alt['format'] = 'worstaudio/worst'
+ydl_opts_alt['extractor_args'] = {
+    'youtube': {
+        'player_client': ['tv_embedded', 'mweb', 'android'],
+    }
 }
 
+# İstemci başına son denemelerin başarı oranı ve gecikmesi.
+# Sağlıklı ve hızlı istemciler önce denenir; art arda başarısız olan istemci bir süre atlanır.
+class ClientHealth:
+    def __init__(self, clients, window=20, failure_threshold=3, cooldown=120):
+        self.clients = list(clients)  # Eşitlik durumunda yapılandırmadaki sıra korunur
+        self.window = window
+        self.failure_threshold = failure_threshold  # Kaç ardışık hatadan sonra istemci atlanır
+        self.cooldown = cooldown  # Atlanan istemcinin tekrar deneneceği süre (saniye)
+        self.samples = {client: deque(maxlen=window) for client in self.clients}
+        self.consecutive_failures = dict.fromkeys(self.clients, 0)
+        self.skip_until = dict.fromkeys(self.clients, 0.0)
+
+    def record_success(self, client, latency):
+        self.samples[client].append((True, latency))
+        self.consecutive_failures[client] = 0
+        self.skip_until[client] = 0.0
+
+    def record_failure(self, client, latency):
+        self.samples[client].append((False, latency))
+        self.consecutive_failures[client] += 1
+        if self.consecutive_failures[client] >= self.failure_threshold:
+            self.skip_until[client] = time.monotonic() + self.cooldown
+
+    # Az örnekli istemcileri aşırı cezalandırmamak için yumuşatılmış başarı oranı
+    def success_rate(self, client):
+        samples = self.samples[client]
+        successes = sum(1 for ok, _ in samples if ok)
+        return (successes + 1) / (len(samples) + 2)
+
+    # Başarılı denemelerin ortalama gecikmesi
+    def latency(self, client):
+        latencies = [latency for ok, latency in self.samples[client] if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def is_failing(self, client):
+        return time.monotonic() < self.skip_until[client]
+
+    # Denenecek istemciler, en sağlıklıdan başlayarak; hepsi başarısızsa yine de hepsini dene
+    def ranked(self):
+        def score(client):
+            latency = self.latency(client)
+            return (-self.success_rate(client), latency if latency is not None else float('inf'), self.clients.index(client))
+        ordered = sorted(self.clients, key=score)
+        healthy = [client for client in ordered if not self.is_failing(client)]
+        return healthy or ordered
+
+    def stats(self):
+        return {client: {
+            'success_rate': self.success_rate(client),
+            'latency': self.latency(client),
+            'samples': len(self.samples[client]),
+            'failing': self.is_failing(client),
+        } for client in self.clients}
+
+# Ayar profili başına önceden hazırlanmış, yeniden kullanılan YoutubeDL örnekleri.
+# Her örnek kendi extractor'larını, HTTP oturumunu (keep-alive bağlantılar) ve çerezlerini korur;
+# bir örnek aynı anda yalnızca bir thread tarafından kullanılır.
+class YoutubeDLPool:
+    def __init__(self, profiles, size=4):
+        self.profiles = profiles  # profil adı -> YT-DLP ayarları
+        self.size = size  # Profil başına boşta tutulacak en fazla örnek
+        self.idle = {name: queue_module.LifoQueue() for name in profiles}
+        self.created = dict.fromkeys(profiles, 0)
+        self.lock = threading.Lock()
+        self.warmed = False
+        self.warming = False  # on_ready'deki arka plan hazırlığı sürüyor mu
+
+    def _create(self, name):
+        with self.lock:
+            self.created[name] += 1
+        ydl = yt_dlp.YoutubeDL(dict(self.profiles[name]))
+        # YouTube extractor'larını şimdi yükle ki ilk istek bu maliyeti ödemesin
+        ydl.get_info_extractor('Youtube')
+        ydl.get_info_extractor('YoutubeTab')
+        return ydl
+
+    # Örneği al, iş bitince havuza geri koy
+    @contextmanager
+    def checkout(self, name):
+        try:
+            ydl = self.idle[name].get_nowait()
+        except queue_module.Empty:
+            ydl = self._create(name)
+        try:
+            yield ydl
+        finally:
+            if self.idle[name].qsize() < self.size:
+                self.idle[name].put(ydl)
+            else:
+                ydl.close()
+
+    # Başlangıçta her profil için örnekleri oluştur (event loop dışında, bir thread'de çağrılır)
+    def warm_up(self):
+        for name in self.profiles:
+            while self.idle[name].qsize() < self.size:
+                self.idle[name].put(self._create(name))
+        self.warmed = True
+
+    def stats(self):
+        return {name: {'idle': self.idle[name].qsize(), 'created': self.created[name]} for name in self.profiles}
+
+# Profiller: arama/playlist, istemci başına akış URL'si ve genel ayarlar
+ydl_pool = YoutubeDLPool({
+    'search': ydl_opts_search,
+    'default': ydl_opts,
+    'fallback': ydl_opts_alt,
+    **{client_profile_name(client): client_profile(client) for client in PLAYER_CLIENTS},
+}, size=int(os.getenv('YTDL_POOL_SIZE', os.getenv('EXTRACTION_WORKERS', '4'))))
+
+# Resolver süreci bağlantı hatası verdiğinde fırlatılır; çağıran yerel ekstraksiyona döner
+class ResolverUnavailable(Exception):
+    pass
+
+# Ayrı resolver sürecine satır başına bir JSON mesajla bağlanan istemci.
+# Her ekstraksiyon thread'i kendi bağlantısını kullanır; istekler bağlantı başına sıralıdır.
+class ResolverClient:
+    def __init__(self, address, timeout=120, retry_interval=30, secret=None):
+        self.address = address  # Unix soket yolu veya "host:port"
+        self.secret = secret  # TCP resolver için paylaşılan anahtar (RESOLVER_SECRET)
+        self.timeout = timeout
+        self.retry_interval = retry_interval  # Bağlantı koptuktan sonra tekrar denemeden önce beklenen süre
+        self.local = threading.local()
+        self.unavailable_until = 0.0
+        self.request_ids = count(1)  # next() birden fazla ekstraksiyon thread'inden güvenle çağrılabilir
+        self.remote_calls = 0
+        self.fallbacks = 0
+
+    def available(self):
+        return time.monotonic() >= self.unavailable_until
+
+    def _connect(self):
+        host, _, port = self.address.rpartition(':')
+        if host and port.isdigit() and not self.address.startswith('/'):
+            conn = socket.create_connection((host, int(port)), timeout=self.timeout)
+        else:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.address)
+        return conn, conn.makefile('rb')
+
+    def _disconnect(self):
+        connection = getattr(self.local, 'connection', None)
+        self.local.connection = None
+        if connection:
+            for closable in reversed(connection):
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+
+    def request(self, op, **payload):
+        message = dict(payload, id=next(self.request_ids), op=op)
+        if self.secret:
+            message['secret'] = self.secret
+        try:
+            if getattr(self.local, 'connection', None) is None:
+                self.local.connection = self._connect()
+            conn, reader = self.local.connection
+            conn.sendall(json.dumps(message).encode() + b'\n')
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("Resolver bağlantıyı kapattı")
+            response = json.loads(line)
+        except (OSError, ValueError) as e:
+            self._disconnect()
+            self.unavailable_until = time.monotonic() + self.retry_interval
+            raise ResolverUnavailable(str(e)) from e
+        
+        if not response.get('ok'):
+            # Hata metni korunur ki kısıtlama algılama aynı şekilde çalışsın
+            raise Exception(response.get('error') or "Resolver hatası")
+        return response.get('result')
+
+    def extract(self, profile, url, **kwargs):
+        self.remote_calls += 1
+        return self.request('extract', profile=profile, url=url, kwargs=kwargs)
+
+    def stats(self):
+        return {
+            'address': self.address,
+            'available': self.available(),
+            'remote_calls': self.remote_calls,
+            'fallbacks': self.fallbacks,
+        }
+
+# RESOLVER_ADDRESS ayarlıysa ekstraksiyonlar önce ayrı resolver sürecine gönderilir
+resolver_client = ResolverClient(os.getenv('RESOLVER_ADDRESS'), secret=os.getenv('RESOLVER_SECRET')) if os.getenv('RESOLVER_ADDRESS') else None
+
+# Bilgi çıkar: resolver süreci varsa orada, yoksa veya ulaşılamıyorsa bu süreçte (ekstraksiyon thread'inde çalışır)
+def extract_info(profile, url, **kwargs):
+    if resolver_client is not None:
+        if resolver_client.available():
+            try:
+                return resolver_client.extract(profile, url, **kwargs)
+            except ResolverUnavailable as e:
+                log.warning('Resolver sürecine ulaşılamadı, yerel ekstraksiyon kullanılıyor: %s', e)
+        resolver_client.fallbacks += 1
+    return extract_info_local(profile, url, **kwargs)
+
+# Havuzdaki YoutubeDL ile bilgi çıkar
+def extract_info_local(profile, url, **kwargs):
+    with ydl_pool.checkout(profile) as ydl:
+        info = ydl.extract_info(url, **kwargs)
+        # process=False ile gelen entries tembel bir generator'dır ve ağ isteği yapar,
+        # bu yüzden event loop'a dönmeden önce burada listeye dönüştür
+        if info and 'entries' in info and not isinstance(info['entries'], list):
+            info['entries'] = list(info['entries'])
+        return info
+
+# Resolver yalnızca bilgi çıkarır: indirme veya başka YoutubeDL seçenekleri isteklerden kabul edilmez
+RESOLVER_EXTRACT_KWARGS = {'process'}
+
+def resolver_request_error(request, secret):
+    if secret and not hmac.compare_digest(str(request.get('secret', '')), secret):
+        return "Yetkisiz istek"
+    op = request.get('op')
+    if op == 'ping':
+        return None
+    if op != 'extract':
+        return f"Bilinmeyen istek: {op}"
+    if request.get('profile') not in ydl_pool.profiles:
+        return f"Bilinmeyen profil: {request.get('profile')}"
+    url = request.get('url')
+    if not isinstance(url, str) or not url.startswith(('https://', 'http://', 'ytsearch')):
+        return "Geçersiz URL"
+    kwargs = request.get('kwargs', {})
+    if not isinstance(kwargs, dict) or set(kwargs) - RESOLVER_EXTRACT_KWARGS - {'download'} or kwargs.get('download'):
+        return "İzin verilmeyen ekstraksiyon seçeneği"
+    return None
+
+# Resolver sürecinde tek bir bağlantının isteklerini sırayla yanıtla
+async def handle_resolver_connection(reader, writer, pool, secret=None):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get('id')
+                error = resolver_request_error(request, secret)
+                if error:
+                    raise ValueError(error)
+                if request['op'] == 'ping':
+                    result = {'pid': os.getpid(), 'pool': ydl_pool.stats()}
+                else:
+                    kwargs = {key: value for key, value in request.get('kwargs', {}).items() if key in RESOLVER_EXTRACT_KWARGS}
+                    info = await loop.run_in_executor(pool, functools.partial(
+                        extract_info_local, request['profile'], request['url'], download=False, **kwargs
+                    ))
+                    # JSON'a dönüştürülemeyen alanları temizle
+                    result = yt_dlp.YoutubeDL.sanitize_info(info)
+                response = {'id': request_id, 'ok': True, 'result': result}
+            except Exception as e:
+                response = {'id': request_id, 'ok': False, 'error': str(e)}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+def is_loopback_host(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+# --resolver: Discord'a bağlanmadan yalnızca ekstraksiyon isteklerini yanıtlayan süreç
+async def run_resolver(address, workers, secret=None):
+    host, _, port = address.rpartition(':')
+    is_tcp = bool(host and port.isdigit() and not address.startswith('/'))
+    # Loopback dışındaki TCP adreslerinde herkes istek gönderebileceği için anahtar zorunludur
+    if is_tcp and not secret and not is_loopback_host(host):
+        raise SystemExit(f"Resolver {address} adresinde RESOLVER_SECRET olmadan dinleyemez")
+    
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resolver')
+    await asyncio.get_running_loop().run_in_executor(pool, ydl_pool.warm_up)
+    handler = functools.partial(handle_resolver_connection, pool=pool, secret=secret)
+    
+    if is_tcp:
+        server = await asyncio.start_server(handler, host, int(port), limit=1024 * 1024)
+    else:
+        directory = os.path.dirname(address)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(address):
+            os.remove(address)  # Önceki çalışmadan kalan soket dosyası
+        server = await asyncio.start_unix_server(handler, address, limit=1024 * 1024)
+    
+    log.info('Resolver dinliyor: %s (%s işçi)', address, workers)
+    async with server:
+        await server.serve_forever()
+
+# Resolver modu shard başlatıcısından ve bot, oynatıcı, önbellekler ve sıra günlüğü oluşturulmadan önce
+# çalışır; asıl bot süreciyle aynı dosyalar için yarışmaz
+if __name__ == '__main__' and '--resolver' in sys.argv[1:]:
+    try:
+        asyncio.run(run_resolver(
+            os.getenv('RESOLVER_ADDRESS', os.path.join(CACHE_DIR, 'resolver.sock')),
+            int(os.getenv('RESOLVER_WORKERS', os.getenv('EXTRACTION_WORKERS', '4'))),
+            os.getenv('RESOLVER_SECRET')
+        ))
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+# Başlatıcı süreç yalnızca alt süreçleri yönetir; bot, oynatıcı ve önbellekler hiç oluşturulmaz
+if __name__ == '__main__' and SHARD_PROCESSES > 1:
+    sys.exit(run_shard_processes(SHARD_COUNT, SHARD_PROCESSES))
+
+# Shard ayarlanmışsa tüm shard'lar (veya bu sürece düşen aralık) tek süreçte AutoShardedBot ile çalışır
+if SHARD_COUNT or SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix='!',
+        intents=intents,
+        shard_count=SHARD_COUNT if isinstance(SHARD_COUNT, int) else None,
+        shard_ids=SHARD_IDS
+    )
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+# googlevideo akış URL'sine gömülü son kullanma zamanını (unix saniye) bul
+def stream_url_expiry(url):
+    try:
+        parsed = urlparse(url)
+        expire = parse_qs(parsed.query).get('expire')
+        if expire:
+            return int(expire[0])
+        # Bazı manifest URL'lerinde parametreler yol içinde gelir: /expire/1700000000/
+        match = re.search(r'/expire/(\d+)', parsed.path)
+        if match:
+            return int(match.group(1))
+    except (ValueError, TypeError):
+        pass
+    return None
+
+# URL'nin süresi dolmuş ya da margin saniye içinde dolacak mı?
+def stream_url_is_stale(url, margin=0):
+    expire = stream_url_expiry(url)
+    return expire is not None and expire - margin <= time.time()
+
+# YouTube URL'sinden 11 karakterlik video ID'sini çıkar
+def youtube_video_id(url):
+    if not url:
+        return None
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    host = (parsed.netloc or '').lower()
+    if host.endswith('youtu.be'):
+        candidate = parsed.path.lstrip('/').split('/')[0]
+    elif host.endswith('youtube.com'):
+        candidate = parse_qs(parsed.query).get('v', [None])[0]
+        if not candidate:
+            match = re.match(r'/(?:embed|v|shorts|live)/([0-9A-Za-z_-]{11})', parsed.path)
+            candidate = match.group(1) if match else None
+    else:
+        return None
+    if candidate and re.fullmatch(r'[0-9A-Za-z_-]{11}', candidate):
+        return candidate
+    return None
+
+# Video ID başına meta veriyi süresiz, akış URL'sini ise süresi dolana kadar saklar.
+# Bellekte LRU, diskte SQLite olmak üzere iki katmanlıdır; disk katmanı yeniden başlatmalarda korunur.
+# SQLite okuma ve yazmaları tek bir thread'de sırayla çalışır; event loop diski hiç beklemez.
+class ResolutionCache:
+    def __init__(self, path=None, max_memory_entries=2000):
+        self.max_memory_entries = max_memory_entries
+        self.memory = OrderedDict()  # video_id -> kayıt
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='resolution-cache')
+        self.metadata_hits = 0
+        self.metadata_misses = 0
+        self.url_hits = 0
+        self.url_misses = 0
+        self.db = None
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                self.db.execute('PRAGMA journal_mode=WAL')
+                self.db.execute('PRAGMA synchronous=NORMAL')
+                self.db.execute(
+                    'CREATE TABLE IF NOT EXISTS tracks ('
+                    'video_id TEXT PRIMARY KEY, title TEXT, uploader TEXT, duration REAL, '
+                    'thumbnail TEXT, webpage_url TEXT, stream_url TEXT, expire INTEGER, updated_at REAL)'
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                log.warning('Önbellek veritabanı açılamadı, yalnızca bellek kullanılacak: %s', e)
+                self.db = None
+
+    # Kaydı yalnızca bellekten al
+    def _get_memory(self, video_id):
+        with self.lock:
+            record = self.memory.get(video_id)
+            if record is not None:
+                self.memory.move_to_end(video_id)
+            return record
+
+    # Kaydı önce bellekten, yoksa önbellek thread'inde diskten al
+    async def _get(self, video_id):
+        record = self._get_memory(video_id)
+        if record is not None or self.db is None:
+            return record
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._read_disk, video_id)
+
+    # Önbellek thread'inde çalışır
+    def _read_disk(self, video_id):
+        try:
+            row = self.db.execute(
+                'SELECT title, uploader, duration, thumbnail, webpage_url, stream_url, expire '
+                'FROM tracks WHERE video_id = ?', (video_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning('Önbellek okuma hatası: %s', e)
+            return None
+        if row is None:
+            return None
+        with self.lock:
+            # Okuma sürerken put() daha yeni bir kayıt yazdıysa onu koru
+            if video_id in self.memory:
+                return self.memory[video_id]
+            record = {
+                'title': row[0],
+                'uploader': row[1],
+                'duration': row[2],
+                'thumbnail': row[3],
+                'webpage_url': row[4],
+                'url': row[5],
+                'expire': row[6],
+            }
+            self._remember(video_id, record)
+            return record
+
+    def _remember(self, video_id, record):
+        self.memory[video_id] = record
+        self.memory.move_to_end(video_id)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _url_valid(self, record, margin):
+        # Son kullanma zamanı bilinmeyen URL'ler güvenilir değil
+        return bool(record.get('url')) and record.get('expire') is not None and record['expire'] - margin > time.time()
+
+    @staticmethod
+    def _metadata(record):
+        return {key: record[key] for key in ('title', 'uploader', 'duration', 'thumbnail', 'webpage_url') if record[key] is not None}
+
+    # Yalnızca meta veri (başlık, yükleyen, süre, küçük resim)
+    async def get_metadata(self, video_id):
+        record = await self._get(video_id) if video_id else None
+        if record is None:
+            self.metadata_misses += 1
+            return None
+        self.metadata_hits += 1
+        return self._metadata(record)
+
+    # Bellekteki meta veri; diske gitmez, eşzamanlı kodda kullanılabilir
+    def peek_metadata(self, video_id):
+        record = self._get_memory(video_id) if video_id else None
+        return self._metadata(record) if record is not None else None
+
+    # Süresi dolmamış akış URL'si
+    async def get_stream_url(self, video_id, margin=0):
+        record = await self._get(video_id) if video_id else None
+        if record is None or not self._url_valid(record, margin):
+            self.url_misses += 1
+            return None
+        self.url_hits += 1
+        return record['url']
+
+    # Meta veri ve geçerli akış URL'si birlikte (doğrudan çalmaya yeterli bilgi)
+    async def get_info(self, video_id, margin=0):
+        record = await self._get(video_id) if video_id else None
+        if record is None or not self._url_valid(record, margin):
+            self.url_misses += 1
+            return None
+        self.url_hits += 1
+        self.metadata_hits += 1
+        info = dict(record)
+        info['id'] = video_id
+        return info
+
+    # yt-dlp bilgisini önbelleğe yaz
+    def put(self, video_id, info):
+        if not video_id or not info:
+            return
+        stream_url = info.get('url') or None
+        with self.lock:
+            previous = self.memory.get(video_id)
+            record = {
+                'title': info.get('title') or (previous or {}).get('title'),
+                'uploader': info.get('uploader') or (previous or {}).get('uploader'),
+                'duration': info.get('duration') or (previous or {}).get('duration'),
+                'thumbnail': info.get('thumbnail') or (previous or {}).get('thumbnail'),
+                'webpage_url': info.get('webpage_url') or f"https://www.youtube.com/watch?v={video_id}",
+                'url': stream_url,
+                'expire': stream_url_expiry(stream_url) if stream_url else None,
+            }
+            # Yeni bilgide URL yoksa eskisini koru
+            if not stream_url and previous:
+                record['url'] = previous.get('url')
+                record['expire'] = previous.get('expire')
+            self._remember(video_id, record)
+        if self.db is not None:
+            # Yazma sıraya alınır; çağıran (event loop) beklemez
+            self.executor.submit(self._write_disk, video_id, record, time.time())
+
+    # Önbellek thread'inde çalışır
+    def _write_disk(self, video_id, record, updated_at):
+        try:
+            self.db.execute(
+                'INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (video_id, record['title'], record['uploader'], record['duration'], record['thumbnail'],
+                 record['webpage_url'], record['url'], record['expire'], updated_at)
+            )
+            self.db.commit()
+        except sqlite3.Error as e:
+            log.warning('Önbellek yazma hatası: %s', e)
+
+    def _count_disk(self):
+        try:
+            return self.db.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+        except sqlite3.Error as e:
+            log.warning('Önbellek okuma hatası: %s', e)
+            return 0
+
+    # İsabet/kaçırma sayaçları
+    async def stats(self):
+        disk_entries = 0
+        if self.db is not None:
+            disk_entries = await asyncio.get_running_loop().run_in_executor(self.executor, self._count_disk)
+        return {
+            'metadata_hits': self.metadata_hits,
+            'metadata_misses': self.metadata_misses,
+            'url_hits': self.url_hits,
+            'url_misses': self.url_misses,
+            'memory_entries': len(self.memory),
+            'disk_entries': disk_entries,
+        }
+
+# Arama sorgusunu önbellek anahtarı için normalleştir:
+# "Işık", "ışık" ve "ISIK" aynı anahtara düşer
+def normalize_query(query):
+    query = unicodedata.normalize('NFKD', query.casefold())
+    # Aksan/işaretleri at (ş -> s, ğ -> g, İ'nin noktası vb.)
+    query = ''.join(ch for ch in query if not unicodedata.combining(ch))
+    # Noktasız ı'nın ayrıştırılmış biçimi yok, elle eşle
+    query = query.replace('ı', 'i')
+    return ' '.join(query.split())
+
+# ytsearch sonuçlarını normalleştirilmiş sorgu başına sınırlı süre saklar.
+# Aynı anda gelen özdeş aramalar tek bir devam eden isteği paylaşır (single-flight).
+class SearchCache:
+    def __init__(self, max_entries=500, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl  # saniye
+        self.entries = OrderedDict()  # anahtar -> (son geçerlilik, sonuçlar)
+        self.inflight = {}  # anahtar -> devam eden arama görevi
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Devam eden bir aramaya katılan istekler
+
+    async def get_or_fetch(self, query, fetch):
+        key = normalize_query(query)
+        
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            del self.entries[key]
+        
+        task = self.inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(fetch())
+            self.inflight[key] = task
+            task.add_done_callback(functools.partial(self._store, key))
+        
+        # Bekleyenlerden biri iptal edilse bile arama diğerleri için sürsün
+        return await asyncio.shield(task)
+
+    def _store(self, key, task):
+        self.inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        results = task.result()
+        # Boş sonuçları saklama, bir sonraki istekte tekrar denensin
+        if not results:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'entries': len(self.entries),
+        }
+
+# Sık çalınan parçaları diskte Opus dosyası olarak tutan, boyutu sınırlı LRU önbellek.
+# Bir parça min_plays kez çalındıktan sonra arka planda indirilir; sonraki çalmalar yerel dosyadan yapılır.
+class AudioCache:
+    def __init__(self, directory, max_bytes=0, min_plays=3, executable='ffmpeg', bitrate=128, max_counted=5000):
+        self.directory = directory
+        self.max_bytes = max_bytes  # 0 ise önbellek kapalı
+        self.min_plays = min_plays
+        self.executable = executable
+        self.bitrate = bitrate
+        self.play_counts = OrderedDict()  # video_id -> çalınma sayısı, en eski çalınan başta
+        self.max_counted = max_counted  # Sayacı tutulan en fazla parça; aşılınca en eski çalınan unutulur
+        self.files = OrderedDict()  # video_id -> dosya boyutu, en eski kullanılan başta
+        self.total_bytes = 0
+        self.filling = set()  # İndirilmekte olan video_id'ler
+        self.fill_tasks = set()  # Süren indirme görevleri (çöp toplayıcı yarıda kesmesin diye referans tutulur)
+        self.fill_lock = None  # Aynı anda tek indirme (bant genişliği oynatmaya kalsın)
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, video_id):
+        return os.path.join(self.directory, f'{video_id}.opus')
+
+    # Mevcut dosyaları son kullanım sırasıyla yükle
+    def _load_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith('.part'):
+                    os.remove(path)  # Yarım kalmış indirme
+                elif name.endswith('.opus'):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, name[:-len('.opus')], stat.st_size))
+        except OSError as e:
+            log.warning('Ses önbelleği dizini okunamadı, önbellek kapatıldı: %s', e)
+            self.max_bytes = 0
+            return
+        for _, video_id, size in sorted(entries):
+            self.files[video_id] = size
+            self.total_bytes += size
+        self._evict()
+
+    # Parça yerelde varsa dosya yolunu döndür
+    def lookup(self, video_id):
+        if not self.enabled or not video_id:
+            return None
+        if video_id not in self.files:
+            self.misses += 1
+            return None
+        path = self._path(video_id)
+        try:
+            os.utime(path)  # Yeniden başlatmadan sonra da LRU sırası korunsun
+        except OSError:
+            # Dosya dışarıdan silinmiş
+            self.total_bytes -= self.files.pop(video_id)
+            self.misses += 1
+            return None
+        self.files.move_to_end(video_id)
+        self.hits += 1
+        return path
+
+    # Parça uzaktan çalınmaya başladığında çağrılır; eşik aşıldıysa arka planda indir
+    def record_play(self, song):
+        if not self.enabled or not song.video_id or song.video_id in self.files:
+            return
+        count = self.play_counts.pop(song.video_id, 0) + 1
+        self.play_counts[song.video_id] = count
+        if len(self.play_counts) > self.max_counted:
+            self.play_counts.popitem(last=False)
+        if count >= self.min_plays and song.stream_url and song.video_id not in self.filling:
+            self.filling.add(song.video_id)
+            task = asyncio.create_task(self.fill(song.video_id, song.stream_url))
+            self.fill_tasks.add(task)
+            task.add_done_callback(self.fill_tasks.discard)
+
+    async def fill(self, video_id, stream_url):
+        if self.fill_lock is None:
+            self.fill_lock = asyncio.Lock()
+        path = self._path(video_id)
+        part_path = f'{path}.{os.getpid()}.part'  # Aynı dizini paylaşan shard süreçleri çakışmasın
+        try:
+            async with self.fill_lock:
+                # Kaynak zaten Opus ise yeniden kodlamadan kopyala
+                if guess_stream_codec(stream_url) == 'opus':
+                    codec = ['-c:a', 'copy']
+                else:
+                    codec = ['-c:a', 'libopus', '-b:a', f'{self.bitrate}k']
+                process = await asyncio.create_subprocess_exec(
+                    self.executable, '-nostdin', '-loglevel', 'error', '-y',
+                    '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                    '-i', stream_url, '-vn', *codec, '-f', 'opus', part_path,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                _, stderr = await process.communicate()
+                if process.returncode != 0:
+                    raise Exception(stderr.decode(errors='replace').strip() or f"ffmpeg çıkış kodu {process.returncode}")
+                os.replace(part_path, path)
+            size = os.path.getsize(path)
+            self.files[video_id] = size
+            self.total_bytes += size
+            self.play_counts.pop(video_id, None)
+            self._evict()
+            log.info('Ses önbelleğine eklendi: %s (%s KB)', video_id, size // 1024)
+        except Exception as e:
+            log.warning('Ses önbelleğine ekleme hatası: %s - %s', video_id, e)
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+        finally:
+            self.filling.discard(video_id)
+
+    # Boyut sınırı aşıldıysa en uzun süredir kullanılmayan dosyaları sil
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.files:
+            video_id, size = self.files.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(video_id))
+            except OSError as e:
+                log.warning('Ses önbelleği dosyası silinemedi: %s - %s', video_id, e)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'files': len(self.files),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'filling': len(self.filling),
+        }
+
+# Sıra en fazla uzunluğa ulaştığında fırlatılır
+class QueueFull(Exception):
+    pass
+
+UNKNOWN_TITLE = 'Bilinmeyen Başlık'
+UNKNOWN_UPLOADER = 'Bilinmeyen Yükleyici'
+
+# Sıradaki tek bir şarkının kompakt kaydı. YouTube şarkılarında yalnızca video ID'si saklanır,
+# sayfa ve küçük resim URL'leri istendiğinde türetilir. İmzalı akış URL'si (~1 KB) yalnızca
+# şarkı ön çözümleme penceresindeyken ya da çalarken tutulur.
+class Track:
+    __slots__ = ('video_id', 'source_url', 'title', 'uploader', 'duration', 'thumbnail_url', 'stream_url', 'prefetch_failed')
+
+    def __init__(self, title, video_id=None, source_url=None, uploader=None, duration=None, thumbnail_url=None, stream_url=''):
+        self.video_id = sys.intern(video_id) if video_id else None
+        # YouTube dışı kaynaklar için sayfa URL'si ve küçük resim ayrıca saklanır
+        self.source_url = None if self.video_id else source_url
+        self.thumbnail_url = None if self.video_id else thumbnail_url
+        self.title = title or UNKNOWN_TITLE
+        # Aynı yükleyici yüzlerce şarkıda tekrarlanır, tek kopya tut
+        self.uploader = sys.intern(uploader) if uploader else UNKNOWN_UPLOADER
+        self.duration = int(duration) if isinstance(duration, (int, float)) and duration else None
+        self.stream_url = stream_url or ''
+        self.prefetch_failed = False
+
+    # yt-dlp (ya da önbellek) bilgisinden kayıt oluştur.
+    # İşlenmiş (process=True) bilgide 'url' akış URL'sidir; with_stream ile alınır.
+    @classmethod
+    def from_info(cls, info, webpage_url=None, with_stream=False):
+        webpage_url = info.get('webpage_url') or webpage_url or ''
+        video_id = youtube_video_id(webpage_url)
+        if not video_id and (info.get('extractor_key') == 'Youtube' or info.get('ie_key') == 'Youtube'):
+            video_id = info.get('id')
+        return cls(
+            info.get('title'),
+            video_id=video_id,
+            source_url=webpage_url,
+            uploader=info.get('uploader') or info.get('channel'),
+            duration=info.get('duration'),
+            thumbnail_url=info.get('thumbnail'),
+            stream_url=info.get('url', '') if with_stream else ''
+        )
+
+    @property
+    def webpage_url(self):
+        if self.video_id:
+            return f"https://www.youtube.com/watch?v={self.video_id}"
+        return self.source_url or ''
+
+    @property
+    def thumbnail(self):
+        if self.video_id:
+            return f"https://i.ytimg.com/vi/{self.video_id}/hqdefault.jpg"
+        return self.thumbnail_url
+
+    # Zenginleştirilmiş bilgiyle eksik alanları yerinde güncelle
+    def update_from_info(self, info):
+        if info.get('title'):
+            self.title = info['title']
+        if info.get('uploader'):
+            self.uploader = sys.intern(info['uploader'])
+        if isinstance(info.get('duration'), (int, float)) and info['duration']:
+            self.duration = int(info['duration'])
+        if not self.video_id and info.get('thumbnail'):
+            self.thumbnail_url = info['thumbnail']
+
+    # Akış URL'sini bırak (pencere dışına çıkan ya da biten şarkılar)
+    def release_stream(self):
+        self.stream_url = ''
+
+    # Günlük dosyası için kompakt kayıt (akış URL'si süresi dolacağı için saklanmaz)
+    def to_record(self):
+        return [self.video_id, self.source_url, self.title, self.uploader, self.duration, self.thumbnail_url]
+
+    @classmethod
+    def from_record(cls, record):
+        video_id, source_url, title, uploader, duration, thumbnail_url = record
+        return cls(title, video_id=video_id, source_url=source_url, uploader=uploader, duration=duration, thumbnail_url=thumbnail_url)
+
+# Şarkının sıradaki kimliği (YouTube video ID'si, yoksa sayfa URL'si)
+def queue_key(song):
+    return song.video_id or song.webpage_url
+
+# Sunucu şarkı sırası: uçlarda O(1) ekleme/çıkarma yapan deque ve kimlik indeksi.
+# Kimlik eklenirken bir kez hesaplanır ve şarkıyla birlikte (kimlik, şarkı) olarak saklanır.
+class GuildQueue:
+    def __init__(self, max_length=None):
+        self.items = deque()  # (kimlik, şarkı)
+        self.index = {}  # kimlik -> sıradaki adet
+        self.max_length = max_length
+        self.journal = None  # Değişiklikleri kaydeden fonksiyon: journal(işlem, *argümanlar)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return (song for _, song in self.items)
+
+    def __getitem__(self, position):
+        return self.items[position][1]
+
+    def _entry(self, song):
+        key = queue_key(song)
+        self.index[key] = self.index.get(key, 0) + 1
+        return key, song
+
+    def _drop_key(self, key):
+        count = self.index.get(key, 0)
+        if count <= 1:
+            self.index.pop(key, None)
+        else:
+            self.index[key] = count - 1
+
+    def _log(self, op, *args):
+        if self.journal is not None:
+            self.journal(op, *args)
+
+    def _check_room(self):
+        if self.max_length is not None and len(self.items) >= self.max_length:
+            raise QueueFull(f"Sıra dolu (en fazla {self.max_length} şarkı).")
+
+    def append(self, song):
+        self._check_room()
+        self.items.append(self._entry(song))
+        self._log('append', song)
+
+    # Sıradan az önce çıkarılmış bir şarkıyı geri koyarken sınır uygulanmaz (check_room=False);
+    # aksi halde arada sıra dolduysa şarkı kaybolur
+    def appendleft(self, song, check_room=True):
+        if check_room:
+            self._check_room()
+        self.items.appendleft(self._entry(song))
+        self._log('appendleft', song)
+
+    # Sığdığı kadar ekle, eklenen şarkı sayısını döndür
+    def extend(self, songs):
+        added = []
+        for song in songs:
+            if self.max_length is not None and len(self.items) >= self.max_length:
+                break
+            self.items.append(self._entry(song))
+            added.append(song)
+        self._log('extend', added)
+        return len(added)
+
+    def popleft(self):
+        key, song = self.items.popleft()
+        self._drop_key(key)
+        self._log('popleft')
+        return song
+
+    # Verilen pozisyondaki (0'dan başlayan) şarkıyı çıkar
+    def remove(self, position):
+        key, song = self.items[position]
+        del self.items[position]
+        self._drop_key(key)
+        self._log('remove', position)
+        return song
+
+    # Aynı nesneyi (eşit olanı değil) sıradan çıkar
+    def remove_item(self, song):
+        for position, (key, queued) in enumerate(self.items):
+            if queued is song:
+                del self.items[position]
+                self._drop_key(key)
+                self._log('remove', position)
+                return True
+        return False
+
+    # Şarkıyı bir pozisyondan diğerine taşı
+    def move(self, source, destination):
+        entry = self.items[source]
+        del self.items[source]
+        self.items.insert(destination, entry)
+        self._log('move', source, destination)
+        return entry[1]
+
+    def shuffle(self):
+        items = list(self.items)
+        random.shuffle(items)
+        self.items = deque(items)
+        if self.journal is not None:
+            self.journal('replace', list(self))
+
+    # Tekrarlanan şarkıların ilk geçtiği yer dışındakileri çıkar, çıkarılan sayıyı döndür
+    def dedupe(self):
+        seen = set()
+        kept = deque()
+        for key, song in self.items:
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append((key, song))
+        removed = len(self.items) - len(kept)
+        self.items = kept
+        self.index = dict.fromkeys(seen, 1)
+        if removed and self.journal is not None:
+            self.journal('replace', list(self))
+        return removed
+
+    def clear(self):
+        self.items.clear()
+        self.index.clear()
+        self._log('clear')
+
+    # Şarkı (kimliğiyle) sırada var mı? O(1)
+    def contains(self, key):
+        return key in self.index
+
+    # Baştan n şarkı (tüm sırayı kopyalamadan)
+    def head(self, n):
+        return [song for _, song in islice(self.items, n)]
+
+# Sıra ve oynatma durumunun yalnızca sona eklenen günlüğü (JSON satırları). Her değişiklik tek satır
+# olarak yazılır; belirli sayıda satırdan sonra dosya, sunucu başına tek bir anlık görüntü satırıyla
+# yeniden yazılır (sıkıştırma). Yeniden başlatmada satırlar sırayla uygulanarak oturumlar geri kurulur.
+class QueueJournal:
+    def __init__(self, path, compact_every=1000):
+        self.path = path
+        self.compact_every = compact_every
+        self.file = None  # start() çağrılana kadar kayıt yazılmaz
+        self.pending = None  # Sıkıştırma sürerken gelen satırlar
+        self.snapshot = None  # () -> {guild_id: oturum}
+        self.records = 0  # Son sıkıştırmadan bu yana yazılan satır
+        self.compactions = 0
+        self.compact_task = None  # Süren sıkıştırma; aynı dosya için ikincisi başlatılmaz
+
+    @property
+    def active(self):
+        return self.file is not None or self.pending is not None
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, Track):
+            return value.to_record()
+        if isinstance(value, list):
+            return [QueueJournal._encode(item) for item in value]
+        return value
+
+    @staticmethod
+    def new_session():
+        return {'voice': None, 'text': None, 'now': None, 'position': 0, 'queue': deque()}
+
+    # Tek bir günlük satırını oturum durumuna uygula
+    @staticmethod
+    def apply(sessions, entry):
+        guild_id, op, args = entry['g'], entry['op'], entry.get('a', [])
+        if op == 'session':
+            session = dict(args[0])
+            session['queue'] = deque(session['queue'])
+            sessions[guild_id] = session
+            return
+        session = sessions.setdefault(guild_id, QueueJournal.new_session())
+        queue = session['queue']
+        if op == 'append':
+            queue.append(args[0])
+        elif op == 'appendleft':
+            queue.appendleft(args[0])
+        elif op == 'extend':
+            queue.extend(args[0])
+        elif op == 'popleft':
+            if queue:
+                queue.popleft()
+        elif op == 'remove':
+            del queue[args[0]]
+        elif op == 'move':
+            record = queue[args[0]]
+            del queue[args[0]]
+            queue.insert(args[1], record)
+        elif op == 'replace':
+            session['queue'] = deque(args[0])
+        elif op == 'clear':
+            queue.clear()
+        elif op == 'play':
+            session['now'], session['position'], session['voice'], session['text'] = args
+        elif op == 'position':
+            session['position'] = args[0]
+        elif op == 'stop':
+            session['now'] = None
+            session['position'] = 0
+
+    # Günlüğü baştan oku; yarım yazılmış son satır (çökme) yok sayılır
+    def load(self):
+        sessions = {}
+        if not self.path or not os.path.exists(self.path):
+            return sessions
+        with open(self.path, encoding='utf-8') as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    log.warning('Günlükte bozuk satır, sonrası okunmadı: %s', self.path)
+                    break
+                try:
+                    self.apply(sessions, entry)
+                except (KeyError, IndexError, ValueError, TypeError) as e:
+                    log.warning('Günlük satırı uygulanamadı: %s', e)
+        return sessions
+
+    def record(self, guild_id, op, *args):
+        if not self.active:
+            return
+        line = json.dumps({'g': guild_id, 'op': op, 'a': [self._encode(arg) for arg in args]}, ensure_ascii=False, separators=(',', ':')) + '\n'
+        if self.pending is not None:
+            self.pending.append(line)
+            return
+        try:
+            self.file.write(line)
+            self.file.flush()
+        except OSError as e:
+            log.warning('Günlük yazma hatası: %s', e)
+            return
+        self.records += 1
+        if self.records >= self.compact_every and (self.compact_task is None or self.compact_task.done()):
+            self.compact_task = start_background_task(self.compact())
+
+    # Geri yükleme bittikten sonra çağrılır: dosyayı mevcut durumla yeniden yazar ve kayda başlar
+    async def start(self, snapshot):
+        if not self.path:
+            return
+        self.snapshot = snapshot
+        await self.compact()
+
+    # Anlık görüntü event loop'ta alınır, dosya ise başka bir thread'de yazılıp atomik olarak değiştirilir
+    async def compact(self):
+        if self.pending is not None or self.snapshot is None:
+            return
+        lines = [
+            json.dumps({'g': guild_id, 'op': 'session', 'a': [{key: self._encode(value) for key, value in session.items()}]},
+                       ensure_ascii=False, separators=(',', ':')) + '\n'
+            for guild_id, session in self.snapshot().items()
+        ]
+        self.pending = []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, lines)
+            self.compactions += 1
+            self.records = 0
+        except OSError as e:
+            log.warning('Günlük sıkıştırılamadı: %s', e)
+        finally:
+            buffered, self.pending = self.pending, None
+            try:
+                if self.file is not None:
+                    self.file.close()
+                self.file = open(self.path, 'a', encoding='utf-8')
+                self.file.writelines(buffered)
+                self.file.flush()
+                self.records += len(buffered)
+            except OSError as e:
+                log.error('Günlük dosyası açılamadı, oturumlar kaydedilmeyecek: %s', e)
+                self.file = None
+        log.debug('Günlük sıkıştırıldı: %s oturum', len(lines))
+
+    def _write_snapshot(self, lines):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as snapshot_file:
+            snapshot_file.writelines(lines)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary, self.path)
+
+    def stats(self):
+        return {'records': self.records, 'compactions': self.compactions, 'active': self.active}
+
+# Ekstraksiyon kuyruğu dolduğunda fırlatılır
+class ExtractionQueueFull(Exception):
+    pass
+
+# YouTube'un hız sınırı / bot koruması yanıtları
+THROTTLE_MARKERS = (
+    "Sign in to confirm you're not a bot",
+    "This content isn't available",
+    'HTTP Error 429',
+    'Too Many Requests',
+)
+
+def is_throttle_error(error):
+    message = str(error)
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+# Videonun kalıcı olarak çalınamadığını gösteren yt-dlp hataları (tekrar denemek anlamsız)
+UNAVAILABLE_MARKERS = (
+    'Video unavailable',
+    'Private video',
+    'This video has been removed',
+    'This video is no longer available',
+    'account associated with this video has been terminated',
+    'members-only content',
+)
+
+# Resolver sürecinden gelen hatalar düz Exception olduğu için mesaja bakılır
+def is_unavailable_error(error):
+    if isinstance(error, (ExtractionQueueFull, asyncio.TimeoutError, ConnectionError)) or is_throttle_error(error):
+        return False
+    message = str(error)
+    return any(marker in message for marker in UNAVAILABLE_MARKERS)
+
+# Tüm ekstraksiyon çağrılarının önündeki global token bucket.
+# Kısıtlama yanıtı gelince hız yarıya iner, başarılı isteklerle yavaşça geri artar (AIMD).
+class AdaptiveRateLimiter:
+    def __init__(self, rate=5.0, burst=10, min_rate=0.2, increase_step=0.05, cooldown=60):
+        self.max_rate = rate  # saniyede en fazla istek
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase_step = increase_step  # Başarılı istek başına artış
+        self.cooldown = cooldown  # Kısıtlamadan sonra hızın artmaya başlamadan önce beklediği süre
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.throttled_until = 0.0
+        self.throttle_events = 0
+        self.last_throttle = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    # Kullanılmayan token'ı geri ver (ör. iptal edilmiş iş)
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def record_success(self):
+        if time.monotonic() >= self.throttled_until and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_throttle(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.throttled_until = time.monotonic() + self.cooldown
+        self.throttle_events += 1
+        self.last_throttle = time.time()
+        log.warning('YouTube kısıtlaması algılandı, ekstraksiyon hızı düşürüldü: %.2f istek/sn', self.rate)
+
+    def is_throttled(self):
+        return time.monotonic() < self.throttled_until
+
+    def state(self):
+        self._refill()
+        return {
+            'rate': self.rate,
+            'max_rate': self.max_rate,
+            'tokens': self.tokens,
+            'throttled': self.is_throttled(),
+            'throttle_events': self.throttle_events,
+            'last_throttle': self.last_throttle,
+        }
+
+# İş öncelikleri: kullanıcının beklediği aramalar arka plan işlerinden önce çalışır
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# yt-dlp çağrılarını event loop dışında, sunucular arasında sırayla (adil) çalıştırır
+class ExtractionExecutor:
+    def __init__(self, max_workers=4, max_pending=100, max_pending_per_guild=20, rate_limiter=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending  # Toplam bekleyen iş limiti
+        self.max_pending_per_guild = max_pending_per_guild  # Sunucu başına bekleyen iş limiti
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ytdlp')
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        # Öncelik başına: sunucu başına bekleyen işler ve sırası gelen sunucular (round-robin)
+        self.pending = {PRIORITY_INTERACTIVE: {}, PRIORITY_BACKGROUND: {}}
+        self.rotation = {PRIORITY_INTERACTIVE: deque(), PRIORITY_BACKGROUND: deque()}
+        self.pending_count = 0
+        self.running_count = 0
+        self.jobs_available = None
+        self.workers = []
+
+    # İşçi görevlerini ilk kullanımda başlat (event loop hazır olmalı)
+    def _ensure_workers(self):
+        if self.workers:
+            return
+        self.jobs_available = asyncio.Semaphore(0)
+        for _ in range(self.max_workers):
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    # Kullanıcının beklediği işi sıraya al ve sonucunu bekle
+    async def run(self, guild_id, func, *args, **kwargs):
+        return await self._submit(PRIORITY_INTERACTIVE, guild_id, functools.partial(func, *args, **kwargs))
+
+    # Arka plan işini (ön çözümleme, playlist detayları) düşük öncelikle çalıştır
+    async def run_background(self, guild_id, func, *args, **kwargs):
+        return await self._submit(PRIORITY_BACKGROUND, guild_id, functools.partial(func, *args, **kwargs))
+
+    async def _submit(self, priority, guild_id, job):
+        self._ensure_workers()
+
+        if self.pending_count >= self.max_pending:
+            raise ExtractionQueueFull("Şu anda çok fazla istek işleniyor, lütfen biraz sonra tekrar deneyin.")
+
+        pending = self.pending[priority]
+        guild_jobs = pending.get(guild_id)
+        if guild_jobs is None:
+            guild_jobs = pending[guild_id] = deque()
+            self.rotation[priority].append(guild_id)
+        elif len(guild_jobs) >= self.max_pending_per_guild:
+            raise ExtractionQueueFull("Bu sunucu için çok fazla bekleyen istek var, lütfen biraz sonra tekrar deneyin.")
+
+        future = asyncio.get_running_loop().create_future()
+        guild_jobs.append((job, future))
+        self.pending_count += 1
+        self.jobs_available.release()
+        return await future
+
+    # En yüksek öncelikte, sırası gelen sunucunun ilk işini al
+    def _next_job(self):
+        priority = PRIORITY_INTERACTIVE if self.rotation[PRIORITY_INTERACTIVE] else PRIORITY_BACKGROUND
+        rotation = self.rotation[priority]
+        pending = self.pending[priority]
+        guild_id = rotation.popleft()
+        guild_jobs = pending[guild_id]
+        job = guild_jobs.popleft()
+        if guild_jobs:
+            rotation.append(guild_id)
+        else:
+            del pending[guild_id]
+        self.pending_count -= 1
+        return job
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.jobs_available.acquire()
+            # İş, hız izni alındıktan sonra seçilir; beklerken gelen etkileşimli iş öne geçer
+            await self.rate_limiter.acquire()
+            job, future = self._next_job()
+
+            # Bekleyen taraf iptal edildiyse işi hiç çalıştırma
+            if future.cancelled():
+                self.rate_limiter.refund()
+                continue
+
+            self.running_count += 1
+            try:
+                result = await loop.run_in_executor(self.pool, job)
+            except Exception as e:
+                if is_throttle_error(e):
+                    self.rate_limiter.record_throttle()
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.rate_limiter.record_success()
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.running_count -= 1
+
+    # Bekleyen ve çalışan iş sayısı
+    def backlog(self):
+        return {
+            'pending': self.pending_count,
+            'interactive': sum(len(jobs) for jobs in self.pending[PRIORITY_INTERACTIVE].values()),
+            'background': sum(len(jobs) for jobs in self.pending[PRIORITY_BACKGROUND].values()),
+            'running': self.running_count,
+        }
+
+# Kontrol paneli butonu. custom_id sunucuyu ve eylemi taşır; setup_hook'ta bir kez kaydedildiği için
+# yeniden başlatmadan önce gönderilmiş paneller de çalışmaya devam eder
+class PanelButton(discord.ui.DynamicItem[discord.ui.Button], template=r'musicbot:panel:(?P<guild>[0-9]+):(?P<action>pause|skip|queue|stop|leave)'):
+    ACTIONS = {
+        'pause': ("⏯️ Duraklat/Devam Et", discord.ButtonStyle.primary),
+        'skip': ("⏭️ Geç", discord.ButtonStyle.primary),
+        'queue': ("📋 Sıra", discord.ButtonStyle.primary),
+        'stop': ("⏹️ Durdur", discord.ButtonStyle.danger),
+        'leave': ("👋 Ayrıl", discord.ButtonStyle.danger),
+    }
+
+    def __init__(self, guild_id, action):
+        label, style = self.ACTIONS[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f'musicbot:panel:{guild_id}:{action}'))
+        self.guild_id = guild_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['guild']), match['action'])
+
+    async def callback(self, interaction):
+        if interaction.guild_id != self.guild_id:
+            await interaction.response.send_message("Bu panel başka bir sunucuya ait.", ephemeral=True)
+            return
+        await music_player.handle_panel_action(interaction, self.action)
+
+# Arama sonucu butonu. custom_id seçilen videonun kimliğini taşır, böylece seçim bellekteki
+# sonuç listesine bağlı kalmaz ve yeniden başlatmadan sonra da yapılabilir
+class SearchButton(discord.ui.DynamicItem[discord.ui.Button], template=r'musicbot:search:(?P<guild>[0-9]+):(?P<choice>[A-Za-z0-9_-]{11}|cancel)'):
+    def __init__(self, guild_id, choice, label):
+        style = discord.ButtonStyle.danger if choice == 'cancel' else discord.ButtonStyle.primary
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f'musicbot:search:{guild_id}:{choice}'))
+        self.guild_id = guild_id
+        self.choice = choice
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match['guild']), match['choice'], item.label)
+
+    async def callback(self, interaction):
+        if interaction.guild_id != self.guild_id:
+            await interaction.response.send_message("Bu arama başka bir sunucuya ait.", ephemeral=True)
+            return
+        if self.choice == 'cancel':
+            await music_player.cancel_search(interaction)
+        else:
+            await music_player.select_search_result(interaction, self.choice, self.item.label)
+
+# Sunucunun kontrol paneli görünümü. Tıklamaları bot.add_dynamic_items ile kayıtlı butonlar karşılar;
+# görünüm yalnızca bileşenleri taşır ve durdurulmuş olarak gönderilir ki discord.py onu mesaj başına
+# ViewStore'da süresiz tutmasın.
+class ControlPanelView(discord.ui.View):
+    def __init__(self, guild_id):
+        super().__init__(timeout=None)
+        for action in PanelButton.ACTIONS:
+            self.add_item(PanelButton(guild_id, action))
+        self.stop()
+
+# Arama sonuçları görünümü (panel gibi durdurulmuş olarak gönderilir)
+class SearchResultView(discord.ui.View):
+    def __init__(self, guild_id, tracks):
+        super().__init__(timeout=None)
+        seen = set()
+        for i, track in enumerate(tracks):
+            # custom_id video kimliğinden oluşur: kimliksiz veya tekrarlanan sonuç için buton eklenemez
+            if not track.video_id or track.video_id in seen:
+                continue
+            seen.add(track.video_id)
+            self.add_item(SearchButton(guild_id, track.video_id, str(i + 1)))
+        self.add_item(SearchButton(guild_id, 'cancel', "İptal"))
+        self.stop()
+
+# Sunucu başına kontrol paneli güncelleyici. Art arda gelen istekler kısa bir bekleme içinde birleştirilir
+# ve yalnızca en sonuncusu uygulanır; içerik değişmediyse düzenleme yapılmaz; kanal başına düzenleme
+# sayısı Discord'un mesaj hız sınırının altında tutulur.
+class PanelUpdater:
+    def __init__(self, player, debounce=0.5, budget=4, window=5.0):
+        self.player = player
+        self.debounce = debounce  # Birleştirme için bekleme (saniye)
+        self.budget = budget  # Kanal başına pencere içinde en fazla istek
+        self.window = window
+        self.pending = {}  # guild_id -> (kanal, şarkı, yeni mesaj mı, bitti mi)
+        self.tasks = {}  # guild_id -> uygulama görevi
+        self.views = {}  # guild_id -> ControlPanelView (custom_id'ler sunucuya özel)
+        self.hashes = {}  # guild_id -> son gönderilen içeriğin özeti
+        self.requests = {}  # kanal id -> son isteklerin zamanları
+
+    # Panel güncellemesi iste; yeni mesaj isteği, birleşen güncellemelerde korunur
+    def request(self, guild_id, channel, song=None, new_message=False, finished=False):
+        previous = self.pending.get(guild_id)
+        if previous is not None:
+            panel_updates.inc(result='coalesced')
+            new_message = new_message or previous[2]
+        self.pending[guild_id] = (channel, song, new_message, finished)
+        task = self.tasks.get(guild_id)
+        if task is None or task.done():
+            self.tasks[guild_id] = asyncio.create_task(self._run(guild_id))
+
+    # Panel gönderildi mi, ya da ilk paneli bekleyen veya uygulanmakta olan bir istek var mı
+    def has_panel(self, guild_id):
+        task = self.tasks.get(guild_id)
+        return guild_id in self.player.control_messages or guild_id in self.pending or (task is not None and not task.done())
+
+    async def _run(self, guild_id):
+        while guild_id in self.pending:
+            await asyncio.sleep(self.debounce)
+            channel, song, new_message, finished = self.pending.pop(guild_id)
+            try:
+                await self._apply(guild_id, channel, song, new_message, finished)
+            except Exception as e:
+                log.warning('Kontrol paneli güncelleme hatası: %s', e)
+
+    # Kanalın istek bütçesi doluysa en eski isteğin penceresi bitene kadar bekle
+    async def _wait_for_budget(self, channel):
+        key = getattr(channel, 'id', None)
+        times = self.requests.get(key)
+        if times is None:
+            # Penceresi bitmiş kanalları at ki sözlük ayrılan sunucularla büyümesin
+            now = time.monotonic()
+            self.requests = {k: t for k, t in self.requests.items() if t and now - t[-1] < self.window}
+            times = self.requests[key] = deque()
+        while True:
+            now = time.monotonic()
+            while times and now - times[0] >= self.window:
+                times.popleft()
+            if len(times) < self.budget:
+                times.append(now)
+                return
+            await asyncio.sleep(self.window - (now - times[0]))
+
+    @staticmethod
+    def content_hash(content, embed):
+        payload = {'content': content, 'embed': embed.to_dict() if embed else None}
+        return hash(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str))
+
+    async def _apply(self, guild_id, channel, song, new_message, finished):
+        message = self.player.control_messages.get(guild_id)
+        
+        if finished:
+            if message is None:
+                return
+            self.player.control_messages.pop(guild_id, None)
+            self.hashes.pop(guild_id, None)
+            await self._wait_for_budget(channel)
+            await message.edit(content="✅ Tüm şarkılar tamamlandı!", embed=None, view=None)
+            return
+        
+        embed = self.player.build_panel_embed(song)
+        digest = self.content_hash(None, embed)
+        if message is not None and not new_message and self.hashes.get(guild_id) == digest:
+            panel_updates.inc(result='unchanged')
+            return
+        
+        # Görünüm bir event loop gerektirdiği için sunucunun ilk panelinde oluşturulur
+        view = self.views.get(guild_id)
+        if view is None:
+            view = self.views[guild_id] = ControlPanelView(guild_id)
+        
+        await self._wait_for_budget(channel)
+        if message is not None and not new_message:
+            try:
+                await message.edit(embed=embed, view=view)
+                self.hashes[guild_id] = digest
+                panel_updates.inc(result='edited')
+                log.debug('Kontrol paneli güncellendi: %s', guild_id)
+                return
+            except discord.NotFound:
+                log.debug('Kontrol mesajı silinmiş, yenisi gönderiliyor: %s', guild_id)
+        
+        self.player.control_messages[guild_id] = await channel.send(embed=embed, view=view)
+        self.hashes[guild_id] = digest
+        panel_updates.inc(result='sent')
+        log.debug('Kontrol paneli oluşturuldu: %s', guild_id)
+
 class MusicPlayer:
     def __init__(self, bot):
         self.bot = bot
-        self.queue = {}  # Sunucu başına sıra
+        self.queue = {}  # Sunucu başına sıra (GuildQueue)
+        self.queue_max_length = int(os.getenv('QUEUE_MAX_LENGTH', '10000'))  # Sunucu başına en fazla şarkı
         self.now_playing = {}  # Şu an çalan şarkı bilgisi
         self.text_channels = {}  # Sunucu başına son kullanılan metin kanalı
         self.control_messages = {}  # Kontrol mesajları
+        self.panels = PanelUpdater(self)  # Birleştirilmiş, hız sınırına uyan panel güncellemeleri
         self.search_results = {}  # Arama sonuçları
         self.leave_tasks = {}  # Otomatik ayrılma görevleri
         self.inactivity_timeout = 300  # 5 dakika (saniye cinsinden)
+        self.playback_events = {}  # Sunucu başına oynatma olay kuyruğu
+        self.playback_drivers = {}  # Sunucu başına oynatma durum makinesi görevi
+        self.resolve_attempts = 2  # Şarkı atlanmadan önce URL alma deneme sayısı
+        self.resolve_retry_delay = 1  # Denemeler arası bekleme (saniye)
+        self.max_skip_notices = 3  # Tek tek bildirilecek en fazla atlanan şarkı
+        # Her iki oynatma yolunun kullandığı ses kaynağı motoru
+        self.engine = PlaybackEngine(
+            FFMPEG_PATH,
+            mode=AUDIO_MODE,
+            volume=AUDIO_VOLUME,
+            bitrate=AUDIO_BITRATE,
+            probesize=os.getenv('FFMPEG_PROBESIZE', '64k'),
+            analyzeduration=os.getenv('FFMPEG_ANALYZEDURATION', '500000')
+        )
+        self.track_ended_at = {}  # Sunucu başına son parçanın bittiği an (geçiş boşluğu ölçümü için)
+        self.play_generations = {}  # Sunucu başına son oluşturulan after callback'inin sırası
+        self.engine.first_frame_listeners.append(self.record_transition_gap)
+        # yt-dlp çağrıları için sınırlı, sunucular arası adil ekstraksiyon havuzu
+        self.extractor = ExtractionExecutor(
+            max_workers=int(os.getenv('EXTRACTION_WORKERS', '4')),
+            max_pending=int(os.getenv('EXTRACTION_QUEUE_LIMIT', '100')),
+            max_pending_per_guild=int(os.getenv('EXTRACTION_GUILD_QUEUE_LIMIT', '20')),
+            rate_limiter=AdaptiveRateLimiter(
+                rate=float(os.getenv('EXTRACTION_RATE', '5')),
+                burst=int(os.getenv('EXTRACTION_BURST', '10'))
+            )
+        )
+        self.prefetch_depth = int(os.getenv('PREFETCH_DEPTH', '2'))  # Önceden çözümlenecek şarkı sayısı
+        self.prefetch_tasks = {}  # Sunucu başına ön çözümleme görevleri
+        self.resolving = {}  # Devam eden URL çözümlemeleri (webpage_url -> görev)
+        self.url_expiry_margin = 120  # Süresi bu kadar saniye içinde dolacak URL'ler yeniden alınır
+        self.client_health = ClientHealth(PLAYER_CLIENTS)  # YouTube istemcisi başına başarı oranı ve gecikme
+        self.race_clients = os.getenv('RESOLVE_RACE', '1') != '0'  # Etkileşimli isteklerde en iyi iki istemciyi yarıştır
+        self.playlist_tasks = {}  # Sunucu başına devam eden playlist yüklemeleri
+        self.playlist_concurrency = int(os.getenv('PLAYLIST_CONCURRENCY', '4'))  # Aynı anda detaylandırılan şarkı sayısı
+        self.playlist_progress_interval = 3  # İlerleme mesajı güncelleme aralığı (saniye)
+        # Video ID başına meta veri ve akış URL'si önbelleği (RESOLUTION_CACHE_PATH boşsa yalnızca bellek)
+        self.resolution_cache = ResolutionCache(
+            os.getenv('RESOLUTION_CACHE_PATH', os.path.join(CACHE_DIR, 'resolution.sqlite3')) or None
+        )
+        # Serbest metin aramaları için sorgu önbelleği
+        self.search_cache = SearchCache(
+            max_entries=int(os.getenv('SEARCH_CACHE_SIZE', '500')),
+            ttl=int(os.getenv('SEARCH_CACHE_TTL', '600'))
+        )
+        # Sık çalınan parçalar için yerel Opus önbelleği (AUDIO_CACHE_MAX_MB=0 ise kapalı)
+        self.audio_cache = AudioCache(
+            os.getenv('AUDIO_CACHE_DIR', os.path.join(CACHE_DIR, 'audio')),
+            max_bytes=int(os.getenv('AUDIO_CACHE_MAX_MB', '0')) * 1024 * 1024,
+            min_plays=int(os.getenv('AUDIO_CACHE_MIN_PLAYS', '3')),
+            executable=FFMPEG_PATH,
+            bitrate=AUDIO_BITRATE
+        )
+        # Yeniden başlatmalarda oturumları geri kurmak için sıra ve oynatma günlüğü (QUEUE_JOURNAL_PATH boşsa kapalı)
+        self.journal = QueueJournal(
+            os.getenv('QUEUE_JOURNAL_PATH', os.path.join(CACHE_DIR, f"sessions-{'-'.join(map(str, SHARD_IDS))}.jsonl" if SHARD_IDS else 'sessions.jsonl')),
+            compact_every=int(os.getenv('QUEUE_JOURNAL_COMPACT_EVERY', '1000'))
+        )
+        self.checkpoint_interval = int(os.getenv('QUEUE_CHECKPOINT_INTERVAL', '5'))  # Çalma konumunun günlüğe yazılma aralığı (saniye)
+        self.checkpoint_task = None
+        self.restored = False  # Oturumlar yalnızca ilk on_ready'de geri yüklenir
+        self.stream_resumes = {}  # Sunucu başına çalan parçada akış kopması sonrası sürdürme sayısı
+        self.max_stream_resumes = 3
+        self.resume_margin = 5  # Parça sonuna bu kadar saniyeden yakın biten akış kopmuş sayılmaz
+        
+    # Sunucunun sırasını al, yoksa oluştur
+    def get_queue(self, guild_id):
+        queue = self.queue.get(guild_id)
+        if queue is None:
+            queue = self.queue[guild_id] = GuildQueue(self.queue_max_length)
+            queue.journal = functools.partial(self.journal.record, guild_id)
+        return queue
+
+    # Şarkıyı sıranın sonuna ekle. Ön çözümleme penceresinin dışında kalan şarkının
+    # akış URL'si bırakılır, sırası yaklaşınca yeniden alınır.
+    def enqueue(self, guild_id, song):
+        queue = self.get_queue(guild_id)
+        queue.append(song)
+        if len(queue) > self.prefetch_depth:
+            song.release_stream()
+        self.schedule_prefetch(guild_id)
+        return len(queue)
+
+    # Sunucunun bu süreçteki shard'ı (shard'sız çalışmada 0)
+    def shard_id(self, guild_id):
+        shard_count = self.bot.shard_count or 1
+        return shard_for_guild(guild_id, shard_count)
+
+    # Shard başına gecikme, sunucu, aktif oynatıcı ve sıradaki şarkı sayıları
+    def shard_stats(self):
+        latencies = dict(self.bot.latencies) if isinstance(self.bot, commands.AutoShardedBot) else {0: self.bot.latency}
+        stats = {shard_id: {'latency': latency, 'guilds': 0, 'players': 0, 'queued': 0} for shard_id, latency in latencies.items()}
+        for guild in self.bot.guilds:
+            shard = stats.setdefault(self.shard_id(guild.id), {'latency': None, 'guilds': 0, 'players': 0, 'queued': 0})
+            shard['guilds'] += 1
+            if guild.voice_client:
+                shard['players'] += 1
+            queue = self.queue.get(guild.id)
+            if queue:
+                shard['queued'] += len(queue)
+        return stats
+
+    # Çalan şarkıyı güncelle, bitenin akış URL'sini bırak
+    def set_now_playing(self, guild_id, song, offset=0):
+        previous = self.now_playing.get(guild_id)
+        if previous is not None and previous is not song:
+            previous.release_stream()
+            self.stream_resumes.pop(guild_id, None)
+        self.now_playing[guild_id] = song
+        if self.journal.active:
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            text_channel = self.text_channels.get(guild_id)
+            self.journal.record(
+                guild_id, 'play', song, offset,
+                voice_client.channel.id if voice_client else None,
+                text_channel.id if text_channel else None
+            )
+
+    # Çalan şarkı bilgisini temizle
+    def clear_now_playing(self, guild_id):
+        if self.now_playing.pop(guild_id, None) is not None:
+            self.journal.record(guild_id, 'stop')
+
+    # Günlük sıkıştırması için bağlı sunucuların oturum durumu
+    def session_states(self):
+        states = {}
+        for guild in self.bot.guilds:
+            voice_client = guild.voice_client
+            song = self.now_playing.get(guild.id)
+            queue = self.queue.get(guild.id)
+            if not voice_client or (song is None and not queue):
+                continue
+            text_channel = self.text_channels.get(guild.id)
+            states[guild.id] = {
+                'voice': voice_client.channel.id,
+                'text': text_channel.id if text_channel else None,
+                'now': song,
+                'position': round(self.engine.position(guild.id), 1) if song else 0,
+                'queue': list(queue or ()),
+            }
+        return states
+
+    # Çalma konumlarını düzenli aralıklarla günlüğe yaz (yeniden başlatmada bu konumdan devam edilir)
+    async def checkpoint_positions(self):
+        written = {}
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            previous, written = written, {}
+            for guild_id in list(self.now_playing):
+                position = round(self.engine.position(guild_id), 1)
+                written[guild_id] = position
+                if previous.get(guild_id) != position:
+                    self.journal.record(guild_id, 'position', position)
+
+    # Önceki çalışmanın oturumlarını geri yükle: ses kanallarına yeniden bağlan ve çalan parçayı
+    # kaldığı yerden sürdür
+    async def restore_sessions(self):
+        try:
+            sessions = await asyncio.get_running_loop().run_in_executor(None, self.journal.load)
+        except OSError as e:
+            log.error('Oturum günlüğü okunamadı: %s', e)
+            sessions = {}
+        
+        restoring = []
+        for guild_id, session in sessions.items():
+            guild = self.bot.get_guild(guild_id)
+            voice_channel = guild.get_channel(session['voice']) if guild and session['voice'] else None
+            if voice_channel is None or (session['now'] is None and not session['queue']):
+                continue
+            text_channel = guild.get_channel(session['text']) if session['text'] else None
+            if text_channel is not None:
+                self.text_channels[guild_id] = text_channel
+            self.get_queue(guild_id).extend(Track.from_record(record) for record in session['queue'])
+            restoring.append(self.restore_session(guild, voice_channel, session))
+        
+        if restoring:
+            started = time.perf_counter()
+            await asyncio.gather(*restoring)
+            log.info('%s oturum geri yüklendi (%.1f sn)', len(restoring), time.perf_counter() - started)
+        
+        # Dosya geri yüklenen durumla yeniden yazılır, bundan sonraki değişiklikler üzerine eklenir
+        await self.journal.start(self.session_states)
+        if self.journal.active and self.checkpoint_task is None:
+            self.checkpoint_task = asyncio.create_task(self.checkpoint_positions())
+
+    async def restore_session(self, guild, voice_channel, session):
+        bind_log_context(guild=guild.id)
+        try:
+            await voice_channel.connect()
+        except Exception as e:
+            log.warning('Oturum geri yüklenemedi, ses kanalına bağlanılamadı: %s', e)
+            self.get_queue(guild.id).clear()
+            return
+        
+        if session['now'] is None:
+            await self.play_next(guild.id)
+            return
+        
+        song = Track.from_record(session['now'])
+        position = session['position'] or 0
+        if song.duration and position >= song.duration - 1:
+            await self.play_next(guild.id)
+            return
+        minutes, seconds = divmod(int(position), 60)
+        await self.notify_channel(guild.id, f"🔄 Bot yeniden başlatıldı, **{song.title}** kaldığı yerden ({minutes}:{seconds:02d}) devam ediyor.")
+        await self.resume_track(guild.id, song, position)
+
+    # Çalan parçayı verilen konuma (saniye) sar. ffmpeg aynı akış URL'siyle girdi tarafında -ss ile
+    # yeniden başlatılır; URL yalnızca süresi dolmak üzereyse yeniden alınır
+    async def seek(self, guild_id, offset):
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client
+        song = self.now_playing[guild_id]
+        if song.duration:
+            offset = min(offset, max(song.duration - 1, 0))
+        offset = max(offset, 0)
+        
+        current = song
+        local_path = self.audio_cache.lookup(song.video_id)
+        if local_path is None:
+            song = await self.get_song_url(guild_id, song)
+        
+        # URL beklenirken parça atlandıysa, bittiyse veya bot ayrıldıysa sarılacak bir şey kalmadı
+        if self.now_playing.get(guild_id) is not current or guild.voice_client is not voice_client \
+                or not (voice_client.is_playing() or voice_client.is_paused()):
+            log.debug('Sarma iptal edildi, çalan parça değişti: %s', guild_id)
+            return None
+        # Kaynak kontrolden sonra oluşturulur; motor sunucunun konumunu bu kaynaktan okur
+        audio_source = self.engine.create_source(guild_id, local_path or song.stream_url, offset=offset)
+        
+        # Eski kaynağın after callback'i bir olay bırakır; o sırada yeni kaynak çaldığı için yok sayılır.
+        # Yeni callback stop()'tan önce oluşturulur ki eski kaynağın bitişi geçiş boşluğu sayılmasın.
+        after = self.make_after_callback(guild_id)
+        was_paused = voice_client.is_paused()
+        voice_client.stop()
+        self.set_now_playing(guild_id, song, offset)
+        self.engine.play(guild_id, voice_client, audio_source, after)
+        if was_paused:
+            voice_client.pause()
+        log.info('Parça %.1f. saniyeye sarıldı: %s', offset, song.title)
+        return offset
+
+    # Akış parça bitmeden koptuysa (ffmpeg erken çıktıysa) parçayı yeni bir URL ile kaldığı yerden sürdür
+    async def resume_interrupted(self, guild_id):
+        song = self.now_playing.get(guild_id)
+        source = self.engine.sources.get(guild_id)
+        if song is None or source is None or not source.exhausted or not song.duration:
+            return False
+        position = source.position
+        if position >= song.duration - self.resume_margin:
+            return False
+        attempts = self.stream_resumes.get(guild_id, 0)
+        if attempts >= self.max_stream_resumes:
+            return False
+        self.stream_resumes[guild_id] = attempts + 1
+        log.warning('Akış %.1f. saniyede koptu, kaldığı yerden sürdürülüyor (%s/%s): %s',
+                    position, attempts + 1, self.max_stream_resumes, song.title)
+        song.release_stream()  # Kopan URL yerine yenisi çözümlensin
+        await self.resume_track(guild_id, song, position)
+        return True
+
+    # Parçayı verilen konumdan (saniye) çalmaya başla; başlatılamazsa sıradakine geç
+    async def resume_track(self, guild_id, song, offset):
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if not voice_client:
+            return
+        
+        local_path = self.audio_cache.lookup(song.video_id)
+        try:
+            if local_path is None:
+                song = await self.get_song_url(guild_id, song)
+            # Bu arada kullanıcı başka bir şarkı başlattıysa dokunma
+            if voice_client.is_playing() or voice_client.is_paused():
+                return
+            audio_source = self.engine.create_source(guild_id, local_path or song.stream_url, offset=offset)
+        except Exception as e:
+            log.warning('Parça kaldığı yerden sürdürülemedi: %s', e)
+            await self.play_next(guild_id)
+            return
+        
+        # Kopan kaynağın bitişi bir geçiş değildir; sürdürme süresi boşluk ölçümüne karışmasın
+        self.track_ended_at.pop(guild_id, None)
+        self.set_now_playing(guild_id, song, offset)
+        self.engine.play(guild_id, voice_client, audio_source, self.make_after_callback(guild_id))
+        log.info('Şarkı %.1f. saniyeden sürdürüldü: %s', offset, song.title)
+        tracks_started.inc(source='resume')
+        self.schedule_prefetch(guild_id)
         
+        if guild_id in self.text_channels:
+            self.panels.request(guild_id, self.text_channels[guild_id], song, new_message=guild_id not in self.control_messages)
+
     # Mesaj gönderme yardımcı metodu
     async def send_message(self, ctx, content=None, embed=None, view=None):
         if isinstance(ctx, discord.Interaction):
@@ -112,15 +2498,47 @@ class MusicPlayer:
         except:
             return False
 
+    # Tekil YouTube videosu önbellekte çalınabilir durumdaysa bilgisini döndür
+    async def cached_video_info(self, url):
+        video_id = youtube_video_id(url)
+        # Playlist parametresi olan URL'ler playlist olarak işlenir
+        if not video_id or 'list' in parse_qs(urlparse(url).query):
+            return None
+        return await self.resolution_cache.get_info(video_id, self.url_expiry_margin)
+
+    # yt-dlp bilgisini video ID'si ile önbelleğe yaz
+    def remember_info(self, info):
+        if not info:
+            return
+        video_id = youtube_video_id(info.get('webpage_url', ''))
+        if not video_id and info.get('extractor_key') == 'Youtube':
+            video_id = info.get('id')
+        self.resolution_cache.put(video_id, info)
+
+    # Tekil video bilgisini önbellekten ya da yt-dlp ile al
+    async def extract_video_info(self, guild_id, profile, url):
+        info = await self.cached_video_info(url)
+        if info:
+            return info
+        info = await self.extractor.run(guild_id, extract_info, profile, url, download=False)
+        self.remember_info(info)
+        return info
+
+    # YouTube'da ilk 5 sonucu ara
+    async def search_youtube(self, guild_id, search):
+        info_dict = await self.extractor.run(guild_id, extract_info, 'search', f"ytsearch5:{search}", download=False, process=False)
+        return list(info_dict.get('entries', []))
+
     # Arama sonuçlarını göster ve seçim yap
     async def show_search_results(self, ctx, search):
         guild_id = ctx.guild.id
+        bind_log_context(guild=guild_id)
         
         # Aramayı başlat
         if not hasattr(self, 'searching'):
             self.searching = {}
         self.searching[guild_id] = True
-        print(f"Arama başlatıldı: {guild_id} - {search}")
+        log.info('Arama başlatıldı: %s - %s', guild_id, search)
         
         # Arama mesajı gönder
         if isinstance(ctx, discord.Interaction):
@@ -133,189 +2551,171 @@ class MusicPlayer:
             self.text_channels[ctx.guild.id] = ctx.channel
         
         try:
-            # Optimize edilmiş YT-DLP ayarları
-            ydl_opts_search = {
-                'format': 'bestaudio/best',
-                'noplaylist': False,
-                'nocheckcertificate': True,
-                'quiet': True,
-                'no_warnings': True,
-                'default_search': 'auto',
-                'extract_flat': 'in_playlist',
-                'socket_timeout': 5,
-                'skip_download': True,
-                'cachedir': False,
-            }
-            
             # URL mi yoksa arama sorgusu mu kontrol et
             if self.is_url(search):
                 # URL ise, doğrudan bilgileri al
-                with yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
-                    info = ydl.extract_info(search, download=False, process=False)
+                info = await self.cached_video_info(search)
+                if info is None:
+                    info = await self.extractor.run(guild_id, extract_info, 'search', search, download=False, process=False)
                     
-                    # Playlist mi kontrol et
-                    if 'entries' in info:
-                        # Playlist
-                        playlist_title = info.get('title', 'Playlist')
-                        entries = list(info['entries'])
-                        
-                        # Entries boş mu kontrol et
-                        if not entries:
-                            self.searching[guild_id] = False
-                            await searching_message.delete()
-                            if isinstance(ctx, discord.Interaction):
-                                await ctx.followup.send(f"❌ Playlist boş veya erişilemez.")
-                            else:
-                                await ctx.send(f"❌ Playlist boş veya erişilemez.")
-                            return None
-                        
-                        # Arama mesajını güncelle
-                        await searching_message.edit(content=f"🎵 Playlist işleniyor: `{playlist_title}` ({len(entries)} şarkı)")
-                        
-                        # İlk şarkıyı çal, diğerlerini sıraya ekle
-                        first_entry = entries[0]
-                        
-                        # İlk şarkı için detaylı bilgi al
-                        first_song_info = ydl.extract_info(first_entry['url'], download=False)
-                        
-                        # İlk şarkıyı işle
-                        song_info = await self.process_song_info(ctx, first_song_info, searching_message)
-                        
-                        # Diğer şarkıları sıraya ekle
-                        if guild_id not in self.queue:
-                            self.queue[guild_id] = []
-                        
-                        # Diğer şarkıları arka planda işle
-                        if len(entries) > 1:
-                            asyncio.create_task(self.process_playlist_entries(ctx, entries[1:], ydl))
-                        
-                        # Playlist bilgisi gönder
-                        embed = discord.Embed(
-                            title="🎵 Playlist Yüklendi",
-                            description=f"**{playlist_title}**",
-                            color=discord.Color.green()
-                        )
-                        
-                        if song_info.get('thumbnail'):
-                            embed.set_thumbnail(url=song_info['thumbnail'])
-                        
-                        embed.add_field(name="İlk Şarkı", value=song_info['title'], inline=True)
-                        embed.add_field(name="Toplam Şarkı", value=str(len(entries)), inline=True)
-                        embed.add_field(name="Sıraya Eklenen", value=str(len(entries) - 1), inline=True)
+                # Playlist mi kontrol et
+                if 'entries' in info:
+                    # Playlist
+                    playlist_title = info.get('title', 'Playlist')
+                    entries = list(info['entries'])
                         
+                    # Entries boş mu kontrol et
+                    if not entries:
+                        self.searching[guild_id] = False
+                        await searching_message.delete()
                         if isinstance(ctx, discord.Interaction):
-                            await ctx.followup.send(embed=embed)
+                            await ctx.followup.send(f"❌ Playlist boş veya erişilemez.")
                         else:
-                            await ctx.send(embed=embed)
-                        
-                        # İlk şarkıyı çal
-                        if not ctx.guild.voice_client or not ctx.guild.voice_client.is_playing():
-                            await self.play_song(ctx, song_info)
-                        
-                        # Aramayı bitir
-                        self.searching[guild_id] = False
-                        return song_info
-                    else:
-                        # Tek şarkı
-                        info = ydl.extract_info(search, download=False)
-                        self.searching[guild_id] = False
-                        song_info = await self.process_song_info(ctx, info, searching_message)
-                        
-                        # Şarkıyı çal
-                        if not ctx.guild.voice_client or not ctx.guild.voice_client.is_playing():
-                            await self.play_song(ctx, song_info)
+                            await ctx.send(f"❌ Playlist boş veya erişilemez.")
+                        return None
                         
-                        return song_info
-            else:
-                # Arama sorgusu ise, YouTube'da ara
-                with yt_dlp.YoutubeDL(ydl_opts_search) as ydl:
-                    info_dict = ydl.extract_info(f"ytsearch5:{search}", download=False, process=False)
-                    results = list(info_dict.get('entries', []))
-                    
-                    # Sonuçları kontrol et
-                    if not results:
+                    # Düz (flat) bilgilerle şarkıları hemen oluştur, detaylar arka planda tamamlanacak
+                    songs = [self.flat_entry_song(entry) for entry in entries if entry]
+                    if not songs:
                         self.searching[guild_id] = False
                         await searching_message.delete()
-                        if isinstance(ctx, discord.Interaction):
-                            await ctx.followup.send(f"❌ `{search}` için sonuç bulunamadı.")
-                        else:
-                            await ctx.send(f"❌ `{search}` için sonuç bulunamadı.")
+                        await self.send_message(ctx, "❌ Playlist boş veya erişilemez.")
                         return None
                     
-                    # Arama mesajını sil
-                    try:
-                        await searching_message.delete()
-                    except:
-                        pass
+                    # Arama mesajı ilerleme mesajı olarak kullanılacak
+                    await searching_message.edit(content=f"🎵 Playlist işleniyor: `{playlist_title}` (0/{len(songs)} şarkı hazırlandı)")
+                    
+                    queue = self.get_queue(guild_id)
                     
-                    # Sonuçları göster
+                    # Çalan bir şarkı yoksa ilki hemen çalınır, diğerleri sıraya girer
+                    start_now = not ctx.guild.voice_client or not ctx.guild.voice_client.is_playing()
+                    first_song = songs[0]
+                    queued_count = queue.extend(songs[1:] if start_now else songs)
+                    self.schedule_prefetch(guild_id)
+                    
+                    # Detayları sınırlı eşzamanlılıkla arka planda tamamla
+                    task = asyncio.create_task(self.process_playlist_entries(ctx, playlist_title, songs, searching_message))
+                    tasks = self.playlist_tasks.setdefault(guild_id, set())
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    
+                    # Playlist bilgisi gönder
                     embed = discord.Embed(
-                        title="🔍 Arama Sonuçları",
-                        description=f"**{search}** için sonuçlar:",
-                        color=discord.Color.blue()
+                        title="🎵 Playlist Yüklendi",
+                        description=f"**{playlist_title}**",
+                        color=discord.Color.green()
                     )
                     
-                    # Sonuçları listeye ekle
-                    self.search_results[guild_id] = []
+                    if first_song.thumbnail:
+                        embed.set_thumbnail(url=first_song.thumbnail)
                     
-                    for i, result in enumerate(results):
-                        if not result:
-                            continue
-                            
-                        title = result.get('title', 'Bilinmeyen Başlık')
-                        uploader = result.get('uploader', 'Bilinmeyen Yükleyici')
-                        duration = result.get('duration_string', 'Bilinmeyen Süre')
+                    embed.add_field(name="İlk Şarkı", value=first_song.title, inline=True)
+                    embed.add_field(name="Toplam Şarkı", value=str(len(songs)), inline=True)
+                    embed.add_field(name="Sıraya Eklenen", value=str(queued_count), inline=True)
+                    
+                    await self.send_message(ctx, embed=embed)
+                    
+                    # Aramayı bitir
+                    self.searching[guild_id] = False
+                    
+                    # İlk şarkıyı çal
+                    if start_now:
+                        await self.play_song(ctx, first_song)
+                    
+                    # Şarkılar burada çalındı/sıraya eklendi, çağıranın yapacağı bir şey yok
+                    return None
+                else:
+                    # Tek şarkı
+                    info = await self.extract_video_info(guild_id, 'search', search)
+                    self.searching[guild_id] = False
+                    song_info = await self.process_song_info(ctx, info, searching_message)
                         
-                        embed.add_field(
-                            name=f"{i+1}. {title}",
-                            value=f"Yükleyen: {uploader} | Süre: {duration}",
-                            inline=False
-                        )
+                    # Şarkıyı çal
+                    if not ctx.guild.voice_client or not ctx.guild.voice_client.is_playing():
+                        await self.play_song(ctx, song_info)
                         
-                        # Sonucu listeye ekle
-                        self.search_results[guild_id].append({
-                            'title': title,
-                            'url': '',
-                            'thumbnail': result.get('thumbnail'),
-                            'duration': result.get('duration'),
-                            'webpage_url': f"https://www.youtube.com/watch?v={result['id']}",
-                            'uploader': uploader
-                        })
+                    return song_info
+            else:
+                # Arama sorgusu ise, YouTube'da ara
+                search_started = time.perf_counter()
+                results = await self.search_cache.get_or_fetch(search, lambda: self.search_youtube(guild_id, search))
+                search_seconds.observe(time.perf_counter() - search_started)
                     
-                    # Hiç sonuç yoksa
-                    if not self.search_results[guild_id]:
-                        self.searching[guild_id] = False
-                        if isinstance(ctx, discord.Interaction):
-                            await ctx.followup.send(f"❌ `{search}` için sonuç bulunamadı.")
-                        else:
-                            await ctx.send(f"❌ `{search}` için sonuç bulunamadı.")
-                        return None
+                # Sonuçları kontrol et
+                if not results:
+                    self.searching[guild_id] = False
+                    await searching_message.delete()
+                    if isinstance(ctx, discord.Interaction):
+                        await ctx.followup.send(f"❌ `{search}` için sonuç bulunamadı.")
+                    else:
+                        await ctx.send(f"❌ `{search}` için sonuç bulunamadı.")
+                    return None
+                    
+                # Arama mesajını sil
+                try:
+                    await searching_message.delete()
+                except:
+                    pass
+                    
+                # Sonuçları göster
+                embed = discord.Embed(
+                    title="🔍 Arama Sonuçları",
+                    description=f"**{search}** için sonuçlar:",
+                    color=discord.Color.blue()
+                )
                     
-                    # Seçim için butonlar ekle
-                    view = discord.ui.View()
-                    for i in range(min(5, len(self.search_results[guild_id]))):
-                        button = discord.ui.Button(label=str(i+1), style=discord.ButtonStyle.primary)
-                        button.callback = self.create_select_callback(ctx, i)
-                        view.add_item(button)
+                # Sonuçları listeye ekle
+                self.search_results[guild_id] = []
                     
-                    # İptal butonu
-                    cancel_button = discord.ui.Button(label="İptal", style=discord.ButtonStyle.danger)
-                    cancel_button.callback = self.create_cancel_callback(ctx)
-                    view.add_item(cancel_button)
+                for result in results:
+                    # Kimliği olmayan veya listede zaten bulunan sonuçlar seçilemez
+                    if not result or not result.get('id') or any(song.video_id == result['id'] for song in self.search_results[guild_id]):
+                        continue
+                    i = len(self.search_results[guild_id])
+                            
+                    title = result.get('title', 'Bilinmeyen Başlık')
+                    uploader = result.get('uploader', 'Bilinmeyen Yükleyici')
+                    duration = result.get('duration_string', 'Bilinmeyen Süre')
+                        
+                    embed.add_field(
+                        name=f"{i+1}. {title}",
+                        value=f"Yükleyen: {uploader} | Süre: {duration}",
+                        inline=False
+                    )
+                        
+                    # Sonucu listeye ekle
+                    self.search_results[guild_id].append(Track(
+                        title,
+                        video_id=result['id'],
+                        uploader=uploader,
+                        duration=result.get('duration')
+                    ))
                     
-                    # Sonuçları gönder
+                # Hiç sonuç yoksa
+                if not self.search_results[guild_id]:
+                    self.searching[guild_id] = False
                     if isinstance(ctx, discord.Interaction):
-                        await ctx.followup.send(embed=embed, view=view)
+                        await ctx.followup.send(f"❌ `{search}` için sonuç bulunamadı.")
                     else:
-                        await ctx.send(embed=embed, view=view)
+                        await ctx.send(f"❌ `{search}` için sonuç bulunamadı.")
+                    return None
                     
-                    # Aramayı bitir
-                    self.searching[guild_id] = False
-                    print(f"Arama tamamlandı: {guild_id}")
-                    return None  # Henüz şarkı seçilmedi
+                # Seçim ve iptal butonları
+                view = SearchResultView(guild_id, self.search_results[guild_id][:5])
+                    
+                # Sonuçları gönder
+                if isinstance(ctx, discord.Interaction):
+                    await ctx.followup.send(embed=embed, view=view)
+                else:
+                    await ctx.send(embed=embed, view=view)
+                    
+                # Aramayı bitir
+                self.searching[guild_id] = False
+                log.debug('Arama tamamlandı: %s', guild_id)
+                return None  # Henüz şarkı seçilmedi
         except Exception as e:
             self.searching[guild_id] = False
-            print(f"Arama hatası: {e}")
+            log.error('Arama hatası: %s', e)
             
             # Arama mesajını sil
             try:
@@ -330,83 +2730,89 @@ class MusicPlayer:
                 await ctx.send(f"Arama sırasında bir hata oluştu: {e}")
             return None
 
-    # Seçim butonu callback'i oluştur
-    def create_select_callback(self, ctx, index):
-        async def select_callback(interaction):
-            guild_id = interaction.guild.id
-            if guild_id in self.search_results and index < len(self.search_results[guild_id]):
-                selected_song = self.search_results[guild_id][index]
-                print(f"Şarkı seçildi: {selected_song['title']}")
+    # Arama sonucu seçildi (SearchButton)
+    async def select_search_result(self, interaction, video_id, label=None):
+        guild_id = interaction.guild.id
+        bind_log_context(guild=guild_id, command='search', request=interaction.id)
+        
+        # Sonuç listesi bellekte yoksa (ör. yeniden başlatma sonrası) şarkı video kimliğinden kurulur,
+        # başlık arama mesajındaki sonuç listesinden okunur
+        selected_song = next((song for song in self.search_results.get(guild_id, ()) if song.video_id == video_id), None)
+        if selected_song is None:
+            selected_song = Track(self.search_result_title(interaction.message, label) or video_id, video_id=video_id)
+        log.debug('Şarkı seçildi: %s', selected_song.title)
+        
+        # Mesajı güncelle
+        await interaction.response.edit_message(
+            content=f"🎵 **{selected_song.title}** seçildi!",
+            embed=None,
+            view=None
+        )
+        
+        # Yükleniyor mesajı
+        loading_message = await interaction.followup.send("🔄 Şarkı yükleniyor, lütfen bekleyin...")
+        
+        try:
+            # Şarkı URL'sini al
+            info = await self.extract_video_info(guild_id, 'default', selected_song.webpage_url)
+            selected_song.update_from_info(info)
+            selected_song.stream_url = info.get('url', '')
+            
+            # Yükleniyor mesajını sil
+            await loading_message.delete()
+            
+            # Şarkıyı çal veya sıraya ekle
+            if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
+                # Sıraya ekle
+                self.enqueue(guild_id, selected_song)
+                log.info('Şarkı sıraya eklendi: %s', selected_song.title)
                 
-                # Mesajı güncelle
-                await interaction.response.edit_message(
-                    content=f"🎵 **{selected_song['title']}** seçildi!",
-                    embed=None,
-                    view=None
+                # Sıraya eklendiğini bildir
+                embed = discord.Embed(
+                    title="🎵 Sıraya Eklendi",
+                    description=f"**{selected_song.title}**",
+                    color=discord.Color.green()
                 )
                 
-                # Yükleniyor mesajı
-                loading_message = await interaction.followup.send("🔄 Şarkı yükleniyor, lütfen bekleyin...")
+                if selected_song.thumbnail:
+                    embed.set_thumbnail(url=selected_song.thumbnail)
                 
-                try:
-                    # Şarkı URL'sini al
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        info = ydl.extract_info(selected_song['webpage_url'], download=False)
-                        selected_song['url'] = info.get('url', '')
-                    
-                    # Yükleniyor mesajını sil
-                    await loading_message.delete()
-                    
-                    # Şarkıyı çal veya sıraya ekle
-                    if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
-                        # Sıraya ekle
-                        if guild_id not in self.queue:
-                            self.queue[guild_id] = []
-                        
-                        self.queue[guild_id].append(selected_song)
-                        print(f"Şarkı sıraya eklendi: {selected_song['title']}")
-                        
-                        # Sıraya eklendiğini bildir
-                        embed = discord.Embed(
-                            title="🎵 Sıraya Eklendi",
-                            description=f"**{selected_song['title']}**",
-                            color=discord.Color.green()
-                        )
-                        
-                        if selected_song.get('thumbnail'):
-                            embed.set_thumbnail(url=selected_song['thumbnail'])
-                        
-                        embed.add_field(name="Sıra Pozisyonu", value=f"#{len(self.queue[guild_id])}", inline=True)
-                        
-                        await interaction.followup.send(embed=embed)
-                    else:
-                        # Doğrudan çal
-                        print(f"Şarkı doğrudan çalınıyor: {selected_song['title']}")
-                        await self.play_song(interaction, selected_song)
-                except Exception as e:
-                    # Yükleniyor mesajını sil
-                    try:
-                        await loading_message.delete()
-                    except:
-                        pass
-                    
-                    print(f"Şarkı yükleme hatası: {e}")
-                    await interaction.followup.send(f"Şarkı yüklenirken bir hata oluştu: {e}")
+                embed.add_field(name="Sıra Pozisyonu", value=f"#{len(self.queue[guild_id])}", inline=True)
+                
+                await interaction.followup.send(embed=embed)
             else:
-                print(f"Şarkı seçim hatası: {guild_id} - {index}")
-                await interaction.response.send_message("Seçim yapılamadı. Lütfen tekrar deneyin.", ephemeral=True)
-        
-        return select_callback
-    
-    # İptal butonu callback'i oluştur
-    def create_cancel_callback(self, ctx):
-        async def cancel_callback(interaction):
-            await interaction.response.edit_message(
-                content="❌ Arama iptal edildi.",
-                embed=None,
-                view=None
-            )
-        return cancel_callback
+                # Doğrudan çal
+                log.debug('Şarkı doğrudan çalınıyor: %s', selected_song.title)
+                await self.play_song(interaction, selected_song)
+        except Exception as e:
+            # Yükleniyor mesajını sil
+            try:
+                await loading_message.delete()
+            except:
+                pass
+            
+            log.error('Şarkı yükleme hatası: %s', e)
+            await interaction.followup.send(f"Şarkı yüklenirken bir hata oluştu: {e}")
+    
+    # Sonuç numarasına karşılık gelen başlığı arama mesajının embed alanlarından bul ("1. Başlık")
+    @staticmethod
+    def search_result_title(message, label):
+        if message is None or not label:
+            return None
+        prefix = f'{label}. '
+        for embed in message.embeds:
+            for field in embed.fields:
+                if field.name and field.name.startswith(prefix):
+                    return field.name[len(prefix):]
+        return None
+
+    # Arama iptal edildi (SearchButton)
+    async def cancel_search(self, interaction):
+        await interaction.response.edit_message(
+            content="❌ Arama iptal edildi.",
+            embed=None,
+            view=None
+        )
     
     # Şarkı bilgilerini işle
     async def process_song_info(self, ctx, info, searching_message=None):
@@ -444,23 +2850,15 @@ class MusicPlayer:
             embed.add_field(name="Kaynak", value=f"[Link]({info.get('webpage_url', '')})", inline=True)
             
             # Şarkı bilgilerini döndür
-            song_info = {
-                'title': info['title'],
-                'url': info.get('url', ''),
-                'thumbnail': info.get('thumbnail'),
-                'duration': info.get('duration'),
-                'webpage_url': info.get('webpage_url', ''),
-                'uploader': info.get('uploader', 'Bilinmeyen')
-            }
-            
-            return song_info
+            return Track.from_info(info, with_stream=True)
         except Exception as e:
-            print(f"Şarkı bilgisi işleme hatası: {e}")
+            log.error('Şarkı bilgisi işleme hatası: %s', e)
             raise e
 
     # Şarkı çal
     async def play_song(self, ctx, song_info):
         guild_id = ctx.guild.id
+        bind_log_context(guild=guild_id, track=song_info.video_id)
         
         # Ses kanalına bağlan
         if not ctx.guild.voice_client:
@@ -473,9 +2871,9 @@ class MusicPlayer:
             # Ses kanalına bağlan
             try:
                 voice_client = await voice_channel.connect()
-                print(f"Ses kanalına bağlandı: {voice_channel.name}")
+                log.info('Ses kanalına bağlandı: %s', voice_channel.name)
             except Exception as e:
-                print(f"Ses kanalına bağlanma hatası: {e}")
+                log.error('Ses kanalına bağlanma hatası: %s', e)
                 if isinstance(ctx, discord.Interaction):
                     await ctx.followup.send(f"Ses kanalına bağlanırken bir hata oluştu: {e}")
                 else:
@@ -484,11 +2882,15 @@ class MusicPlayer:
         else:
             voice_client = ctx.guild.voice_client
         
+        # Parça yerel önbellekteyse YouTube'a hiç gitme
+        local_path = self.audio_cache.lookup(song_info.video_id)
+        
         # Şarkı URL'sini kontrol et
         try:
-            song_info = await self.get_song_url(song_info)
+            if local_path is None:
+                song_info = await self.get_song_url(guild_id, song_info)
         except Exception as e:
-            print(f"URL alma hatası: {e}")
+            log.error('URL alma hatası: %s', e)
             error_msg = str(e)
             if "Sign in to confirm you're not a bot" in error_msg:
                 error_msg = "YouTube bot koruması nedeniyle bu şarkı çalınamıyor. Lütfen başka bir şarkı deneyin veya birkaç dakika sonra tekrar deneyin."
@@ -505,10 +2907,9 @@ class MusicPlayer:
         
         # Ses kaynağını oluştur
         try:
-            audio_source = discord.FFmpegPCMAudio(song_info['url'], **ffmpeg_options)
-            audio_source = discord.PCMVolumeTransformer(audio_source, volume=0.5)
+            audio_source = self.engine.create_source(guild_id, local_path or song_info.stream_url)
         except Exception as e:
-            print(f"Ses kaynağı oluşturma hatası: {e}")
+            log.error('Ses kaynağı oluşturma hatası: %s', e)
             if isinstance(ctx, discord.Interaction):
                 await ctx.followup.send(f"Ses kaynağı oluşturulurken bir hata oluştu: {e}")
             else:
@@ -520,529 +2921,1026 @@ class MusicPlayer:
             voice_client.stop()
         
         # Şu an çalan şarkı bilgisini güncelle
-        self.now_playing[guild_id] = song_info
+        self.set_now_playing(guild_id, song_info)
         
         # Şarkıyı çal
+        self.engine.play(guild_id, voice_client, audio_source, self.make_after_callback(guild_id))
+        log.info('Şarkı çalmaya başladı: %s', song_info.title, extra={'sample': 'track_start'})
+        tracks_started.inc(source='local' if local_path else 'stream')
+        if local_path is None:
+            self.audio_cache.record_play(song_info)
+        
+        # Sıradaki şarkıları çalarken hazırla
+        self.schedule_prefetch(guild_id)
+        
+        # Kontrol arayüzü oluştur
+        await self.create_control_panel(ctx, song_info)
+
+    # Ses thread'inde çalışan "parça bitti" callback'i: yalnızca olay bırakır, asla beklemez
+    def make_after_callback(self, guild_id):
+        generation = self.play_generations[guild_id] = self.play_generations.get(guild_id, 0) + 1
         def after_playing(error):
+            # Yerine yeni kaynak konmuş (ör. sarılmış) bir kaynağın bitişi geçiş sayılmaz
+            if self.play_generations.get(guild_id) == generation:
+                self.track_ended_at[guild_id] = time.perf_counter()
             if error:
-                print(f"Oynatma hatası: {error}")
+                log.error('Oynatma hatası: %s', error)
+            self.bot.loop.call_soon_threadsafe(self.post_playback_event, guild_id, 'track_end')
+        return after_playing
+
+    # Sıradaki parçanın ilk sesi geldiğinde önceki parçanın bitişinden bu yana geçen süreyi kaydet (ses thread'i)
+    def record_transition_gap(self, guild_id, elapsed):
+        ended_at = self.track_ended_at.pop(guild_id, None)
+        if ended_at is not None:
+            transition_gap_seconds.observe(time.perf_counter() - ended_at)
+
+    # Sunucunun oynatma olay kuyruğuna olay ekle, gerekirse sürücü görevini başlat
+    def post_playback_event(self, guild_id, event):
+        events = self.playback_events.get(guild_id)
+        if events is None:
+            events = self.playback_events[guild_id] = asyncio.Queue()
+        driver = self.playback_drivers.get(guild_id)
+        if driver is None or driver.done():
+            self.playback_drivers[guild_id] = asyncio.create_task(self.playback_driver(guild_id, events))
+        events.put_nowait(event)
+
+    # Sunucu başına oynatma durum makinesi: olayları sırayla işler, geçişler aynı anda çalışmaz
+    async def playback_driver(self, guild_id, events):
+        bind_log_context(guild=guild_id)
+        while True:
+            event = await events.get()
+            
+            guild = self.bot.get_guild(guild_id)
+            voice_client = guild.voice_client if guild else None
+            if not voice_client:
+                # Bot ses kanalında değil, bekleyen olayları at ve sürücüyü kapat
+                self.playback_events.pop(guild_id, None)
+                self.playback_drivers.pop(guild_id, None)
+                return
             
-            # Bot hala bağlı mı kontrol et
-            if self.bot.get_guild(guild_id) and self.bot.get_guild(guild_id).voice_client:
-                # Bir sonraki şarkıyı çal
-                coro = self.play_next(guild_id)
-                fut = asyncio.run_coroutine_threadsafe(coro, self.bot.loop)
+            if event == 'track_end':
+                # Bu arada başka bir yol (ör. play_song) yeni parçayı başlatmışsa olay eskidir
+                if voice_client.is_playing() or voice_client.is_paused():
+                    continue
                 try:
-                    fut.result()
+                    if await self.resume_interrupted(guild_id):
+                        continue
+                    await self.play_next(guild_id)
                 except Exception as e:
-                    print(f"play_next hatası: {e}")
-        
-        voice_client.play(audio_source, after=after_playing)
-        print(f"Şarkı çalmaya başladı: {song_info['title']}")
-        
-        # Kontrol arayüzü oluştur
-        await self.create_control_panel(ctx, song_info)
+                    log.exception('play_next hatası: %s', e)
+
+    # Sunucunun son kullanılan metin kanalına mesaj gönder
+    async def notify_channel(self, guild_id, content):
+        channel = self.text_channels.get(guild_id)
+        if channel is None:
+            return
+        try:
+            await channel.send(content)
+        except Exception as e:
+            log.warning('Kanal bildirimi gönderilemedi: %s', e)
+
+    # Atlanan şarkıyı bildir; çok sayıda bozuk şarkıda kanalı mesajla doldurma
+    async def notify_skipped(self, guild_id, song, error, skipped):
+        if skipped <= self.max_skip_notices:
+            await self.notify_channel(guild_id, f"Şarkı çalınamadı, atlanıyor: **{song.title}** ({error})")
 
     # Sıradaki şarkıyı çal
     async def play_next(self, guild_id):
-        print(f"play_next çağrıldı: {guild_id}")
+        log.debug('play_next çağrıldı: %s', guild_id)
         
         # Sunucuyu ve ses istemcisini kontrol et
         guild = self.bot.get_guild(guild_id)
         if not guild:
-            print(f"Guild bulunamadı: {guild_id}")
+            log.debug('Guild bulunamadı: %s', guild_id)
             return
         
         voice_client = guild.voice_client
         if not voice_client or not voice_client.is_connected():
-            print(f"Ses istemcisi bağlı değil: {guild_id}")
+            log.debug('Ses istemcisi bağlı değil: %s', guild_id)
             return
         
-        # Sırada şarkı var mı kontrol et
-        if guild_id in self.queue and self.queue[guild_id]:
+        # Çalınabilen ilk şarkıya kadar sırada ilerle (özyineleme yok)
+        skipped = 0
+        while guild_id in self.queue and self.queue[guild_id]:
             # Eğer varsa, önceki ayrılma görevini iptal et
             if guild_id in self.leave_tasks and not self.leave_tasks[guild_id].done():
                 self.leave_tasks[guild_id].cancel()
-                print(f"Ayrılma görevi iptal edildi: {guild_id}")
+                log.debug('Ayrılma görevi iptal edildi: %s', guild_id)
             
-            next_song = self.queue[guild_id].pop(0)
-            print(f"Sıradaki şarkı: {next_song['title']}")
+            next_song = self.queue[guild_id].popleft()
+            bind_log_context(track=next_song.video_id)
+            log.debug('Sıradaki şarkı: %s', next_song.title)
             
-            # URL'yi kontrol et ve gerekirse yeniden al
-            try:
-                next_song = await self.get_song_url(next_song)
-            except Exception as e:
-                print(f"URL yeniden alma hatası: {e}")
-                # Metin kanalını bul ve hata mesajı gönder
-                if guild_id in self.text_channels:
-                    channel = self.text_channels[guild_id]
-                    await channel.send(f"Şarkı URL'si alınamadı: {e}")
-                # Bir sonraki şarkıya geç
-                return await self.play_next(guild_id)
+            # Parça yerel önbellekteyse YouTube'a hiç gitme
+            local_path = self.audio_cache.lookup(next_song.video_id)
+            
+            # URL'yi kontrol et ve gerekirse yeniden al (geçici hatalar için tekrar dene)
+            error = None
+            for attempt in range(0 if local_path else self.resolve_attempts):
+                try:
+                    next_song = await self.get_song_url(guild_id, next_song)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    log.warning('URL yeniden alma hatası (%s/%s): %s', attempt + 1, self.resolve_attempts, e)
+                    next_song.stream_url = ''
+                    if attempt + 1 < self.resolve_attempts:
+                        await asyncio.sleep(self.resolve_retry_delay)
+            
+            if error is None and not local_path and not next_song.stream_url:
+                error = Exception("Akış URL'si bulunamadı")
             
             # Ses kaynağını oluştur
-            try:
-                print(f"Sıradaki şarkı URL'si: {next_song['url']}")
-                
-                # FFmpeg seçeneklerini ayarla
-                ffmpeg_before_options = '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
-                
-                # Ses kaynağını oluştur
-                audio_source = discord.FFmpegPCMAudio(
-                    next_song['url'],
-                    before_options=ffmpeg_before_options,
-                    options='-vn',
-                    executable=FFMPEG_PATH
-                )
-                
-                # Ses seviyesini ayarla
-                audio_source = discord.PCMVolumeTransformer(audio_source, volume=0.5)
-                
-            except Exception as e:
-                print(f"FFmpeg hatası: {e}")
-                # Metin kanalını bul ve hata mesajı gönder
-                if guild_id in self.text_channels:
-                    channel = self.text_channels[guild_id]
-                    await channel.send(f"Ses kaynağı oluşturulamadı: {e}")
+            audio_source = None
+            if error is None:
+                try:
+                    source_url = local_path or next_song.stream_url
+                    log.debug("Sıradaki şarkı kaynağı: %s", redact_url(source_url))
+                    audio_source = self.engine.create_source(guild_id, source_url)
+                except Exception as e:
+                    log.error('FFmpeg hatası: %s', e)
+                    error = e
+            
+            if error is not None:
                 # Bir sonraki şarkıya geç
-                return await self.play_next(guild_id)
+                skipped += 1
+                await self.notify_skipped(guild_id, next_song, error, skipped)
+                continue
             
-            # Şu an çalan şarkı bilgisini güncelle
-            self.now_playing[guild_id] = next_song
+            # Bu arada kullanıcı başka bir şarkı başlattıysa sırayı bozma
+            # Kullanılmayan kaynağın ffmpeg süreci kapatılır
+            if not voice_client.is_connected():
+                audio_source.cleanup()
+                return
+            if voice_client.is_playing() or voice_client.is_paused():
+                audio_source.cleanup()
+                self.queue[guild_id].appendleft(next_song, check_room=False)
+                return
             
-            # Eğer zaten çalıyorsa, durdur
-            if voice_client.is_playing():
-                voice_client.stop()
+            # Şu an çalan şarkı bilgisini güncelle
+            self.set_now_playing(guild_id, next_song)
             
             # Şarkıyı çal
-            def after_playing(error):
-                if error:
-                    print(f"Oynatma hatası: {error}")
-                
-                # Bot hala bağlı mı kontrol et
-                if self.bot.get_guild(guild_id) and self.bot.get_guild(guild_id).voice_client:
-                    # Bir sonraki şarkıyı çal
-                    coro = self.play_next(guild_id)
-                    fut = asyncio.run_coroutine_threadsafe(coro, self.bot.loop)
-                    try:
-                        fut.result()
-                    except Exception as e:
-                        print(f"play_next hatası: {e}")
-            
-            voice_client.play(audio_source, after=after_playing)
-            print(f"Şarkı çalmaya başladı: {next_song['title']}")
-            
-            # Eski kontrol panelini güncelle
-            if guild_id in self.control_messages:
-                try:
-                    # Metin kanalını bul
-                    channel = self.text_channels[guild_id]
-                    
-                    # Yeni kontrol paneli oluştur
-                    await self.create_control_panel(channel, next_song, update=True)
-                except Exception as e:
-                    print(f"Kontrol paneli güncelleme hatası: {e}")
-        else:
-            # Sırada şarkı yoksa
-            print(f"Sırada şarkı yok: {guild_id}")
+            self.engine.play(guild_id, voice_client, audio_source, self.make_after_callback(guild_id))
+            log.info('Şarkı çalmaya başladı: %s', next_song.title, extra={'sample': 'track_start'})
+            tracks_started.inc(source='local' if local_path else 'stream')
+            if local_path is None:
+                self.audio_cache.record_play(next_song)
             
-            # Şu an çalan şarkı bilgisini temizle
-            self.now_playing.pop(guild_id, None)
+            if skipped > self.max_skip_notices:
+                await self.notify_channel(guild_id, f"⚠️ Toplam {skipped} şarkı çalınamadığı için atlandı.")
             
-            # Kontrol mesajını güncelle
-            if guild_id in self.control_messages:
-                try:
-                    control_message = self.control_messages[guild_id]
-                    await control_message.edit(content="✅ Tüm şarkılar tamamlandı!", embed=None, view=None)
-                    self.control_messages.pop(guild_id, None)
-                except Exception as e:
-                    print(f"Kontrol mesajı temizleme hatası: {e}")
+            # Sıradaki şarkıları çalarken hazırla
+            self.schedule_prefetch(guild_id)
             
-            # Otomatik ayrılma görevi oluştur
-            async def leave_after_timeout():
-                try:
-                    await asyncio.sleep(self.inactivity_timeout)  # 5 dakika bekle
+            # Eski kontrol panelini güncelle
+            if self.panels.has_panel(guild_id) and guild_id in self.text_channels:
+                self.panels.request(guild_id, self.text_channels[guild_id], next_song)
+            return
+        
+        if skipped > self.max_skip_notices:
+            await self.notify_channel(guild_id, f"⚠️ Toplam {skipped} şarkı çalınamadığı için atlandı.")
+        
+        # Sırada şarkı yoksa
+        log.info('Sırada şarkı yok: %s', guild_id)
+        self.track_ended_at.pop(guild_id, None)  # Geçiş yok, boşluk ölçülmez
+        
+        # Şu an çalan şarkı bilgisini temizle
+        self.clear_now_playing(guild_id)
+        
+        # Kontrol mesajını güncelle
+        if self.panels.has_panel(guild_id) and guild_id in self.text_channels:
+            self.panels.request(guild_id, self.text_channels[guild_id], finished=True)
+        
+        # Otomatik ayrılma görevi oluştur
+        async def leave_after_timeout():
+            try:
+                await asyncio.sleep(self.inactivity_timeout)  # 5 dakika bekle
+                
+                # Hala bağlı mı kontrol et
+                if guild.voice_client and guild.voice_client.is_connected():
+                    # Metin kanalına bilgi mesajı gönder
+                    if guild_id in self.text_channels:
+                        channel = self.text_channels[guild_id]
+                        await channel.send("👋 5 dakika boyunca kullanılmadığı için ses kanalından ayrılıyorum.")
                     
-                    # Hala bağlı mı kontrol et
-                    if guild.voice_client and guild.voice_client.is_connected():
-                        # Metin kanalına bilgi mesajı gönder
-                        if guild_id in self.text_channels:
-                            channel = self.text_channels[guild_id]
-                            await channel.send("👋 5 dakika boyunca kullanılmadığı için ses kanalından ayrılıyorum.")
-                        
-                        # Ses kanalından ayrıl
-                        await guild.voice_client.disconnect()
-                        print(f"İnaktivite nedeniyle ses kanalından ayrıldı: {guild_id}")
-                except asyncio.CancelledError:
-                    # Görev iptal edildi
-                    pass
-                except Exception as e:
-                    print(f"Otomatik ayrılma hatası: {e}")
-            
-            # Önceki görevi iptal et (eğer varsa)
-            if guild_id in self.leave_tasks and not self.leave_tasks[guild_id].done():
-                self.leave_tasks[guild_id].cancel()
-            
-            # Yeni görevi oluştur ve başlat
-            self.leave_tasks[guild_id] = asyncio.create_task(leave_after_timeout())
-            print(f"Otomatik ayrılma görevi oluşturuldu: {guild_id}, {self.inactivity_timeout} saniye sonra")
+                    # Ses kanalından ayrıl
+                    await guild.voice_client.disconnect()
+                    log.info('İnaktivite nedeniyle ses kanalından ayrıldı: %s', guild_id)
+            except asyncio.CancelledError:
+                # Görev iptal edildi
+                pass
+            except Exception as e:
+                log.exception('Otomatik ayrılma hatası: %s', e)
+        
+        # Önceki görevi iptal et (eğer varsa)
+        if guild_id in self.leave_tasks and not self.leave_tasks[guild_id].done():
+            self.leave_tasks[guild_id].cancel()
+        
+        # Yeni görevi oluştur ve başlat
+        self.leave_tasks[guild_id] = asyncio.create_task(leave_after_timeout())
+        log.debug('Otomatik ayrılma görevi oluşturuldu: %s, %s saniye sonra', guild_id, self.inactivity_timeout)
+
+    # Kontrol paneli embed'i
+    def build_panel_embed(self, song_info):
+        embed = discord.Embed(
+            title="🎵 Şu an çalıyor",
+            description=f"**{song_info.title}**",
+            color=discord.Color.blue()
+        )
+        
+        if song_info.thumbnail:
+            embed.set_thumbnail(url=song_info.thumbnail)
+        
+        embed.add_field(name="Yükleyen", value=song_info.uploader, inline=True)
+        
+        if song_info.duration:
+            duration = song_info.duration
+            if isinstance(duration, (int, float)):
+                minutes, seconds = divmod(int(duration), 60)
+                embed.add_field(name="Süre", value=f"{minutes}:{seconds:02d}", inline=True)
+        
+        embed.add_field(name="Kaynak", value=f"[Link]({song_info.webpage_url})", inline=True)
+        return embed
 
-    # Kontrol arayüzü oluştur
+    # Kontrol arayüzü oluştur veya güncelle (gönderim PanelUpdater'da birleştirilerek yapılır)
     async def create_control_panel(self, ctx, song_info, update=False):
-        guild_id = ctx.guild.id
+        # Metin kanalını belirle
+        if isinstance(ctx, discord.Interaction):
+            channel = ctx.channel
+        elif isinstance(ctx, commands.Context):
+            channel = ctx.channel
+        else:
+            channel = ctx  # Doğrudan kanal nesnesi verilmiş
+        
+        self.panels.request(ctx.guild.id, channel, song_info, new_message=not update)
+
+    # Kontrol paneli butonlarının ortak işleyicisi (PanelButton)
+    async def handle_panel_action(self, interaction, action):
+        bind_log_context(guild=interaction.guild_id, command=f'panel:{action}', request=interaction.id)
+        handlers = {
+            'pause': self.panel_pause,
+            'skip': self.panel_skip,
+            'queue': self.panel_queue,
+            'stop': self.panel_stop,
+            'leave': self.panel_leave,
+        }
+        await handlers[action](interaction)
+    
+    # Duraklat/Devam Et butonu
+    async def panel_pause(self, interaction):
+        if interaction.guild.voice_client:
+            if interaction.guild.voice_client.is_playing():
+                interaction.guild.voice_client.pause()
+                await interaction.response.send_message("⏸️ Müzik duraklatıldı.", ephemeral=True)
+            elif interaction.guild.voice_client.is_paused():
+                interaction.guild.voice_client.resume()
+                await interaction.response.send_message("▶️ Müzik devam ediyor.", ephemeral=True)
+            else:
+                await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
+        else:
+            await interaction.response.send_message("Bot bir ses kanalında değil.", ephemeral=True)
+    
+    # Geç butonu
+    async def panel_skip(self, interaction):
+        if interaction.guild.voice_client and (interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused()):
+            interaction.guild.voice_client.stop()  # Şu anki şarkıyı durdur, play_next otomatik olarak çağrılacak
+            await interaction.response.send_message("⏭️ Şarkı geçildi.", ephemeral=True)
+        else:
+            await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
+    
+    # Durdur butonu
+    async def panel_stop(self, interaction):
+        guild_id = interaction.guild.id
+        
+        if interaction.guild.voice_client:
+            if interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused():
+                # Sırayı temizle
+                if guild_id in self.queue:
+                    self.queue[guild_id].clear()
+                
+                # Devam eden playlist yüklemesini iptal et
+                self.cancel_playlist_ingestion(guild_id)
+                
+                # Şu an çalan şarkı bilgisini temizle
+                self.clear_now_playing(guild_id)
+                
+                # Müziği durdur
+                interaction.guild.voice_client.stop()
+                await interaction.response.send_message("⏹️ Müzik durduruldu ve sıra temizlendi!", ephemeral=True)
+            else:
+                await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
+        else:
+            await interaction.response.send_message("Bot bir ses kanalında değil.", ephemeral=True)
+    
+    # Sıra butonu
+    async def panel_queue(self, interaction):
+        guild_id = interaction.guild.id
         
-        # Embed oluştur
+        if guild_id not in self.queue or not self.queue[guild_id]:
+            await interaction.response.send_message("Sırada şarkı yok.", ephemeral=True)
+            return
+        
+        # Sıra embed'i oluştur
         embed = discord.Embed(
-            title="🎵 Şu an çalıyor",
-            description=f"**{song_info['title']}**",
+            title="🎵 Şarkı Sırası",
             color=discord.Color.blue()
         )
         
-        if song_info.get('thumbnail'):
-            embed.set_thumbnail(url=song_info['thumbnail'])
-        
-        embed.add_field(name="Yükleyen", value=song_info.get('uploader', 'Bilinmeyen'), inline=True)
-        
-        if song_info.get('duration'):
-            duration = song_info['duration']
-            if isinstance(duration, (int, float)):
-                minutes, seconds = divmod(int(duration), 60)
-                embed.add_field(name="Süre", value=f"{minutes}:{seconds:02d}", inline=True)
-        
-        embed.add_field(name="Kaynak", value=f"[Link]({song_info.get('webpage_url', '')})", inline=True)
+        # Şu an çalan şarkı
+        if guild_id in self.now_playing:
+            now_playing = self.now_playing[guild_id]
+            embed.add_field(
+                name="Şu an oynatılıyor:",
+                value=f"**{now_playing.title}**",
+                inline=False
+            )
         
-        # Kontrol butonları
-        view = discord.ui.View()
+        # Sıradaki şarkılar
+        queue_text = ""
+        for i, song in enumerate(self.queue[guild_id].head(10)):
+            queue_text += f"{i+1}. **{song.title}**\n"
+            
+            # Çok uzunsa kısalt
+            if i >= 9:  # İlk 10 şarkıyı göster
+                remaining = len(self.queue[guild_id]) - 10
+                queue_text += f"... ve {remaining} şarkı daha"
+                break
+                
+        embed.add_field(name="Sıradaki şarkılar:", value=queue_text, inline=False)
         
-        # Duraklat/Devam Et butonu
-        pause_button = discord.ui.Button(style=discord.ButtonStyle.primary, label="⏯️ Duraklat/Devam Et")
-        pause_button.callback = self.create_pause_callback(ctx=None)
-        view.add_item(pause_button)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    # Ayrıl butonu
+    async def panel_leave(self, interaction):
+        guild_id = interaction.guild.id
         
-        # Geç butonu
-        skip_button = discord.ui.Button(style=discord.ButtonStyle.primary, label="⏭️ Geç")
-        skip_button.callback = self.create_skip_callback(ctx=None)
-        view.add_item(skip_button)
+        if interaction.guild.voice_client:
+            # Sırayı temizle
+            if guild_id in self.queue:
+                self.queue[guild_id].clear()
+            
+            # Devam eden playlist yüklemesini iptal et
+            self.cancel_playlist_ingestion(guild_id)
+            
+            # Şu an çalan şarkı bilgisini temizle
+            self.clear_now_playing(guild_id)
+            
+            # Kanaldan ayrıl
+            await interaction.guild.voice_client.disconnect()
+            await interaction.response.send_message("👋 Ses kanalından ayrıldım.", ephemeral=True)
+        else:
+            await interaction.response.send_message("Zaten bir ses kanalında değilim.", ephemeral=True)
+
+    # Akış URL'si yok mu ya da süresi dolmak üzere mi?
+    def needs_stream_url(self, song_info):
+        url = song_info.stream_url
+        return not url or stream_url_is_stale(url, self.url_expiry_margin)
+
+    # URL'yi kontrol et ve gerekirse yeniden al
+    async def get_song_url(self, guild_id, song_info, background=False):
+        if self.needs_stream_url(song_info):
+            if song_info.stream_url:
+                log.debug('URL süresi dolmak üzere, yeniden alınıyor: %s', song_info.title, extra={'sample': 'url_refresh'})
+            else:
+                log.debug('URL bulunamadı, yeniden alınıyor: %s', song_info.title, extra={'sample': 'url_refresh'})
+
+            # Aynı şarkı için devam eden bir çözümleme varsa onu bekle
+            webpage_url = song_info.webpage_url
+            task = self.resolving.get(webpage_url)
+            if task is None:
+                task = asyncio.create_task(self.resolve_stream_url(guild_id, webpage_url, background))
+                self.resolving[webpage_url] = task
+                task.add_done_callback(lambda _: self.resolving.pop(webpage_url, None))
+
+            # Bekleyen taraf iptal edilse bile ortak çözümleme devam etsin
+            song_info.stream_url = await asyncio.shield(task)
+        return song_info
+
+    # Şarkının akış URL'sini yt-dlp ile çözümle
+    async def resolve_stream_url(self, guild_id, webpage_url, background=False):
+        # Başka bir sunucu aynı videoyu yakın zamanda çözümlediyse onu kullan
+        video_id = youtube_video_id(webpage_url)
+        cached_url = await self.resolution_cache.get_stream_url(video_id, self.url_expiry_margin)
+        if cached_url:
+            return cached_url
         
-        # Sıra butonu
-        queue_button = discord.ui.Button(style=discord.ButtonStyle.primary, label="📋 Sıra")
-        queue_button.callback = self.create_queue_callback(ctx=None)
-        view.add_item(queue_button)
+        clients = self.client_health.ranked()
+        errors = []
         
-        # Durdur butonu
-        stop_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="⏹️ Durdur")
-        stop_button.callback = self.create_stop_callback(ctx=None)
-        view.add_item(stop_button)
+        # Kullanıcı bekliyorsa en sağlıklı iki istemciyi yarıştır, ilk gelen sonucu kullan.
+        # YouTube kısıtlama uyguluyorsa fazladan istek gönderme.
+        if not background and self.race_clients and len(clients) >= 2 and not self.extractor.rate_limiter.is_throttled():
+            racers = [asyncio.create_task(self.resolve_with_client(guild_id, client, webpage_url, background)) for client in clients[:2]]
+            clients = clients[2:]
+            try:
+                for next_done in asyncio.as_completed(racers):
+                    try:
+                        return await next_done
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        errors.append(e)
+            finally:
+                for racer in racers:
+                    racer.cancel()
         
-        # Ayrıl butonu
-        leave_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="👋 Ayrıl")
-        leave_button.callback = self.create_leave_callback(ctx=None)
-        view.add_item(leave_button)
+        # Kalan istemcileri sağlık sırasına göre tek tek dene
+        for client in clients:
+            try:
+                return await self.resolve_with_client(guild_id, client, webpage_url, background)
+            except Exception as e:
+                errors.append(e)
         
-        # Metin kanalını belirle
-        if isinstance(ctx, discord.Interaction):
-            channel = ctx.channel
-        elif isinstance(ctx, commands.Context):
-            channel = ctx.channel
-        else:
-            channel = ctx  # Doğrudan kanal nesnesi verilmiş
+        # Son çare: düşük kaliteli format ile tek deneme
+        run = self.extractor.run_background if background else self.extractor.run
+        try:
+            info = await run(guild_id, extract_info, 'fallback', webpage_url, download=False)
+            if info.get('url'):
+                log.warning('Akış URL\'si düşük kaliteli yedek formatla alındı: %s', webpage_url)
+                self.remember_info(info)
+                return info['url']
+            errors.append(yt_dlp.utils.DownloadError("Yedek format akış URL'si döndürmedi"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            errors.append(e)
         
-        # Kontrol mesajını gönder veya güncelle
-        if update and guild_id in self.control_messages:
+        log.error("Hiçbir istemciyle akış URL'si alınamadı: %s", webpage_url)
+        raise errors[0]
+
+    # Tek bir YouTube istemcisiyle akış URL'si al ve istemcinin sağlık istatistiğini güncelle
+    async def resolve_with_client(self, guild_id, client, webpage_url, background=False):
+        # Ön çözümleme, kullanıcının beklediği isteklerin önüne geçmesin
+        run = self.extractor.run_background if background else self.extractor.run
+        start = time.monotonic()
+        # İstemci sağlığı için süre, işçi işi almaya başladığında başlar; havuz kuyruğunda beklenen süre sayılmaz
+        worker = {}
+        def timed_extract(*args, **kwargs):
+            worker['start'] = time.monotonic()
             try:
-                # Mevcut kontrol mesajını güncelle
-                message = self.control_messages[guild_id]
-                await message.edit(embed=embed, view=view)
-                print(f"Kontrol paneli güncellendi: {guild_id}")
-            except Exception as e:
-                print(f"Kontrol paneli güncelleme hatası: {e}")
-                # Güncelleme başarısız olursa yeni mesaj gönder
-                message = await channel.send(embed=embed, view=view)
-                self.control_messages[guild_id] = message
-                print(f"Yeni kontrol paneli oluşturuldu: {guild_id}")
-        else:
-            # Yeni kontrol mesajı gönder
-            message = await channel.send(embed=embed, view=view)
-            self.control_messages[guild_id] = message
-            print(f"Kontrol paneli oluşturuldu: {guild_id}")
-
-    # Duraklat/Devam Et butonu callback'i
-    def create_pause_callback(self, ctx):
-        async def pause_callback(interaction):
-            guild_id = interaction.guild.id
-            
-            if interaction.guild.voice_client:
-                if interaction.guild.voice_client.is_playing():
-                    interaction.guild.voice_client.pause()
-                    await interaction.response.send_message("⏸️ Müzik duraklatıldı.", ephemeral=True)
-                elif interaction.guild.voice_client.is_paused():
-                    interaction.guild.voice_client.resume()
-                    await interaction.response.send_message("▶️ Müzik devam ediyor.", ephemeral=True)
-                else:
-                    await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
-            else:
-                await interaction.response.send_message("Bot bir ses kanalında değil.", ephemeral=True)
+                return extract_info(*args, **kwargs)
+            finally:
+                worker['end'] = time.monotonic()
+        def worker_latency():
+            return worker.get('end', time.monotonic()) - worker['start']
         
-        return pause_callback
-    
-    # Geç butonu callback'i
-    def create_skip_callback(self, ctx):
-        async def skip_callback(interaction):
-            guild_id = interaction.guild.id
-            
-            if interaction.guild.voice_client and (interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused()):
-                interaction.guild.voice_client.stop()  # Şu anki şarkıyı durdur, play_next otomatik olarak çağrılacak
-                await interaction.response.send_message("⏭️ Şarkı geçildi.", ephemeral=True)
-            else:
-                await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
+        try:
+            info = await run(guild_id, timed_extract, client_profile_name(client), webpage_url, download=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Kuyruk dolduysa veya iş hiç başlamadıysa hata istemciye yazılmaz
+            if 'start' in worker:
+                self.client_health.record_failure(client, worker_latency())
+            resolve_failures.inc(client=client, reason=error_reason(e))
+            log.warning('URL alma hatası (%s): %s', client, e)
+            raise
         
-        return skip_callback
-    
-    # Durdur butonu callback'i
-    def create_stop_callback(self, ctx):
-        async def stop_callback(interaction):
-            guild_id = interaction.guild.id
-            
-            if interaction.guild.voice_client:
-                if interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused():
-                    # Sırayı temizle
-                    if guild_id in self.queue:
-                        self.queue[guild_id] = []
-                    
-                    # Şu an çalan şarkı bilgisini temizle
-                    self.now_playing.pop(guild_id, None)
-                    
-                    # Müziği durdur
-                    interaction.guild.voice_client.stop()
-                    await interaction.response.send_message("⏹️ Müzik durduruldu ve sıra temizlendi!", ephemeral=True)
-                else:
-                    await interaction.response.send_message("Şu anda çalan bir müzik yok.", ephemeral=True)
-            else:
-                await interaction.response.send_message("Bot bir ses kanalında değil.", ephemeral=True)
+        url = info.get('url', '')
+        if not url:
+            self.client_health.record_failure(client, worker_latency())
+            resolve_failures.inc(client=client, reason='empty_url')
+            raise Exception(f"{client} istemcisi akış URL'si döndürmedi")
         
-        return stop_callback
-    
-    # Sıra butonu callback'i
-    def create_queue_callback(self, ctx):
-        async def queue_callback(interaction):
-            guild_id = interaction.guild.id
-            
-            if guild_id not in self.queue or not self.queue[guild_id]:
-                await interaction.response.send_message("Sırada şarkı yok.", ephemeral=True)
+        self.client_health.record_success(client, worker_latency())
+        resolve_seconds.observe(time.monotonic() - start, client=client)
+        self.remember_info(info)
+        return url
+
+    # Sıradaki şarkıların URL'lerini arka planda önceden çözümle
+    def schedule_prefetch(self, guild_id):
+        if self.prefetch_depth <= 0:
+            return
+        task = self.prefetch_tasks.get(guild_id)
+        if task and not task.done():
+            return
+        self.prefetch_tasks[guild_id] = asyncio.create_task(self.prefetch_next(guild_id))
+
+    async def prefetch_next(self, guild_id):
+        bind_log_context(guild=guild_id)
+        # Sıra değişmiş olabilir, pencere tamamen hazır olana kadar tekrar bak
+        while True:
+            queue = self.queue.get(guild_id)
+            window = queue.head(self.prefetch_depth) if queue else []
+            pending = [song for song in window if self.needs_stream_url(song) and not song.prefetch_failed
+                       and song.video_id not in self.audio_cache.files]
+            if not pending:
                 return
-            
-            # Sıra embed'i oluştur
-            embed = discord.Embed(
-                title="🎵 Şarkı Sırası",
-                color=discord.Color.blue()
-            )
-            
-            # Şu an çalan şarkı
-            if guild_id in self.now_playing:
-                now_playing = self.now_playing[guild_id]
-                embed.add_field(
-                    name="Şu an oynatılıyor:",
-                    value=f"**{now_playing['title']}**",
-                    inline=False
-                )
-            
-            # Sıradaki şarkılar
-            queue_text = ""
-            for i, song in enumerate(self.queue[guild_id]):
-                queue_text += f"{i+1}. **{song['title']}**\n"
-                
-                # Çok uzunsa kısalt
-                if i >= 9:  # İlk 10 şarkıyı göster
-                    remaining = len(self.queue[guild_id]) - 10
-                    queue_text += f"... ve {remaining} şarkı daha"
-                    break
-                    
-            embed.add_field(name="Sıradaki şarkılar:", value=queue_text, inline=False)
-            
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            for song in pending:
+                try:
+                    await self.get_song_url(guild_id, song, background=True)
+                    # URL alınamadıysa ya da hâlâ eski sayılıyorsa (kısa ömürlü URL, geniş pay) tekrar deneme
+                    if not song.stream_url or self.needs_stream_url(song):
+                        song.prefetch_failed = True
+                        continue
+                    log.debug('Sıradaki şarkı önceden hazırlandı: %s', song.title, extra={'sample': 'prefetch'})
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Çalma sırasında tekrar denenecek
+                    song.prefetch_failed = True
+                    log.warning('Ön çözümleme hatası: %s - %s', song.title, e)
+
+    # Playlist'in düz (flat) girdisinden sıra kaydı oluştur
+    def flat_entry_song(self, entry):
+        thumbnail = entry.get('thumbnail')
+        if not thumbnail and entry.get('thumbnails'):
+            thumbnail = entry['thumbnails'][-1].get('url')
         
-        return queue_callback
-    
-    # Ayrıl butonu callback'i
-    def create_leave_callback(self, ctx):
-        async def leave_callback(interaction):
-            guild_id = interaction.guild.id
-            
-            if interaction.guild.voice_client:
-                # Sırayı temizle
-                if guild_id in self.queue:
-                    self.queue[guild_id] = []
-                
-                # Şu an çalan şarkı bilgisini temizle
-                self.now_playing.pop(guild_id, None)
-                
-                # Kanaldan ayrıl
-                await interaction.guild.voice_client.disconnect()
-                await interaction.response.send_message("👋 Ses kanalından ayrıldım.", ephemeral=True)
-            else:
-                await interaction.response.send_message("Zaten bir ses kanalında değilim.", ephemeral=True)
+        song = Track(
+            entry.get('title'),
+            video_id=youtube_video_id(entry.get('url')) or (entry.get('id') if entry.get('ie_key') == 'Youtube' else None),
+            source_url=entry.get('webpage_url') or entry.get('url'),
+            uploader=entry.get('uploader') or entry.get('channel'),
+            duration=entry.get('duration'),
+            thumbnail_url=thumbnail
+        )
         
-        return leave_callback
+        # Önbellekte daha zengin bilgi varsa kullan
+        cached = self.resolution_cache.peek_metadata(song.video_id)
+        if cached:
+            song.update_from_info(cached)
+        return song
 
-    # URL'yi kontrol et ve gerekirse yeniden al
-    async def get_song_url(self, song_info):
-        if not song_info.get('url') or song_info['url'] == '':
-            print(f"URL bulunamadı, yeniden alınıyor: {song_info['title']}")
+    # Düz girdide eksik bilgi var mı?
+    def needs_enrichment(self, song):
+        return not song.duration or not song.thumbnail or song.uploader == UNKNOWN_UPLOADER
+
+    # Playlist şarkılarının detaylarını arka planda, sınırlı eşzamanlılıkla tamamla
+    async def process_playlist_entries(self, ctx, playlist_title, songs, progress_message):
+        guild_id = ctx.guild.id
+        bind_log_context(guild=guild_id, playlist=playlist_title)
+        total = len(songs)
+        semaphore = asyncio.Semaphore(self.playlist_concurrency)
+        processed_count = 0
+        failed_count = 0
+        last_report = time.monotonic()
+        
+        async def report_progress(force=False):
+            nonlocal last_report
+            # Discord'u yormamak için ilerlemeyi en fazla birkaç saniyede bir güncelle
+            if not force and time.monotonic() - last_report < self.playlist_progress_interval:
+                return
+            last_report = time.monotonic()
             try:
-                # Optimize edilmiş YT-DLP ayarları
-                ydl_opts_url = {
-                    'format': 'bestaudio/best',
-                    'noplaylist': True,
-                    'nocheckcertificate': True,
-                    'quiet': True,
-                    'no_warnings': True,
-                    'socket_timeout': 10,
-                    'skip_download': True,
-                    'cachedir': False,
-                    'geo_bypass': True,
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['mweb', 'android', 'web'],  # mweb client öncelikli
-                            'player_skip': 'configs',  # Bazı yapılandırmaları atla
-                        },
-                        'youtubetab': {
-                            'skip': 'webpage',  # Webpage isteklerini atla
-                        }
-                    },
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts_url) as ydl:
-                    # URL'yi yeniden al
-                    info = ydl.extract_info(song_info['webpage_url'], download=False)
-                    song_info['url'] = info.get('url', '')
-                    return song_info
+                await progress_message.edit(content=f"🎵 Playlist işleniyor: `{playlist_title}` ({processed_count}/{total} şarkı hazırlandı)")
             except Exception as e:
-                print(f"URL yeniden alma hatası: {e}")
-                # Alternatif kaynak dene
+                log.warning('Playlist ilerleme mesajı güncellenemedi: %s', e)
+        
+        async def enrich(song):
+            nonlocal processed_count, failed_count
+            async with semaphore:
                 try:
-                    # Farklı bir format dene
-                    ydl_opts_alt = {
-                        'format': 'worstaudio/worst',  # Daha düşük kalite dene
-                        'noplaylist': True,
-                        'quiet': True,
-                        'geo_bypass': True,
-                        'skip_download': True,
-                        'sleep_interval': 5,  # İstekler arasında 5 saniye bekle
-                        'max_sleep_interval': 10,  # Maksimum 10 saniye bekle
-                        'extractor_args': {
-                            'youtube': {
-                                'player_client': ['tv_embedded', 'mweb', 'android'],  # Farklı istemciler dene
-                            }
-                        }
-                    }
-                    with yt_dlp.YoutubeDL(ydl_opts_alt) as ydl:
-                        info = ydl.extract_info(song_info['webpage_url'], download=False)
-                        song_info['url'] = info.get('url', '')
-                        return song_info
-                except Exception as e2:
-                    print(f"Alternatif kaynak denemesi başarısız: {e2}")
-                    # Son çare olarak doğrudan URL oluşturmayı dene
-                    try:
-                        # YouTube video ID'sini al
-                        video_id = None
-                        if 'youtube.com' in song_info['webpage_url'] or 'youtu.be' in song_info['webpage_url']:
-                            import re
-                            patterns = [
-                                r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-                                r'(?:embed\/|v\/|youtu.be\/)([0-9A-Za-z_-]{11})'
-                            ]
-                            for pattern in patterns:
-                                match = re.search(pattern, song_info['webpage_url'])
-                                if match:
-                                    video_id = match.group(1)
-                                    break
+                    if self.needs_enrichment(song):
+                        # Her şarkı için detaylı bilgi al (önbellekte varsa yt-dlp'ye gitme)
+                        detailed_info = await self.resolution_cache.get_metadata(song.video_id)
+                        if detailed_info is None:
+                            detailed_info = await self.extractor.run_background(guild_id, extract_info, 'search', song.webpage_url, download=False, process=False)
+                            self.remember_info(detailed_info)
                         
-                        if video_id:
-                            # Alternatif bir müzik servisi kullan
-                            print(f"YouTube kısıtlaması nedeniyle alternatif servis deneniyor: {video_id}")
-                            # Burada alternatif bir müzik servisi API'si kullanabilirsiniz
-                            # Örnek olarak, YouTube Music API veya başka bir servis
-                            
-                            # Şimdilik basit bir hata mesajı döndürelim
-                            raise Exception("YouTube kısıtlaması nedeniyle bu video şu anda oynatılamıyor. Lütfen başka bir şarkı deneyin.")
-                    except:
-                        raise e
-        return song_info
-
-    # Playlist şarkılarını arka planda işle
-    async def process_playlist_entries(self, ctx, entries, ydl):
-        guild_id = ctx.guild.id
+                        # Sıradaki kaydı yerinde güncelle
+                        song.update_from_info(detailed_info)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.warning('Playlist şarkı bilgisi alma hatası: %s', e, extra={'sample': 'playlist_entry_error'})
+                    # Yalnızca kalıcı olarak erişilemeyen şarkıyı sıradan çıkar; kuyruk doluluğu, kısıtlama veya
+                    # ağ hatasında düz bilgiyle sırada kalır, çalarken yeniden çözümlenir
+                    if is_unavailable_error(e):
+                        failed_count += 1
+                        queue = self.queue.get(guild_id)
+                        if queue:
+                            queue.remove_item(song)
+                processed_count += 1
+            await report_progress()
         
-        # entries bir islice nesnesi olabilir, listeye dönüştür
-        entries_list = list(entries)
-        processed_count = 0
+        try:
+            await asyncio.gather(*(enrich(song) for song in songs))
+        except asyncio.CancelledError:
+            try:
+                await progress_message.edit(content=f"⏹️ Playlist yüklemesi iptal edildi: `{playlist_title}` ({processed_count}/{total} şarkı hazırlandı)")
+            except Exception:
+                pass
+            raise
         
-        for entry in entries_list:
+        # Playlist bilgisi gönder
+        try:
+            await progress_message.edit(content=f"✅ Playlist hazır: `{playlist_title}` ({total - failed_count} şarkı sıraya eklendi)")
+        except Exception as e:
+            log.warning('Playlist ilerleme mesajı güncellenemedi: %s', e)
+
+    # Sunucunun devam eden playlist yüklemelerini iptal et (!stop / !leave)
+    def cancel_playlist_ingestion(self, guild_id):
+        for task in list(self.playlist_tasks.get(guild_id, ())):
+            task.cancel()
+
+# Sıralı değerlerden yüzdelik (milisaniye)
+def percentile_ms(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+# Sıcak yolu sınırlı bir süre için profiller: MusicPlayer metotlarının, extract_info'nun ve ses
+# read() çağrısının süreleri, tüm thread'lerden yığın örnekleri ve event loop gecikmesi.
+# Kancalar yalnızca pencere boyunca kuruludur; kapalıyken hiçbir ek maliyet yoktur.
+class HotPathProfiler:
+    PLAYER_METHODS = (
+        'show_search_results', 'search_youtube', 'extract_video_info', 'play_song', 'play_next',
+        'get_song_url', 'resolve_stream_url', 'prefetch_next', 'create_control_panel',
+    )
+    # Yığın örneklerinde boşta bekleme sayılan modüller
+    IDLE_MODULES = ('threading.py', 'selectors.py', 'queue.py')
+
+    def __init__(self, player, watchdog, output_dir, sample_interval=0.005):
+        self.player = player
+        self.watchdog = watchdog  # Loop gecikmesi ayrı bir görevle değil, watchdog'un ölçümleriyle toplanır
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.active = False
+        self.started_on_ready = False  # PROFILE_ON_START penceresi bir kez çalışır
+        self.lock = threading.Lock()
+
+    def _reset(self):
+        self.timings = {}
+        self.self_counts = {}
+        self.cumulative_counts = {}
+        self.thread_samples = {}
+        self.samples = 0
+        self.loop_lag = []
+
+    def _record(self, name, elapsed):
+        with self.lock:
+            self.timings.setdefault(name, []).append(elapsed)
+
+    def _wrap_async(self, name, func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
             try:
-                if not entry:
-                    continue
-                
-                # Her şarkı için detaylı bilgi al
-                detailed_info = ydl.extract_info(entry['url'], download=False, process=False)
-                
-                if not detailed_info:
+                return await func(*args, **kwargs)
+            finally:
+                self._record(name, time.perf_counter() - start)
+        return timed
+
+    def _wrap_sync(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(name, time.perf_counter() - start)
+        return timed
+
+    def _install(self):
+        for name in self.PLAYER_METHODS:
+            setattr(self.player, name, self._wrap_async(f'MusicPlayer.{name}', getattr(self.player, name)))
+        self.original_extract_info = globals()['extract_info']
+        globals()['extract_info'] = self._wrap_sync('extract_info', self.original_extract_info)
+        self.original_read = TimedAudioSource.read
+        TimedAudioSource.read = self._wrap_sync('AudioSource.read', self.original_read)
+
+    def _uninstall(self):
+        for name in self.PLAYER_METHODS:
+            self.player.__dict__.pop(name, None)
+        globals()['extract_info'] = self.original_extract_info
+        TimedAudioSource.read = self.original_read
+
+    @staticmethod
+    def _frame_key(frame):
+        code = frame.f_code
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    # Ayrı thread'de tüm thread'lerin yığınını örnekle
+    def _sample(self, stop):
+        own = threading.get_ident()
+        names = {}
+        while not stop.wait(self.sample_interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = re.sub(r'[_-]?\d+.*$', '', thread.name)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or os.path.basename(frame.f_code.co_filename) in self.IDLE_MODULES:
                     continue
-                
-                self.queue[guild_id].append({
-                    'title': detailed_info.get('title', 'Bilinmeyen Başlık'),
-                    'url': detailed_info.get('url', ''),
-                    'thumbnail': detailed_info.get('thumbnail'),
-                    'duration': detailed_info.get('duration'),
-                    'webpage_url': detailed_info.get('webpage_url', ''),
-                    'uploader': detailed_info.get('uploader', 'Bilinmeyen Yükleyici')
-                })
-                processed_count += 1
-            except Exception as e:
-                print(f"Playlist şarkı bilgisi alma hatası: {e}")
+                self.samples += 1
+                group = names.get(thread_id, 'unknown')
+                self.thread_samples[group] = self.thread_samples.get(group, 0) + 1
+                leaf = self._frame_key(frame)
+                self.self_counts[leaf] = self.self_counts.get(leaf, 0) + 1
+                seen = set()
+                while frame is not None:
+                    key = self._frame_key(frame)
+                    if key not in seen:
+                        seen.add(key)
+                        self.cumulative_counts[key] = self.cumulative_counts.get(key, 0) + 1
+                    frame = frame.f_back
+
+    async def run(self, seconds):
+        if self.active:
+            raise RuntimeError("Zaten bir profilleme sürüyor.")
+        self.active = True
+        self._reset()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stop,), name='profiler', daemon=True)
+        self.watchdog.lag_listeners.append(self.loop_lag.append)
+        self._install()
+        sampler.start()
+        log.warning('Profilleme başladı: %s saniye', seconds)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            self._uninstall()
+            self.watchdog.lag_listeners.remove(self.loop_lag.append)
+            await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+            self.active = False
         
-        # Playlist bilgisi gönder
-        if processed_count > 0 and guild_id in self.text_channels:
-            channel = self.text_channels[guild_id]
-            embed = discord.Embed(
-                title="🎵 Playlist Sıraya Eklendi",
-                description=f"**{processed_count} şarkı sıraya eklendi**",
-                color=discord.Color.green()
-            )
+        summary = self.summary(seconds)
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, time.strftime('profile-%Y%m%d-%H%M%S.json'))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        log.warning('Profilleme bitti: %s', path)
+        return path, summary
+
+    def summary(self, seconds, top=20):
+        def top_frames(counts):
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:top]
+            return [{'frame': key, 'percent': round(count * 100 / self.samples, 2)} for key, count in ranked]
+        
+        return {
+            'seconds': seconds,
+            'samples': self.samples,
+            'threads': dict(sorted(self.thread_samples.items(), key=lambda item: item[1], reverse=True)),
+            'timings': {name: {
+                'count': len(values),
+                'p50_ms': percentile_ms(values, 0.50),
+                'p99_ms': percentile_ms(values, 0.99),
+                'max_ms': round(max(values) * 1000, 2),
+                'total_ms': round(sum(values) * 1000, 2),
+            } for name, values in sorted(self.timings.items(), key=lambda item: sum(item[1]), reverse=True)},
+            'top_self': top_frames(self.self_counts) if self.samples else [],
+            'top_cumulative': top_frames(self.cumulative_counts) if self.samples else [],
+            'loop_lag_ms': {
+                'p50': percentile_ms(self.loop_lag, 0.50),
+                'p99': percentile_ms(self.loop_lag, 0.99),
+                'max': round(max(self.loop_lag) * 1000, 2) if self.loop_lag else None,
+            },
+        }
+
+# Event loop gecikmesini sürekli ölçer. Loop eşikten uzun süre takılırsa ayrı bir thread,
+# takılma sürerken loop thread'inin yığınını ve çalışan görevi yakalar; loop geri gelince rapor kaydedilir.
+class LoopWatchdog:
+    def __init__(self, interval=0.1, threshold=0.25, history=20, alert=None, alert_cooldown=300):
+        self.interval = interval  # Ölçüm aralığı (saniye)
+        self.threshold = threshold  # Bu süreden uzun gecikmeler takılma sayılır
+        self.stalls = deque(maxlen=history)  # Son takılma raporları
+        self.recent_lag = deque(maxlen=max(1, int(60 / interval)))  # Son bir dakikanın ölçümleri
+        self.alert = alert  # async callable(rapor), ör. sahiplere kanal mesajı
+        self.alert_cooldown = alert_cooldown
+        self.last_alert = 0.0
+        self.loop = None
+        self.loop_thread_id = None
+        self.heartbeat = (0, 0.0)  # (sıra numarası, zaman); thread'ler arasında tek parça okunur
+        self.capture = None  # Devam eden takılma için yakalanan yığın, hangi kalp atışına ait olduğuyla
+        self.lag_listeners = []  # Her ölçümle çağrılır, ör. profil penceresi
+        self.alert_tasks = set()
+        self.task = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = (0, time.perf_counter())
+        self.task = asyncio.create_task(self._monitor())
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.task:
+            self.task.cancel()
+
+    async def _monitor(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            beat = self.heartbeat[0]
+            self.heartbeat = (beat + 1, now)
+            self.recent_lag.append(lag)
+            loop_lag_seconds.observe(lag)
+            for listener in self.lag_listeners:
+                listener(lag)
             
-            await channel.send(embed=embed)
+            # Gözcü thread yığını eski bir kalp atışına bakarak aldıysa bu takılmaya ait değildir
+            capture, self.capture = self.capture, None
+            if capture and capture['beat'] != beat:
+                capture = None
+            if lag >= self.threshold:
+                self._report(lag, capture)
+
+    def _report(self, lag, capture):
+        report = {
+            'at': time.time(),
+            'lag_ms': round(lag * 1000, 1),
+            'task': capture['task'] if capture else None,
+            'stack': capture['stack'] if capture else None,
+        }
+        self.stalls.append(report)
+        log.warning('Event loop %s ms takıldı, çalışan: %s\n%s', report['lag_ms'], report['task'] or 'bilinmiyor', report['stack'] or '')
+        if self.alert and time.monotonic() - self.last_alert >= self.alert_cooldown:
+            self.last_alert = time.monotonic()
+            task = asyncio.create_task(self.alert(report))
+            self.alert_tasks.add(task)
+            task.add_done_callback(self.alert_tasks.discard)
+
+    # Loop dışındaki thread: kalp atışı gecikirse loop thread'inin o anki yığınını al (takılma başına bir kez)
+    def _watch(self):
+        captured_for = None
+        while not self.stop_event.wait(self.threshold / 2):
+            beat, heartbeat = self.heartbeat
+            overdue = time.perf_counter() - heartbeat - self.interval
+            if overdue < self.threshold or captured_for == beat:
+                continue
+            captured_for = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            if task is not None:
+                coro = task.get_coro()
+                running = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+            else:
+                running = 'callback'
+            self.capture = {
+                'beat': beat,
+                'task': running,
+                'stack': ''.join(traceback.format_stack(frame)[-15:]),
+            }
+
+    def stats(self):
+        return {
+            'p50_ms': percentile_ms(list(self.recent_lag), 0.50),
+            'p99_ms': percentile_ms(list(self.recent_lag), 0.99),
+            'max_ms': round(max(self.recent_lag) * 1000, 1) if self.recent_lag else None,
+            'stalls': len(self.stalls),
+        }
+
+# Takılmayı WATCHDOG_CHANNEL_ID kanalına bildir
+async def alert_loop_stall(report):
+    channel_id = os.getenv('WATCHDOG_CHANNEL_ID')
+    channel = bot.get_channel(int(channel_id)) if channel_id else None
+    if channel is None:
+        return
+    stack = (report['stack'] or '')[-1500:]
+    try:
+        await channel.send(
+            f"⚠️ Event loop **{report['lag_ms']} ms** takıldı. Çalışan: `{report['task'] or 'bilinmiyor'}`"
+            + (f"\n```\n{stack}\n```" if stack else "")
+        )
+    except Exception as e:
+        log.warning('Takılma bildirimi gönderilemedi: %s', e)
 
 # Müzik oynatıcısını oluştur
 music_player = MusicPlayer(bot)
+watchdog = LoopWatchdog(
+    threshold=float(os.getenv('LOOP_STALL_THRESHOLD', '0.25')),
+    alert=alert_loop_stall if os.getenv('WATCHDOG_CHANNEL_ID') else None
+)
+profiler = HotPathProfiler(music_player, watchdog, os.getenv('PROFILE_DIR', os.path.join(CACHE_DIR, 'profiles')))
+
+# Okunduğu anda hesaplanan durum ölçüleri
+metrics.gauge('voice_clients', 'Bağlı ses istemcisi sayısı', lambda: len(bot.voice_clients))
+metrics.gauge('queued_tracks', 'Tüm sunucularda sırada bekleyen şarkı sayısı', lambda: sum(len(queue) for queue in music_player.queue.values()))
+metrics.gauge('longest_queue', 'En uzun sunucu sırasının uzunluğu', lambda: max((len(queue) for queue in music_player.queue.values()), default=0))
+metrics.gauge(
+    'extraction_backlog', 'Ekstraksiyon havuzunda bekleyen ve çalışan işler',
+    lambda: {(state,): count for state, count in music_player.extractor.backlog().items()},
+    labels=('state',)
+)
+metrics.gauge('extraction_rate', 'Ekstraksiyon hız sınırı (istek/sn)', lambda: music_player.extractor.rate_limiter.rate)
+
+@bot.event
+async def setup_hook():
+    # Event loop gecikmesini baştan itibaren izle
+    watchdog.start()
+    
+    # Kalıcı butonlar: önceki çalıştırmalarda gönderilmiş paneller ve arama sonuçları da yanıt versin
+    bot.add_dynamic_items(PanelButton, SearchButton)
+    
+    # METRICS_PORT ayarlıysa /metrics uç noktasını başlat
+    metrics_port = os.getenv('METRICS_PORT')
+    if metrics_port:
+        try:
+            await start_metrics_server(os.getenv('METRICS_HOST', '127.0.0.1'), int(metrics_port))
+        except Exception as e:
+            log.error('Metrik sunucusu başlatılamadı: %s', e)
+
+# Komut boyunca yazılan kayıtlar sunucu, komut ve istek kimliğiyle ilişkilendirilsin
+@bot.before_invoke
+async def bind_command_context(ctx):
+    bind_log_context(
+        guild=ctx.guild.id if ctx.guild else None,
+        command=ctx.command.qualified_name if ctx.command else None,
+        request=os.urandom(4).hex()
+    )
+
+# Slash komutları için aynısı (kontrol, komutla aynı görevde çalışır)
+async def bind_interaction_context(interaction):
+    bind_log_context(
+        guild=interaction.guild_id,
+        command=interaction.command.qualified_name if interaction.command else None,
+        request=interaction.id
+    )
+    return True
+
+bot.tree.interaction_check = bind_interaction_context
 
 @bot.event
 async def on_ready():
-    print(f'{bot.user.name} olarak giriş yapıldı!')
+    log.info('%s olarak giriş yapıldı!', bot.user.name)
     
-    # Tüm ses kanallarından ayrıl
-    for guild in bot.guilds:
-        if guild.voice_client:
-            await guild.voice_client.disconnect(force=True)
-            print(f"{guild.name} sunucusundaki ses kanalından ayrıldım.")
+    # Önceki çalışmanın oturumlarını geri yükle (yalnızca ilk hazır olayında; sonraki yeniden
+    # bağlanmalarda ses bağlantıları korunur)
+    if not music_player.restored:
+        music_player.restored = True
+        start_background_task(music_player.restore_sessions())
     
-    # FFmpeg kontrolü
-    import subprocess
+    # FFmpeg kontrolü (alt süreç beklenirken loop bloklanmasın)
     try:
-        result = subprocess.run([FFMPEG_PATH, '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        print(f"FFmpeg sürümü: {result.stdout.split('version')[1].split(' ')[1]}")
+        process = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, '-version', stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stdout, _ = await process.communicate()
+        log.info('FFmpeg sürümü: %s', stdout.decode(errors='replace').split('version')[1].split(' ')[1])
     except Exception as e:
-        print(f"FFmpeg kontrolü başarısız: {e}")
-        print("Lütfen FFmpeg'i yükleyin ve doğru yolu belirtin!")
+        log.error('FFmpeg kontrolü başarısız: %s', e)
+        log.error("Lütfen FFmpeg'i yükleyin ve doğru yolu belirtin!")
+    
+    log.info('Bot hazır!')
+    
+    # PROFILE_ON_START ayarlıysa ilk saniyeleri profille (yeniden bağlanmalarda tekrarlama)
+    profile_seconds = int(os.getenv('PROFILE_ON_START', '0'))
+    if profile_seconds > 0 and not profiler.active and not profiler.started_on_ready:
+        profiler.started_on_ready = True
+        start_background_task(profiler.run(profile_seconds))
+    
+    # Slash komutlarını kaydet (çok süreçli çalışmada yalnızca 0. shard'ı taşıyan süreç)
+    shard_ids = getattr(bot, 'shard_ids', None)
+    if shard_ids is None or 0 in shard_ids:
+        try:
+            synced = await bot.tree.sync()
+            log.info('%s slash komut senkronize edildi.', len(synced))
+        except Exception as e:
+            log.error('Slash komutları senkronize edilirken hata oluştu: %s', e)
     
-    print('Bot hazır!')
+    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="!help"))
     
-    # Slash komutlarını kaydet
+    # YoutubeDL örneklerini arka planda hazırla; hazır olana kadar gelen istekler örneği kendisi oluşturur
+    if not ydl_pool.warmed and not ydl_pool.warming:
+        ydl_pool.warming = True
+        start_background_task(warm_up_ydl_pool())
+
+# Profil × havuz boyutu kadar YoutubeDL örneği oluşturur; ekstraksiyon thread'lerini meşgul etmemek için
+# varsayılan executor'da çalışır
+async def warm_up_ydl_pool():
     try:
-        synced = await bot.tree.sync()
-        print(f"{len(synced)} slash komut senkronize edildi.")
+        await asyncio.get_running_loop().run_in_executor(None, ydl_pool.warm_up)
+        log.info('YoutubeDL havuzu hazır: %s', ydl_pool.stats())
     except Exception as e:
-        print(f"Slash komutları senkronize edilirken hata oluştu: {e}")
+        log.error('YoutubeDL havuzu hazırlanamadı: %s', e)
+    finally:
+        ydl_pool.warming = False
+
+# !seek ve /seek için ortak işlem: konumu çözümle, sar ve kullanıcıya gösterilecek mesajı döndür
+async def seek_to(guild, position):
+    voice_client = guild.voice_client
+    song = music_player.now_playing.get(guild.id)
+    if not voice_client or song is None or not (voice_client.is_playing() or voice_client.is_paused()):
+        return "Şu anda çalan bir müzik yok."
     
-    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="!help"))
+    # Başında + veya - varsa mevcut konuma göre
+    sign = position[:1] if position[:1] in '+-' else ''
+    seconds = parse_timestamp(position[1:] if sign else position)
+    if seconds is None:
+        return "Geçersiz konum. Örnek: `1:30`, `90`, `+15` veya `-10`."
+    if sign:
+        current = music_player.engine.position(guild.id)
+        seconds = current + seconds if sign == '+' else current - seconds
+    
+    try:
+        offset = await music_player.seek(guild.id, seconds)
+    except Exception as e:
+        log.error('Sarma hatası: %s', e)
+        return f"Şarkı sarılırken bir hata oluştu: {e}"
+    if offset is None:
+        return "Sarma sırasında çalan şarkı değişti."
+    return f"⏩ **{song.title}** {format_timestamp(offset)} konumuna sarıldı."
 
 @bot.command(name='play', help='YouTube\'dan müzik çalar (URL veya şarkı adı)')
 async def play(ctx, *, query):
@@ -1067,20 +3965,17 @@ async def play(ctx, *, query):
             # Bot zaten bağlı mı ve çalıyor mu kontrol et
             if ctx.voice_client and ctx.voice_client.is_playing():
                 # Sıraya ekle
-                if guild_id not in music_player.queue:
-                    music_player.queue[guild_id] = []
-                    
-                music_player.queue[guild_id].append(song_info)
+                music_player.enqueue(guild_id, song_info)
                 
                 # Sıraya eklendiğini bildir
                 embed = discord.Embed(
                     title="🎵 Sıraya Eklendi",
-                    description=f"**{song_info['title']}**",
+                    description=f"**{song_info.title}**",
                     color=discord.Color.green()
                 )
                 
-                if song_info.get('thumbnail'):
-                    embed.set_thumbnail(url=song_info['thumbnail'])
+                if song_info.thumbnail:
+                    embed.set_thumbnail(url=song_info.thumbnail)
                     
                 embed.add_field(name="Sıra Pozisyonu", value=f"#{len(music_player.queue[guild_id])}", inline=True)
                 
@@ -1097,7 +3992,7 @@ async def play(ctx, *, query):
             pass
         
         await ctx.send(f"Bir hata oluştu: {str(e)}")
-        print(f"Genel Hata: {str(e)}")
+        log.exception('Genel Hata: %s', e)
 
 @bot.command(name='pause', help='Müziği duraklatır')
 async def pause(ctx):
@@ -1122,10 +4017,13 @@ async def stop(ctx):
             # Sırayı temizle
             guild_id = ctx.guild.id
             if guild_id in music_player.queue:
-                music_player.queue[guild_id] = []
+                music_player.queue[guild_id].clear()
+            
+            # Devam eden playlist yüklemesini iptal et
+            music_player.cancel_playlist_ingestion(guild_id)
                 
             # Şu an çalan şarkı bilgisini temizle
-            music_player.now_playing.pop(guild_id, None)
+            music_player.clear_now_playing(guild_id)
             
             # Müziği durdur
             ctx.voice_client.stop()
@@ -1143,6 +4041,10 @@ async def skip(ctx):
     else:
         await ctx.send("Şu anda çalan bir müzik yok.")
 
+@bot.command(name='seek', help='Çalan şarkıyı verilen konuma sarar (ör. 1:30, 90, +15, -10)')
+async def seek(ctx, position):
+    await ctx.send(await seek_to(ctx.guild, position))
+
 @bot.command(name='queue', help='Şarkı sırasını gösterir')
 async def queue(ctx):
     guild_id = ctx.guild.id
@@ -1161,14 +4063,14 @@ async def queue(ctx):
         now_playing = music_player.now_playing[guild_id]
         embed.add_field(
             name="Şu an oynatılıyor:",
-            value=f"**{now_playing['title']}**",
+            value=f"**{now_playing.title}**",
             inline=False
         )
     
     # Sıradaki şarkılar
     queue_text = ""
-    for i, song in enumerate(music_player.queue[guild_id]):
-        queue_text += f"{i+1}. **{song['title']}**\n"
+    for i, song in enumerate(music_player.queue[guild_id].head(10)):
+        queue_text += f"{i+1}. **{song.title}**\n"
         
         # Çok uzunsa kısalt
         if i >= 9:  # İlk 10 şarkıyı göster
@@ -1186,10 +4088,13 @@ async def leave(ctx):
         # Sırayı temizle
         guild_id = ctx.guild.id
         if guild_id in music_player.queue:
-            music_player.queue[guild_id] = []
+            music_player.queue[guild_id].clear()
+        
+        # Devam eden playlist yüklemesini iptal et
+        music_player.cancel_playlist_ingestion(guild_id)
             
         # Şu an çalan şarkı bilgisini temizle
-        music_player.now_playing.pop(guild_id, None)
+        music_player.clear_now_playing(guild_id)
         
         # Çalmayı durdur
         if ctx.voice_client.is_playing() or ctx.voice_client.is_paused():
@@ -1203,7 +4108,158 @@ async def leave(ctx):
 
 @bot.command(name='ping', help='Bot gecikmesini gösterir')
 async def ping(ctx):
-    await ctx.send(f'🏓 Pong! {round(bot.latency * 1000)}ms')
+    message = f'🏓 Pong! {round(bot.latency * 1000)}ms'
+    
+    # Bu sunucuda son parçanın ilk sesine kadar geçen süre
+    first_frame = music_player.engine.first_frame_times.get(ctx.guild.id) if ctx.guild else None
+    if first_frame is not None:
+        message += f' | İlk ses: {round(first_frame * 1000)}ms'
+    
+    await ctx.send(message)
+
+@bot.command(name='cache', help='Çözümleme önbelleği istatistiklerini gösterir')
+async def cache_stats(ctx):
+    stats = await music_player.resolution_cache.stats()
+    search_stats = music_player.search_cache.stats()
+    
+    embed = discord.Embed(
+        title="🗄️ Çözümleme Önbelleği",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Meta veri", value=f"{stats['metadata_hits']} isabet / {stats['metadata_misses']} kaçırma", inline=False)
+    embed.add_field(name="Akış URL'si", value=f"{stats['url_hits']} isabet / {stats['url_misses']} kaçırma", inline=False)
+    embed.add_field(name="Bellek", value=str(stats['memory_entries']), inline=True)
+    embed.add_field(name="Disk", value=str(stats['disk_entries']), inline=True)
+    embed.add_field(
+        name="Arama",
+        value=f"{search_stats['hits']} isabet / {search_stats['misses']} kaçırma / {search_stats['shared']} paylaşılan ({search_stats['entries']} kayıt)",
+        inline=False
+    )
+
+    audio_stats = music_player.audio_cache.stats()
+    if audio_stats['enabled']:
+        embed.add_field(
+            name="Ses dosyaları",
+            value=f"{audio_stats['hits']} isabet / {audio_stats['misses']} kaçırma, "
+                  f"{audio_stats['files']} dosya ({audio_stats['bytes'] // (1024 * 1024)}/{audio_stats['max_bytes'] // (1024 * 1024)} MB)",
+            inline=False
+        )
+
+    journal_stats = music_player.journal.stats()
+    if journal_stats['active']:
+        embed.add_field(
+            name="Oturum günlüğü",
+            value=f"Son sıkıştırmadan beri {journal_stats['records']} kayıt, {journal_stats['compactions']} sıkıştırma",
+            inline=False
+        )
+
+    await ctx.send(embed=embed)
+
+@bot.command(name='throttle', help='YouTube istek hızını ve kısıtlama durumunu gösterir')
+async def throttle_state(ctx):
+    state = music_player.extractor.rate_limiter.state()
+    backlog = music_player.extractor.backlog()
+
+    embed = discord.Embed(
+        title="🚦 YouTube İstek Hızı",
+        color=discord.Color.red() if state['throttled'] else discord.Color.green()
+    )
+    embed.add_field(name="Durum", value="Kısıtlandı" if state['throttled'] else "Normal", inline=True)
+    embed.add_field(name="Hız", value=f"{state['rate']:.2f} / {state['max_rate']:.2f} istek/sn", inline=True)
+    embed.add_field(name="Token", value=f"{max(state['tokens'], 0):.1f}", inline=True)
+    embed.add_field(name="Kısıtlama sayısı", value=str(state['throttle_events']), inline=True)
+    if state['last_throttle']:
+        embed.add_field(name="Son kısıtlama", value=f"<t:{int(state['last_throttle'])}:R>", inline=True)
+    embed.add_field(
+        name="Bekleyen",
+        value=f"{backlog['interactive']} etkileşimli / {backlog['background']} arka plan / {backlog['running']} çalışan",
+        inline=False
+    )
+
+    # İstemciler, çözümlemede denenecekleri sırayla
+    health = music_player.client_health.stats()
+    ranked = music_player.client_health.ranked()
+    lines = []
+    for client in ranked + [client for client in health if client not in ranked]:
+        client_stats = health[client]
+        latency = f"{client_stats['latency'] * 1000:.0f} ms" if client_stats['latency'] is not None else "-"
+        status = " (atlanıyor)" if client_stats['failing'] else ""
+        lines.append(f"`{client}`: %{client_stats['success_rate'] * 100:.0f} başarı, {latency}, {client_stats['samples']} deneme{status}")
+    embed.add_field(name="İstemciler", value="\n".join(lines), inline=False)
+
+    if resolver_client is not None:
+        resolver = resolver_client.stats()
+        embed.add_field(
+            name="Resolver",
+            value=f"`{resolver['address']}`: {'erişilebilir' if resolver['available'] else 'erişilemiyor'}, "
+                  f"{resolver['remote_calls']} istek / {resolver['fallbacks']} yerel",
+            inline=False
+        )
+
+    await ctx.send(embed=embed)
+
+@bot.command(name='shards', help='Shard başına gecikme ve oynatıcı sayılarını gösterir')
+async def shard_info(ctx):
+    stats = music_player.shard_stats()
+    
+    embed = discord.Embed(
+        title="🧩 Shard Durumu",
+        description=f"Toplam shard: {bot.shard_count or 1} | Bu süreç: {', '.join(map(str, sorted(stats)))}",
+        color=discord.Color.blue()
+    )
+    for shard_id in sorted(stats)[:25]:
+        shard = stats[shard_id]
+        latency = f"{round(shard['latency'] * 1000)}ms" if shard['latency'] is not None else "-"
+        embed.add_field(
+            name=f"Shard {shard_id}",
+            value=f"{latency} | {shard['guilds']} sunucu | {shard['players']} oynatıcı | {shard['queued']} sırada",
+            inline=False
+        )
+    
+    await ctx.send(embed=embed)
+
+@bot.command(name='profile', help='Sıcak yolu belirtilen saniye boyunca profiller (yalnızca bot sahibi)')
+@commands.is_owner()
+async def profile(ctx, seconds: int = 30):
+    seconds = max(5, min(seconds, 300))
+    if profiler.active:
+        return await ctx.send("Zaten bir profilleme sürüyor.")
+    
+    await ctx.send(f"⏱️ {seconds} saniye boyunca profilleniyor...")
+    path, summary = await profiler.run(seconds)
+    
+    embed = discord.Embed(title="⏱️ Profil Özeti", color=discord.Color.blue())
+    slowest = [
+        f"`{name}`: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms ({stats['count']}x)"
+        for name, stats in list(summary['timings'].items())[:6]
+    ]
+    embed.add_field(name="En çok süre harcayanlar", value="\n".join(slowest) or "-", inline=False)
+    hot = [f"`{entry['frame']}` %{entry['percent']}" for entry in summary['top_self'][:5]]
+    embed.add_field(name="En sık görülen fonksiyonlar", value="\n".join(hot) or "-", inline=False)
+    lag = summary['loop_lag_ms']
+    embed.add_field(name="Event loop gecikmesi", value=f"p50 {lag['p50']} ms, p99 {lag['p99']} ms, en fazla {lag['max']} ms", inline=False)
+    
+    await ctx.send(embed=embed, file=discord.File(path))
+
+@bot.command(name='lag', help='Event loop gecikmesini ve son takılmaları gösterir (yalnızca bot sahibi)')
+@commands.is_owner()
+async def loop_lag(ctx):
+    stats = watchdog.stats()
+    
+    embed = discord.Embed(
+        title="🩺 Event Loop",
+        description=f"Son dakika: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, en fazla {stats['max_ms']} ms",
+        color=discord.Color.orange() if watchdog.stalls else discord.Color.green()
+    )
+    for report in list(watchdog.stalls)[-3:]:
+        stack = (report['stack'] or '').strip().splitlines()[-4:]
+        embed.add_field(
+            name=f"{report['lag_ms']} ms takılma",
+            value=f"<t:{int(report['at'])}:R> `{report['task'] or 'bilinmiyor'}`\n```\n" + "\n".join(stack)[-900:] + "\n```",
+            inline=False
+        )
+    
+    await ctx.send(embed=embed)
 
 @bot.command(name='np', help='Şu an çalan şarkıyı gösterir')
 async def now_playing(ctx):
@@ -1217,20 +4273,22 @@ async def now_playing(ctx):
     # Şarkı bilgilerini içeren bir embed oluştur
     embed = discord.Embed(
         title="🎵 Şu an Oynatılıyor",
-        description=f"**{song_info['title']}**",
+        description=f"**{song_info.title}**",
         color=discord.Color.blue()
     )
     
-    if song_info.get('thumbnail'):
-        embed.set_thumbnail(url=song_info['thumbnail'])
+    if song_info.thumbnail:
+        embed.set_thumbnail(url=song_info.thumbnail)
         
-    embed.add_field(name="Yükleyen", value=song_info['uploader'], inline=True)
+    embed.add_field(name="Yükleyen", value=song_info.uploader, inline=True)
     
-    if song_info.get('duration'):
-        minutes, seconds = divmod(song_info['duration'], 60)
+    if song_info.duration:
+        minutes, seconds = divmod(song_info.duration, 60)
         embed.add_field(name="Süre", value=f"{minutes}:{seconds:02d}", inline=True)
+    
+    embed.add_field(name="Konum", value=format_timestamp(music_player.engine.position(guild_id)), inline=True)
         
-    embed.add_field(name="Kaynak", value=f"[Link]({song_info['webpage_url']})", inline=True)
+    embed.add_field(name="Kaynak", value=f"[Link]({song_info.webpage_url})", inline=True)
     
     await ctx.send(embed=embed)
 
@@ -1265,20 +4323,17 @@ async def slash_play(interaction: discord.Interaction, query: str):
             # Bot zaten bağlı mı ve çalıyor mu kontrol et
             if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
                 # Sıraya ekle
-                if guild_id not in music_player.queue:
-                    music_player.queue[guild_id] = []
-                    
-                music_player.queue[guild_id].append(song_info)
+                music_player.enqueue(guild_id, song_info)
                 
                 # Sıraya eklendiğini bildir
                 embed = discord.Embed(
                     title="🎵 Sıraya Eklendi",
-                    description=f"**{song_info['title']}**",
+                    description=f"**{song_info.title}**",
                     color=discord.Color.green()
                 )
                 
-                if song_info.get('thumbnail'):
-                    embed.set_thumbnail(url=song_info['thumbnail'])
+                if song_info.thumbnail:
+                    embed.set_thumbnail(url=song_info.thumbnail)
                     
                 embed.add_field(name="Sıra Pozisyonu", value=f"#{len(music_player.queue[guild_id])}", inline=True)
                 
@@ -1295,7 +4350,7 @@ async def slash_play(interaction: discord.Interaction, query: str):
             pass
         
         await interaction.followup.send(f"Bir hata oluştu: {str(e)}")
-        print(f"Genel Hata: {str(e)}")
+        log.exception('Genel Hata: %s', e)
 
 @bot.tree.command(name="pause", description="Müziği duraklatır")
 async def slash_pause(interaction: discord.Interaction):
@@ -1326,10 +4381,13 @@ async def slash_stop(interaction: discord.Interaction):
             # Sırayı temizle
             guild_id = interaction.guild.id
             if guild_id in music_player.queue:
-                music_player.queue[guild_id] = []
+                music_player.queue[guild_id].clear()
+            
+            # Devam eden playlist yüklemesini iptal et
+            music_player.cancel_playlist_ingestion(guild_id)
                 
             # Şu an çalan şarkı bilgisini temizle
-            music_player.now_playing.pop(guild_id, None)
+            music_player.clear_now_playing(guild_id)
             
             # Müziği durdur
             interaction.guild.voice_client.stop()
@@ -1349,6 +4407,11 @@ async def slash_skip(interaction: discord.Interaction):
     else:
         await interaction.followup.send("Şu anda çalan bir müzik yok.")
 
+@bot.tree.command(name="seek", description="Çalan şarkıyı verilen konuma sarar (ör. 1:30, 90, +15, -10)")
+async def slash_seek(interaction: discord.Interaction, position: str):
+    await interaction.response.defer(ephemeral=False)
+    await interaction.followup.send(await seek_to(interaction.guild, position))
+
 @bot.tree.command(name="queue", description="Şarkı sırasını gösterir")
 async def slash_queue(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=False)
@@ -1369,14 +4432,14 @@ async def slash_queue(interaction: discord.Interaction):
         now_playing = music_player.now_playing[guild_id]
         embed.add_field(
             name="Şu an oynatılıyor:",
-            value=f"**{now_playing['title']}**",
+            value=f"**{now_playing.title}**",
             inline=False
         )
     
     # Sıradaki şarkılar
     queue_text = ""
-    for i, song in enumerate(music_player.queue[guild_id]):
-        queue_text += f"{i+1}. **{song['title']}**\n"
+    for i, song in enumerate(music_player.queue[guild_id].head(10)):
+        queue_text += f"{i+1}. **{song.title}**\n"
         
         # Çok uzunsa kısalt
         if i >= 9:  # İlk 10 şarkıyı göster
@@ -1396,10 +4459,13 @@ async def slash_leave(interaction: discord.Interaction):
         # Sırayı temizle
         guild_id = interaction.guild.id
         if guild_id in music_player.queue:
-            music_player.queue[guild_id] = []
+            music_player.queue[guild_id].clear()
+        
+        # Devam eden playlist yüklemesini iptal et
+        music_player.cancel_playlist_ingestion(guild_id)
             
         # Şu an çalan şarkı bilgisini temizle
-        music_player.now_playing.pop(guild_id, None)
+        music_player.clear_now_playing(guild_id)
         
         # Çalmayı durdur
         if interaction.guild.voice_client.is_playing() or interaction.guild.voice_client.is_paused():
@@ -1429,20 +4495,22 @@ async def slash_now_playing(interaction: discord.Interaction):
     # Şarkı bilgilerini içeren bir embed oluştur
     embed = discord.Embed(
         title="🎵 Şu an Oynatılıyor",
-        description=f"**{song_info['title']}**",
+        description=f"**{song_info.title}**",
         color=discord.Color.blue()
     )
     
-    if song_info.get('thumbnail'):
-        embed.set_thumbnail(url=song_info['thumbnail'])
+    if song_info.thumbnail:
+        embed.set_thumbnail(url=song_info.thumbnail)
         
-    embed.add_field(name="Yükleyen", value=song_info['uploader'], inline=True)
+    embed.add_field(name="Yükleyen", value=song_info.uploader, inline=True)
     
-    if song_info.get('duration'):
-        minutes, seconds = divmod(song_info['duration'], 60)
+    if song_info.duration:
+        minutes, seconds = divmod(song_info.duration, 60)
         embed.add_field(name="Süre", value=f"{minutes}:{seconds:02d}", inline=True)
+    
+    embed.add_field(name="Konum", value=format_timestamp(music_player.engine.position(guild_id)), inline=True)
         
-    embed.add_field(name="Kaynak", value=f"[Link]({song_info['webpage_url']})", inline=True)
+    embed.add_field(name="Kaynak", value=f"[Link]({song_info.webpage_url})", inline=True)
     
     await interaction.followup.send(embed=embed)
 
@@ -1451,11 +4519,14 @@ async def slash_now_playing(interaction: discord.Interaction):
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         await ctx.send("Komut bulunamadı. Komutları görmek için `!help` yazın.")
+    elif isinstance(error, commands.NotOwner):
+        await ctx.send("Bu komutu yalnızca bot sahibi kullanabilir.")
     else:
-        print(f"Hata: {str(error)}")
+        log.error('Hata: %s', error)
         await ctx.send(f"Bir hata oluştu: {str(error)}")
 
-load_dotenv()
+# Botu çalıştır (modül benchmark'lar tarafından içe aktarıldığında çalıştırma)
+if __name__ == '__main__':
+    # discord.py kayıtları da aynı kuyruk ve biçimden geçsin
+    bot.run(os.getenv('DISCORD_TOKEN'), log_handler=None)
 
-# Botu çalıştır
-bot.run(os.getenv('DISCORD_TOKEN'))